@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+wsgi_app = "olms.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# Import and warm the app once in the master; workers fork from it instead of
+# each importing Django, the project and its dependencies from scratch.
+preload_app = True
@@ -0,0 +1,115 @@
+import datetime
+import logging
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import AcademicYear, CourseRun, Institution, Term
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(institution_id):
+    return f"calendar:{institution_id}"
+
+
+def local_today(tz_name):
+    # Institution.timezone is free text; a typo must not break every page.
+    try:
+        zone = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        logger.error("Unknown institution time zone %r, using UTC", tz_name)
+        zone = datetime.timezone.utc
+    return timezone.localdate(timezone=zone)
+
+
+# -----------------------
+# Current term and year
+# -----------------------
+def _next_boundary(queryset, today):
+    # First day after ``today`` on which something in ``queryset`` starts or ends.
+    bounds = queryset.aggregate(
+        next_start=Min("start_date", filter=Q(start_date__gt=today)),
+        next_end=Min("end_date", filter=Q(end_date__gte=today)),
+    )
+    candidates = [bounds["next_start"]]
+    if bounds["next_end"] is not None:
+        candidates.append(bounds["next_end"] + datetime.timedelta(days=1))
+    return min((d for d in candidates if d is not None), default=None)
+
+
+def _resolve(institution_id, tz_name, today):
+    years = AcademicYear.objects.filter(institution_id=institution_id)
+    terms = Term.objects.filter(institution_id=institution_id)
+    year = years.filter(start_date__lte=today, end_date__gte=today).order_by("-start_date", "id").first()
+    term = terms.filter(start_date__lte=today, end_date__gte=today).order_by("-start_date", "id").first()
+    # Nothing changes between today and the next boundary.
+    bounds = [b for b in (_next_boundary(years, today), _next_boundary(terms, today)) if b is not None]
+    return {
+        "tz": tz_name,
+        "year": year,
+        "term": term,
+        "from": today,
+        "until": min(bounds, default=None),
+    }
+
+
+def current_period(institution_id, today=None):
+    """
+    Return ``(academic_year, term)`` in session at ``institution_id`` today.
+
+    "Today" is taken in the institution's timezone. The answer is cached
+    until the next date on which any of its terms or years starts or ends,
+    and dropped when one of them is saved or deleted. Either item is None
+    when no date range covers today.
+    """
+    key = _cache_key(institution_id)
+    entry = cache.get(key)
+    if entry is not None:
+        day = today or local_today(entry["tz"])
+        if entry["from"] <= day and (entry["until"] is None or day < entry["until"]):
+            return entry["year"], entry["term"]
+
+    tz_name = entry["tz"] if entry else Institution.objects.filter(pk=institution_id).values_list("timezone", flat=True).first()
+    tz_name = tz_name or "UTC"
+    day = today or local_today(tz_name)
+    entry = _resolve(institution_id, tz_name, day)
+    if today is None:
+        timeout = None
+        if entry["until"] is not None:
+            boundary = datetime.datetime.combine(entry["until"], datetime.time.min, tzinfo=ZoneInfo(tz_name))
+            timeout = max(int((boundary - timezone.now()).total_seconds()), 1)
+        cache.set(key, entry, timeout)
+    return entry["year"], entry["term"]
+
+
+def current_term(institution_id, today=None):
+    return current_period(institution_id, today)[1]
+
+
+def invalidate_calendar(institution_id):
+    cache.delete(_cache_key(institution_id))
+
+
+# -----------------------
+# Date ranges
+# -----------------------
+def active_runs(start, end, institution_id=None):
+    """
+    CourseRuns whose dates overlap ``start``..``end`` (inclusive).
+
+    A run without its own start or end date uses its term's. Each branch
+    compares plain columns, so the run and term date indexes apply.
+    """
+    overlapping = (
+        Q(start_date__lte=end, end_date__gte=start)
+        | Q(start_date__isnull=True, end_date__isnull=True, term__start_date__lte=end, term__end_date__gte=start)
+        | Q(start_date__isnull=True, end_date__gte=start, term__start_date__lte=end)
+        | Q(end_date__isnull=True, start_date__lte=end, term__end_date__gte=start)
+    )
+    runs = CourseRun.objects.filter(overlapping).select_related("course", "term__academic_year")
+    if institution_id is not None:
+        runs = runs.filter(institution_id=institution_id)
+    return runs
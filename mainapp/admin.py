@@ -1,26 +1,310 @@
 from django.contrib import admin
-from .models import *
-# Register your models here.
-admin.site.register(Institution)
-admin.site.register(User)
-admin.site.register(Profile)
-admin.site.register(AcademicYear)
-admin.site.register(Term)
-admin.site.register(Department)
-admin.site.register(Program)
-admin.site.register(Course)
-admin.site.register(CourseRun)
-admin.site.register(Enrollment)
-admin.site.register(Module)
-admin.site.register(Lesson)
-admin.site.register(Content)
-admin.site.register(Assignment)
-admin.site.register(Quiz)
-admin.site.register(Question)
-admin.site.register(Choice)
-admin.site.register(Submission)
-admin.site.register(Grade)
-admin.site.register(Announcement)
-admin.site.register(Discussion)
-admin.site.register(Payment)
-admin.site.register(Attendance)
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.utils.functional import cached_property
+
+from .models import (
+    AcademicYear, Announcement, Assignment, Attendance, Choice, Content, Course, CourseRun,
+    CourseRunStats, Department, Discussion, Enrollment, Grade, Institution, Lesson, Module,
+    Payment, Profile, Program, Question, Quiz, QuizResponse, SimilarityFlag, StudentBalance,
+    Submission, Term, User,
+)
+
+
+# -----------------------
+# Large tables
+# -----------------------
+def estimated_row_count(model):
+    """
+    Return the planner's row estimate for ``model``'s table, or None.
+
+    Uses pg_class.reltuples on PostgreSQL and sqlite_stat1 (filled by
+    ANALYZE) on SQLite; both are a single catalog lookup.
+    """
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == "sqlite":
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    return int(str(row[0]).split()[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Use the database's row estimate instead of COUNT(*) for unfiltered
+    changelists of big tables; filtered or small ones are counted exactly.
+    """
+
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("-pk",)
+
+
+# -----------------------
+# Institutions and users
+# -----------------------
+@admin.register(Institution)
+class InstitutionAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug", "is_active")
+    search_fields = ("name", "slug")
+    prepopulated_fields = {"slug": ("name",)}
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_display = ("username", "email", "first_name", "last_name", "role", "institution", "is_staff")
+    list_select_related = ("institution",)
+    list_filter = ("role", "is_staff", "is_active")
+    autocomplete_fields = ("institution",)
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ("Institution", {"fields": ("institution", "role", "phone", "bio", "avatar")}),
+    )
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ("user", "role")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+
+
+# -----------------------
+# Calendar and catalogue
+# -----------------------
+@admin.register(AcademicYear)
+class AcademicYearAdmin(admin.ModelAdmin):
+    list_display = ("name", "institution", "start_date", "end_date", "is_current")
+    list_select_related = ("institution",)
+    search_fields = ("name",)
+
+
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ("name", "academic_year", "start_date", "end_date")
+    list_select_related = ("academic_year",)
+    search_fields = ("name", "academic_year__name")
+    autocomplete_fields = ("institution", "academic_year")
+
+
+@admin.register(Department)
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ("name", "institution")
+    list_select_related = ("institution",)
+    search_fields = ("name",)
+
+
+@admin.register(Program)
+class ProgramAdmin(admin.ModelAdmin):
+    list_display = ("code", "name", "institution")
+    list_select_related = ("institution",)
+    search_fields = ("code", "name")
+    autocomplete_fields = ("institution", "department")
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ("code", "title", "institution", "is_published")
+    list_select_related = ("institution",)
+    list_filter = ("is_published",)
+    search_fields = ("code", "title")
+    autocomplete_fields = ("institution", "program")
+
+
+@admin.register(CourseRun)
+class CourseRunAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "capacity", "enrolled_count", "start_date", "end_date")
+    list_select_related = ("course", "term")
+    search_fields = ("course__code", "course__title", "name")
+    autocomplete_fields = ("institution", "course", "term")
+    raw_id_fields = ("teachers",)
+    readonly_fields = ("enrolled_count",)
+
+
+@admin.register(CourseRunStats)
+class CourseRunStatsAdmin(admin.ModelAdmin):
+    list_display = ("course_run", "enrolled_count", "average_quiz_score", "submission_rate", "attendance_rate", "refreshed_at")
+    list_select_related = ("course_run__course", "course_run__term")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -----------------------
+# Course content
+# -----------------------
+@admin.register(Module)
+class ModuleAdmin(admin.ModelAdmin):
+    list_display = ("title", "course_run", "order")
+    list_select_related = ("course_run__course", "course_run__term")
+    search_fields = ("title",)
+    autocomplete_fields = ("course_run",)
+
+
+@admin.register(Lesson)
+class LessonAdmin(admin.ModelAdmin):
+    list_display = ("title", "module", "order", "is_published")
+    list_select_related = ("module",)
+    search_fields = ("title",)
+    autocomplete_fields = ("module",)
+
+
+@admin.register(Content)
+class ContentAdmin(admin.ModelAdmin):
+    list_display = ("title", "type", "lesson", "order", "is_visible")
+    list_select_related = ("lesson",)
+    list_filter = ("type",)
+    search_fields = ("title",)
+    autocomplete_fields = ("lesson",)
+
+
+@admin.register(Assignment)
+class AssignmentAdmin(admin.ModelAdmin):
+    list_display = ("content", "due_at", "max_points")
+    list_select_related = ("content",)
+    search_fields = ("content__title",)
+    autocomplete_fields = ("content",)
+
+
+class ChoiceInline(admin.TabularInline):
+    model = Choice
+    extra = 0
+
+
+@admin.register(Quiz)
+class QuizAdmin(admin.ModelAdmin):
+    list_display = ("content", "time_limit_minutes", "attempts_allowed")
+    list_select_related = ("content",)
+    search_fields = ("content__title",)
+    autocomplete_fields = ("content",)
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    list_display = ("text", "quiz", "type", "points", "order")
+    list_select_related = ("quiz__content",)
+    search_fields = ("text",)
+    autocomplete_fields = ("quiz",)
+    inlines = [ChoiceInline]
+
+
+@admin.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    list_display = ("text", "question", "is_correct")
+    list_select_related = ("question",)
+    search_fields = ("text",)
+    autocomplete_fields = ("question",)
+
+
+# -----------------------
+# High-volume records
+# -----------------------
+@admin.register(Enrollment)
+class EnrollmentAdmin(LargeTableAdmin):
+    list_display = ("student", "course_run", "status", "date_enrolled")
+    list_select_related = ("student", "course_run__course", "course_run__term")
+    list_filter = ("status",)
+    raw_id_fields = ("student",)
+    autocomplete_fields = ("institution", "course_run")
+
+
+@admin.register(Submission)
+class SubmissionAdmin(LargeTableAdmin):
+    list_display = ("pk", "student", "assignment", "quiz", "submitted_at", "score")
+    list_select_related = ("student", "assignment__content", "quiz__content")
+    list_filter = (("submitted_at", admin.DateFieldListFilter),)
+    raw_id_fields = ("student", "graded_by", "assignment", "quiz")
+
+
+@admin.register(QuizResponse)
+class QuizResponseAdmin(LargeTableAdmin):
+    list_display = ("pk", "submission", "question", "selected_choice")
+    raw_id_fields = ("submission", "question", "selected_choice", "quiz")
+
+
+@admin.register(Attendance)
+class AttendanceAdmin(LargeTableAdmin):
+    list_display = ("student", "course_run", "date", "status")
+    list_select_related = ("student", "course_run__course", "course_run__term")
+    list_filter = (("date", admin.DateFieldListFilter), "status")
+    raw_id_fields = ("student",)
+    autocomplete_fields = ("course_run",)
+
+
+@admin.register(Grade)
+class GradeAdmin(LargeTableAdmin):
+    list_display = ("enrollment", "total_score", "letter_grade", "calculated_at")
+    raw_id_fields = ("enrollment",)
+
+
+@admin.register(Announcement)
+class AnnouncementAdmin(LargeTableAdmin):
+    list_display = ("title", "institution", "course_run", "created_by", "created_at")
+    list_select_related = ("institution", "course_run__course", "course_run__term", "created_by")
+    search_fields = ("title",)
+    raw_id_fields = ("created_by",)
+    autocomplete_fields = ("institution", "course_run")
+
+
+@admin.register(Discussion)
+class DiscussionAdmin(LargeTableAdmin):
+    list_display = ("pk", "user", "course_run", "lesson", "created_at")
+    list_select_related = ("user", "course_run__course", "course_run__term", "lesson")
+    raw_id_fields = ("user", "lesson")
+    autocomplete_fields = ("course_run",)
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ("reference", "student", "amount", "status", "created_at")
+    list_select_related = ("student",)
+    list_filter = ("status",)
+    search_fields = ("=reference",)
+    raw_id_fields = ("student",)
+    autocomplete_fields = ("institution",)
+
+
+@admin.register(SimilarityFlag)
+class SimilarityFlagAdmin(LargeTableAdmin):
+    list_display = ("submission", "other", "similarity", "created_at")
+    raw_id_fields = ("submission", "other")
+
+
+@admin.register(StudentBalance)
+class StudentBalanceAdmin(LargeTableAdmin):
+    list_display = ("student", "paid", "pending", "payment_count", "refreshed_at")
+    list_select_related = ("student",)
+    raw_id_fields = ("student",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
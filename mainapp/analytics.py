@@ -0,0 +1,158 @@
+from itertools import islice
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Choice, QuizResponse
+
+CHUNK_SIZE = 20000
+CACHE_TIMEOUT = 60 * 60 * 24
+# Share of students in each of the upper and lower groups for the
+# classical discrimination index.
+GROUP_FRACTION = 0.27
+
+
+# -----------------------
+# Loading
+# -----------------------
+def load_responses(quiz, chunk_size=CHUNK_SIZE):
+    """
+    Pull a quiz's responses into parallel int64 arrays.
+
+    Rows are streamed from the database ``chunk_size`` at a time so the
+    Python-object footprint stays bounded. Returns
+    ``(submission_ids, question_ids, choice_ids)``; unanswered questions have
+    choice id 0.
+    """
+    rows = (
+        QuizResponse.objects.filter(question__quiz_id=quiz.pk)
+        .values_list("submission_id", "question_id", "selected_choice_id")
+        .order_by()
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        chunks.append(np.array([(s, q, c or 0) for s, q, c in chunk], dtype=np.int64))
+    data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+# -----------------------
+# Statistics
+# -----------------------
+def item_statistics(submission_ids, question_ids, choice_ids, questions, choices):
+    """
+    Compute item statistics for every question at once.
+
+    ``questions`` is a list of ``(question_id, points)`` and ``choices`` a list
+    of ``(choice_id, question_id, is_correct)``. Returns per-question
+    difficulty (share correct), corrected point-biserial correlation with the
+    rest of the test, upper/lower-group discrimination index and per-choice
+    selection frequencies.
+    """
+    if not questions:
+        return {"submissions": len(np.unique(submission_ids)), "responses": len(submission_ids), "questions": []}
+    question_keys = np.array([q for q, _ in questions], dtype=np.int64)
+    points = np.array([float(p) for _, p in questions])
+    order = np.argsort(question_keys)
+    question_keys, points = question_keys[order], points[order]
+
+    choice_keys = np.array([c for c, _, _ in choices], dtype=np.int64)
+    choice_question = np.array([q for _, q, _ in choices], dtype=np.int64)
+    choice_correct = np.array([bool(k) for _, _, k in choices], dtype=bool)
+    choice_order = np.argsort(choice_keys)
+    choice_keys, choice_question, choice_correct = (
+        choice_keys[choice_order], choice_question[choice_order], choice_correct[choice_order]
+    )
+
+    attempts, row = np.unique(submission_ids, return_inverse=True)
+    col = np.searchsorted(question_keys, question_ids)
+    known = (col < len(question_keys)) & (question_keys[np.minimum(col, len(question_keys) - 1)] == question_ids)
+
+    choice_index = np.searchsorted(choice_keys, choice_ids)
+    choice_index = np.minimum(choice_index, max(len(choice_keys) - 1, 0))
+    answered = known & (choice_ids != 0) & (len(choice_keys) > 0)
+    if len(choice_keys):
+        answered &= choice_keys[choice_index] == choice_ids
+    correct_response = np.zeros(len(choice_ids), dtype=bool)
+    correct_response[answered] = choice_correct[choice_index[answered]]
+
+    # Attempts x questions matrix of 0/1 scores.
+    matrix = np.zeros((len(attempts), len(question_keys)))
+    matrix[row[known], col[known]] = correct_response[known]
+
+    n_students = len(attempts)
+    difficulty = matrix.mean(axis=0) if n_students else np.full(len(question_keys), np.nan)
+    weighted = matrix * points
+    total = weighted.sum(axis=1)
+    rest = total[:, None] - weighted  # score on every other item
+
+    x = matrix - difficulty
+    r = rest - rest.mean(axis=0) if n_students else rest
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point_biserial = (x * r).sum(axis=0) / np.sqrt((x ** 2).sum(axis=0) * (r ** 2).sum(axis=0))
+
+    group = max(int(round(n_students * GROUP_FRACTION)), 1) if n_students else 0
+    ranked = np.argsort(total, kind="stable")
+    if group:
+        discrimination = matrix[ranked[-group:]].mean(axis=0) - matrix[ranked[:group]].mean(axis=0)
+    else:
+        discrimination = np.full(len(question_keys), np.nan)
+
+    counts = np.bincount(choice_index[answered], minlength=len(choice_keys))
+    answered_per_question = np.bincount(col[known], minlength=len(question_keys))
+    omitted = answered_per_question - np.bincount(col[answered], minlength=len(question_keys))
+
+    per_question = {int(q): [] for q in question_keys}
+    for key, question, is_correct, count in zip(choice_keys, choice_question, choice_correct, counts):
+        if int(question) not in per_question:
+            continue
+        responses = answered_per_question[np.searchsorted(question_keys, question)]
+        per_question[int(question)].append({
+            "id": int(key),
+            "is_correct": bool(is_correct),
+            "count": int(count),
+            "frequency": float(count / responses) if responses else None,
+        })
+
+    def clean(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    return {
+        "submissions": int(n_students),
+        "responses": int(len(submission_ids)),
+        "questions": [
+            {
+                "id": int(question_keys[i]),
+                "difficulty": clean(difficulty[i]),
+                "point_biserial": clean(point_biserial[i]),
+                "discrimination": clean(discrimination[i]),
+                "omitted": int(omitted[i]),
+                "choices": per_question[int(question_keys[i])],
+            }
+            for i in range(len(question_keys))
+        ],
+    }
+
+
+def analyse_quiz(quiz):
+    """
+    Return item statistics for ``quiz``, cached per quiz and response version.
+
+    The cache key combines ``Quiz.version`` (bumped when questions or choices
+    change) with the count and newest id of its responses, so results are
+    reused until either the quiz or its answers change.
+    """
+    state = QuizResponse.objects.filter(question__quiz_id=quiz.pk).aggregate(n=Count("pk"), last=Max("pk"))
+    key = f"quiz-analysis:{quiz.pk}:{quiz.version}:{state['n']}:{state['last']}"
+    result = cache.get(key)
+    if result is None:
+        questions = list(quiz.questions.values_list("id", "points"))
+        choices = list(Choice.objects.filter(question__quiz_id=quiz.pk).values_list("id", "question_id", "is_correct"))
+        result = item_statistics(*load_responses(quiz), questions, choices)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,250 @@
+import base64
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_GET
+
+from .models import Announcement, Choice, Course, CourseRun, Module, Quiz, Submission
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+COURSE_FIELDS = ("id", "code", "title", "description", "credits")
+QUIZ_FIELDS = ("id", "title", "time_limit_minutes", "attempts_allowed", "pass_mark_percent")
+SUBMISSION_FIELDS = ("id", "assignment_id", "quiz_id", "submitted_at", "score", "graded_at")
+ANNOUNCEMENT_FIELDS = ("id", "title", "message", "course_run_id", "created_at")
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# -----------------------
+# Version stamps
+# -----------------------
+# Each cacheable resource belongs to one or more scopes ("course:12",
+# "submissions:7", ...). A scope's stamp is a random token plus the time it
+# was set; signals replace it whenever something in the scope changes, so
+# validators are computed from the cache without touching the database. A
+# stamp lost to eviction is simply re-created, which costs one full response.
+# A bump only reaches processes reading the same cache, so validators are
+# only handed out when API_CONDITIONAL_GETS says the cache is shared.
+def _stamp_key(scope):
+    return f"api-stamp:{scope}"
+
+
+def bump(scope):
+    cache.set(_stamp_key(scope), (uuid.uuid4().hex, time.time()), None)
+
+
+def stamp(scope):
+    key = _stamp_key(scope)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, (uuid.uuid4().hex, time.time()), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_course_of(**lookup):
+    """Bump the course scope of the CourseRun matching ``lookup`` (e.g. module__lesson=3)."""
+    course_id = CourseRun.objects.filter(**lookup).values_list("course_id", flat=True).first()
+    if course_id is not None:
+        bump(f"course:{course_id}")
+
+
+def conditional(scopes):
+    """
+    Answer If-None-Match / If-Modified-Since for a view from version stamps.
+
+    ``scopes(request, **kwargs)`` names the scopes the response depends on.
+    The ETag also covers the query string, so each field selection and page
+    validates separately. Matching requests get 304 before the view runs.
+    With API_CONDITIONAL_GETS off, responses carry no validators at all.
+    """
+    def etag(request, *args, **kwargs):
+        tokens = [stamp(scope)[0] for scope in scopes(request, **kwargs)]
+        return hashlib.sha1("|".join([*tokens, request.get_full_path()]).encode()).hexdigest()[:24]
+
+    def last_modified(request, *args, **kwargs):
+        latest = max(stamp(scope)[1] for scope in scopes(request, **kwargs))
+        return datetime.fromtimestamp(int(latest), tz=dt_timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.API_CONDITIONAL_GETS:
+                response = conditional_view(request, *args, **kwargs)
+            else:
+                response = view(request, *args, **kwargs)
+            # Responses are per-user; clients must revalidate before reuse.
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        return wrapped
+    return decorator
+
+
+def api_view(view):
+    """GET-only JSON view: 401 for anonymous users, errors and 404s as JSON."""
+    @require_GET
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "authentication required"}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({"error": str(exc)}, status=exc.status)
+        except Http404:
+            return JsonResponse({"error": "not found"}, status=404)
+    return wrapped
+
+
+# -----------------------
+# Fields and pages
+# -----------------------
+def requested_fields(request, allowed):
+    """Fields named in ``?fields=a,b`` (all of ``allowed`` when absent), in ``allowed`` order."""
+    raw = request.GET.get("fields")
+    if not raw:
+        return list(allowed)
+    wanted = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = wanted.difference(allowed)
+    if unknown:
+        raise ApiError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    return [f for f in allowed if f in wanted]
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("invalid cursor")
+
+
+def paginate(request, queryset, fields):
+    """
+    One page of ``queryset`` as dicts of ``fields``, newest first.
+
+    Keyset pagination on the primary key: ``?cursor=`` resumes after the
+    last row of the previous page, so deep pages cost the same as the first
+    and rows added meanwhile never shift a page.
+    """
+    try:
+        limit = min(max(int(request.GET.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        queryset = queryset.filter(pk__lt=_decode_cursor(cursor))
+    columns = fields if "id" in fields else ["id", *fields]
+    rows = list(queryset.order_by("-pk").values(*columns)[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]["id"]) if len(rows) > limit else None
+    rows = rows[:limit]
+    if "id" not in fields:
+        for row in rows:
+            del row["id"]
+    return {"results": rows, "next_cursor": next_cursor}
+
+
+# -----------------------
+# Endpoints
+# -----------------------
+@api_view
+@conditional(lambda request: ["courses"])
+def courses(request):
+    fields = requested_fields(request, COURSE_FIELDS)
+    return JsonResponse(paginate(request, Course.objects.filter(is_published=True), fields))
+
+
+@api_view
+@conditional(lambda request, pk: [f"course:{pk}"])
+def course_detail(request, pk):
+    fields = requested_fields(request, COURSE_FIELDS + ("outline",))
+    columns = [f for f in fields if f != "outline"]
+    course = Course.objects.filter(pk=pk, is_published=True).values("id", *columns).first()
+    if course is None:
+        raise Http404
+    data = {f: course[f] for f in columns}
+    if "outline" in fields:
+        data["outline"] = course_outline(pk)
+    return JsonResponse(data)
+
+
+def course_outline(course_id):
+    """Modules with their published lessons and visible content titles, in three queries."""
+    modules = Module.objects.filter(course_run__course_id=course_id).prefetch_related("lesson_set__content_set")
+    return [
+        {
+            "id": module.pk,
+            "title": module.title,
+            "lessons": [
+                {
+                    "id": lesson.pk,
+                    "title": lesson.title,
+                    "contents": [
+                        {"id": c.pk, "type": c.type, "title": c.title}
+                        for c in lesson.content_set.all() if c.is_visible
+                    ],
+                }
+                for lesson in module.lesson_set.all() if lesson.is_published
+            ],
+        }
+        for module in modules
+    ]
+
+
+@api_view
+@conditional(lambda request, pk: [f"quiz:{pk}"])
+def quiz_detail(request, pk):
+    fields = requested_fields(request, QUIZ_FIELDS + ("questions",))
+    quiz = Quiz.objects.select_related("content").filter(pk=pk).first()
+    if quiz is None:
+        raise Http404
+    data = {}
+    for field in fields:
+        if field == "title":
+            data["title"] = quiz.content.title
+        elif field == "questions":
+            # is_correct is deliberately left out.
+            choices = {}
+            for choice in Choice.objects.filter(question__quiz=quiz).values("id", "question_id", "text").order_by("id"):
+                choices.setdefault(choice.pop("question_id"), []).append(choice)
+            data["questions"] = [
+                {**question, "choices": choices.get(question["id"], [])}
+                for question in quiz.questions.values("id", "text", "type", "points")
+            ]
+        else:
+            data[field] = getattr(quiz, field)
+    return JsonResponse(data)
+
+
+@api_view
+@conditional(lambda request: [f"submissions:{request.user.pk}"])
+def submissions(request):
+    fields = requested_fields(request, SUBMISSION_FIELDS)
+    return JsonResponse(paginate(request, Submission.objects.filter(student=request.user), fields))
+
+
+@api_view
+@conditional(lambda request: [f"announcements:{request.user.institution_id}"])
+def announcements(request):
+    fields = requested_fields(request, ANNOUNCEMENT_FIELDS)
+    queryset = Announcement.objects.filter(institution_id=request.user.institution_id)
+    return JsonResponse(paginate(request, queryset, fields))
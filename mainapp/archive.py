@@ -0,0 +1,229 @@
+import datetime
+import json
+import time
+import zlib
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .api import bump
+from .models import (
+    ArchivedChunk, Assignment, Attendance, CourseRun, Discussion, Quiz, QuizResponse,
+    SignatureBucket, SimilarityFlag, Submission, SubmissionSignature, Term,
+)
+from .stats import refresh_stats
+
+# Models whose rows are moved, by ArchivedChunk.model.
+ARCHIVED_MODELS = {
+    model._meta.model_name: model
+    for model in (Submission, QuizResponse, SimilarityFlag, Attendance, Discussion)
+}
+
+# Similarity signatures are derived from submission text and only matter
+# while new submissions can still arrive; they are dropped, not archived.
+_DERIVED = (SubmissionSignature, SignatureBucket)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# -----------------------
+# Chunks
+# -----------------------
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _pack(model, rows):
+    document = {"fields": _columns(model), "rows": rows}
+    return zlib.compress(json.dumps(document, cls=DjangoJSONEncoder, separators=(",", ":")).encode(), 6)
+
+
+def _store(term, model, rows):
+    if rows:
+        ArchivedChunk.objects.create(
+            term=term, model=model._meta.model_name,
+            first_pk=rows[0][0], last_pk=rows[-1][0], row_count=len(rows),
+            payload=_pack(model, rows),
+        )
+    return len(rows)
+
+
+def _delete(model, column, ids):
+    # A plain DELETE: Django's cascade collector would load every row and
+    # send post_delete for each, which refreshes stats, bumps API stamps and
+    # queues packages for rows that are only moving. Dependents are deleted
+    # first, explicitly; callers bump the stamps they need once per chunk.
+    if not ids:
+        return
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})", list(ids),
+        )
+
+
+def _check_dependents():
+    handled = set(ARCHIVED_MODELS.values()).union(_DERIVED)
+    for model in ARCHIVED_MODELS.values():
+        for relation in model._meta.related_objects:
+            if relation.related_model not in handled:
+                raise ArchiveError(
+                    f"{relation.related_model.__name__}.{relation.field.name} points at {model.__name__}; "
+                    "teach mainapp.archive what to do with it first."
+                )
+
+
+# -----------------------
+# Moving rows
+# -----------------------
+def _submission_scope(term):
+    path = "content__lesson__module__course_run__term"
+    return Submission.objects.filter(
+        Q(assignment__in=Assignment.objects.filter(**{path: term}))
+        | Q(quiz__in=Quiz.objects.filter(**{path: term}))
+    )
+
+
+def _move_submissions(term, rows):
+    ids = [row[0] for row in rows]
+    responses = list(QuizResponse.objects.filter(submission__in=ids).order_by("pk").values_list(*_columns(QuizResponse)))
+    flags = list(
+        SimilarityFlag.objects.filter(Q(submission__in=ids) | Q(other__in=ids))
+        .order_by("pk").values_list(*_columns(SimilarityFlag))
+    )
+    counts = {
+        "submission": _store(term, Submission, rows),
+        "quizresponse": _store(term, QuizResponse, responses),
+        "similarityflag": _store(term, SimilarityFlag, flags),
+    }
+    _delete(SignatureBucket, "submission_id", ids)
+    _delete(SubmissionSignature, "submission_id", ids)
+    _delete(SimilarityFlag, "id", [flag[0] for flag in flags])
+    _delete(QuizResponse, "submission_id", ids)
+    _delete(Submission, "id", ids)
+    # No post_delete was sent, so students' API submission lists would keep
+    # validating: bump each affected student once the chunk is committed.
+    student = _columns(Submission).index("student_id")
+    transaction.on_commit(partial(_bump_students, {row[student] for row in rows}))
+    return counts
+
+
+def _bump_students(student_ids):
+    for student_id in student_ids:
+        bump(f"submissions:{student_id}")
+
+
+def _move_rows(model):
+    def move(term, rows):
+        count = _store(term, model, rows)
+        _delete(model, "id", [row[0] for row in rows])
+        return {model._meta.model_name: count}
+    return move
+
+
+def _move(term, model, scope, move, chunk_size, pause):
+    # Keyset walk; each chunk is read, stored and deleted in its own short
+    # transaction, so no lock is held for longer than one chunk.
+    moved, after = Counter(), 0
+    while True:
+        with transaction.atomic():
+            rows = list(scope.filter(pk__gt=after).order_by("pk").values_list(*_columns(model))[:chunk_size])
+            if not rows:
+                return moved
+            moved.update(move(term, rows))
+        after = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+
+def closed_terms(today=None):
+    """Terms that ended more than ARCHIVE_AFTER_DAYS days before ``today``."""
+    today = today or timezone.localdate()
+    return Term.objects.filter(end_date__lt=today - datetime.timedelta(days=settings.ARCHIVE_AFTER_DAYS))
+
+
+def archive_term(term, chunk_size=None, pause=0, dry_run=False):
+    """
+    Move a closed term's submissions (with their quiz responses and
+    similarity flags), attendance and discussions into ArchivedChunk rows.
+
+    Work is done ``chunk_size`` rows per transaction (ARCHIVE_CHUNK_SIZE by
+    default), sleeping ``pause`` seconds between chunks; an interrupted run
+    can simply be repeated. The term's CourseRunStats are refreshed once
+    beforehand and then stay as they are. Returns ``{model_name: rows}``;
+    with ``dry_run`` nothing is moved and the counts are what would be.
+    """
+    if not closed_terms().filter(pk=term.pk).exists():
+        raise ArchiveError(f"{term} has not been closed for {settings.ARCHIVE_AFTER_DAYS} days yet.")
+    _check_dependents()
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    submissions = _submission_scope(term)
+    plan = [
+        (Submission, submissions, _move_submissions),
+        (Attendance, Attendance.objects.filter(course_run__term=term), _move_rows(Attendance)),
+        (Discussion, Discussion.objects.filter(course_run__term=term), _move_rows(Discussion)),
+    ]
+    if dry_run:
+        counts = {model._meta.model_name: scope.count() for model, scope, _ in plan}
+        counts["quizresponse"] = QuizResponse.objects.filter(submission__in=submissions).count()
+        counts["similarityflag"] = SimilarityFlag.objects.filter(
+            Q(submission__in=submissions) | Q(other__in=submissions)
+        ).count()
+        return counts
+
+    # Final figures first; compute_stats skips runs of archived terms from
+    # here on, so they do not drop to zero as rows move.
+    refresh_stats(list(CourseRun.objects.filter(term=term).values_list("pk", flat=True)))
+    Term.objects.filter(pk=term.pk, archived_at__isnull=True).update(archived_at=timezone.now())
+    moved = Counter()
+    for model, scope, move in plan:
+        moved.update(_move(term, model, scope, move, chunk_size, pause))
+    return dict(moved)
+
+
+# -----------------------
+# Reading
+# -----------------------
+def archived_rows(model, term=None, **filters):
+    """
+    Yield archived rows of ``model`` as dicts of field values, by primary key.
+
+    ``model`` is a model class or its name ("submission", "attendance", ...).
+    ``filters`` are exact matches on fields, e.g. ``student=7`` or
+    ``pk=120``; a primary key only opens the chunk that holds it, other
+    filters decompress every chunk in scope, one at a time. Archived rows
+    are read-only: nothing here writes back to the live tables.
+    """
+    name = model if isinstance(model, str) else model._meta.model_name
+    if name not in ARCHIVED_MODELS:
+        raise ArchiveError(f"{name} is not archived.")
+    model = ARCHIVED_MODELS[name]
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    wanted = {}
+    for key, value in filters.items():
+        field = model._meta.pk if key == "pk" else model._meta.get_field(key)
+        wanted[field.attname] = field.to_python(value)
+
+    chunks = ArchivedChunk.objects.filter(model=name).order_by("first_pk")
+    if term is not None:
+        chunks = chunks.filter(term=term)
+    pk = wanted.get(model._meta.pk.attname)
+    if pk is not None:
+        chunks = chunks.filter(first_pk__lte=pk, last_pk__gte=pk)
+
+    for payload in chunks.values_list("payload", flat=True).iterator(chunk_size=20):
+        document = json.loads(zlib.decompress(payload))
+        # Columns as they were when archived; ones since dropped stay raw.
+        convert = [(column, fields[column].to_python if column in fields else None) for column in document["fields"]]
+        for values in document["rows"]:
+            row = {column: to_python(value) if to_python else value for (column, to_python), value in zip(convert, values)}
+            if all(row.get(column) == value for column, value in wanted.items()):
+                yield row
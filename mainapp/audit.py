@@ -0,0 +1,196 @@
+import atexit
+import datetime
+import heapq
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+# Segment files are named <hour>-<host>-<pid>-<seq>.jsonl; each process
+# appends to its own, so writers never interleave and need no file locks.
+_HOUR = "%Y%m%d%H"
+
+_lock = threading.Lock()  # guards the buffer
+_write_lock = threading.Lock()  # one batch written at a time per process
+_buffer = []
+_last_flush = time.monotonic()
+_flusher = None
+_segment = {"hour": None, "seq": 0}
+
+
+# -----------------------
+# Recording
+# -----------------------
+def record(kind, obj=None, actor_id=None, object_type=None, object_id=None, **data):
+    """
+    Queue an audit event; it is written with the next batch.
+
+    ``obj`` (or ``object_type``/``object_id``) names what changed. Events
+    are queued once the surrounding transaction commits, so rolled-back
+    changes leave no history. Nothing is recorded when AUDIT_SINK is None.
+    """
+    if not settings.AUDIT_SINK:
+        return
+    event = {
+        "kind": kind,
+        "object_type": object_type or obj._meta.model_name,
+        "object_id": object_id if object_id is not None else obj.pk,
+        "actor_id": actor_id,
+        "data": data,
+    }
+    transaction.on_commit(lambda: _append(event))
+
+
+def _append(event):
+    global _flusher
+    event["at"] = timezone.now()
+    with _lock:
+        _buffer.append(event)
+        due = len(_buffer) >= settings.AUDIT_BATCH_SIZE
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name="audit-flush", daemon=True)
+            _flusher.start()
+    if due:
+        flush()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.AUDIT_FLUSH_INTERVAL)
+        if _buffer and time.monotonic() - _last_flush >= settings.AUDIT_FLUSH_INTERVAL:
+            try:
+                flush()
+            finally:
+                connection.close()
+
+
+def flush():
+    """
+    Write buffered events to the configured sink; returns how many.
+
+    A batch that cannot be written goes back to the buffer for the next
+    flush, up to AUDIT_BUFFER_MAX events, beyond which the oldest are
+    dropped with an error logged.
+    """
+    global _buffer, _last_flush
+    with _lock:
+        batch, _buffer = _buffer, []
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        with _write_lock:
+            if settings.AUDIT_SINK == "jsonl":
+                _write_segment(batch)
+            else:
+                AuditEvent.objects.bulk_create([AuditEvent(**event) for event in batch], batch_size=500)
+    except Exception:
+        logger.exception("Could not write %d audit events", len(batch))
+        with _lock:
+            _buffer[:0] = batch
+            overflow = len(_buffer) - settings.AUDIT_BUFFER_MAX
+            if overflow > 0:
+                logger.error("Audit buffer full, dropping %d oldest events", overflow)
+                del _buffer[:overflow]
+        return 0
+    return len(batch)
+
+
+atexit.register(flush)
+
+
+# -----------------------
+# JSONL segments
+# -----------------------
+def _segment_path(hour, seq):
+    return Path(settings.AUDIT_LOG_DIR) / f"{hour}-{socket.gethostname()}-{os.getpid()}-{seq:04d}.jsonl"
+
+
+def _write_segment(batch):
+    # Batches arrive in time order; an hour boundary or a full segment
+    # starts a new file.
+    Path(settings.AUDIT_LOG_DIR).mkdir(parents=True, exist_ok=True)
+    handle = None
+    try:
+        for event in batch:
+            hour = event["at"].astimezone(datetime.timezone.utc).strftime(_HOUR)
+            if hour != _segment["hour"]:
+                _segment.update(hour=hour, seq=0)
+                handle = handle and handle.close()
+            while handle is None or handle.tell() >= settings.AUDIT_SEGMENT_BYTES:
+                if handle is not None:
+                    _segment["seq"] += 1
+                    handle.close()
+                handle = open(_segment_path(hour, _segment["seq"]), "a", encoding="utf-8")
+            handle.write(json.dumps(event, cls=DjangoJSONEncoder, separators=(",", ":")) + "\n")
+    finally:
+        if handle:
+            handle.close()
+
+
+# -----------------------
+# Replay
+# -----------------------
+def _stream_table(since, until, kinds, object_type, object_id):
+    events = AuditEvent.objects.filter(at__gte=since, at__lt=until).order_by("at", "pk")
+    if kinds:
+        events = events.filter(kind__in=kinds)
+    if object_type:
+        events = events.filter(object_type=object_type)
+    if object_id is not None:
+        events = events.filter(object_id=object_id)
+    fields = ("at", "kind", "object_type", "object_id", "actor_id", "data")
+    for row in events.values_list(*fields).iterator(chunk_size=2000):
+        yield dict(zip(fields, row))
+
+
+def _read_segment(path):
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            event = json.loads(line)
+            event["at"] = parse_datetime(event["at"])
+            yield event
+
+
+def _stream_segments(since, until, kinds, object_type, object_id):
+    by_hour = {}
+    for path in Path(settings.AUDIT_LOG_DIR).glob("*.jsonl"):
+        by_hour.setdefault(path.name.split("-", 1)[0], []).append(path)
+    first, last = since.astimezone(datetime.timezone.utc).strftime(_HOUR), until.astimezone(datetime.timezone.utc).strftime(_HOUR)
+    for hour in sorted(h for h in by_hour if first <= h <= last):
+        # One open file per process segment for this hour, merged by time.
+        for event in heapq.merge(*(_read_segment(p) for p in sorted(by_hour[hour])), key=lambda e: e["at"]):
+            if not since <= event["at"] < until:
+                continue
+            if kinds and event["kind"] not in kinds:
+                continue
+            if object_type and event["object_type"] != object_type:
+                continue
+            if object_id is not None and event["object_id"] != object_id:
+                continue
+            yield event
+
+
+def replay(since, until, kinds=None, object_type=None, object_id=None, source=None):
+    """
+    Yield events with ``since <= at < until`` in time order.
+
+    Reads the table in chunks, or the JSONL segments for the hours in range
+    one line at a time; memory use does not depend on the size of the range.
+    ``source`` is "db" or "jsonl" (AUDIT_SINK by default).
+    """
+    stream = _stream_segments if (source or settings.AUDIT_SINK) == "jsonl" else _stream_table
+    return stream(since, until, kinds, object_type, object_id)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Columns loaded for request.user. Anything else (bio, phone, ...) is
+# deferred and fetched on first access; last_login is kept for the
+# password-reset token. The password hash is never cached: the session auth
+# hash derived from it is cached next to the row instead.
+USER_FIELDS = (
+    "id", "last_login", "is_superuser", "username", "first_name", "last_name",
+    "email", "is_staff", "is_active", "institution_id", "role", "avatar",
+)
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedUserBackend(ModelBackend):
+    """
+    ModelBackend whose get_user() serves request.user from the cache.
+
+    The projected USER_FIELDS row and the user's session auth hash are
+    cached for AUTH_USER_CACHE_TIMEOUT seconds and dropped whenever the user
+    is saved or deleted, so an authenticated request costs no user query in
+    the common case. Writes through ``QuerySet.update()`` bypass the signal
+    and are only picked up once the entry expires.
+
+    The drop only reaches other processes through a shared cache, so
+    settings enable this backend only when DJANGO_SHARED_DIR or
+    DJANGO_REDIS_URL is set.
+    """
+
+    def get_user(self, user_id):
+        User = get_user_model()
+        key = user_cache_key(user_id)
+        cached = cache.get(key)
+        if cached is None:
+            row = User._default_manager.filter(pk=user_id).values_list("password", *USER_FIELDS).first()
+            if row is None:
+                return None
+            user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, row[1:])
+            user.password = row[0]
+            cached = (row[1:], user.get_session_auth_hash())
+            cache.set(key, cached, settings.AUTH_USER_CACHE_TIMEOUT)
+        values, session_auth_hash = cached
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values)
+        user.session_auth_hash = session_auth_hash
+        return user if self.user_can_authenticate(user) else None
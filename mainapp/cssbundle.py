@@ -0,0 +1,71 @@
+import re
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+SOURCE = APP_DIR / "assets" / "utilities.css"
+BUNDLE = APP_DIR / "static" / "mainapp" / "css" / "app.css"
+TEMPLATES = APP_DIR / "templates"
+
+MARKER = "/* utilities */"
+BREAKPOINTS = {"sm": 640, "md": 768, "lg": 1024, "xl": 1280}
+PSEUDO = {"hover": ":hover", "focus": ":focus"}
+
+_CLASS_ATTR = re.compile(r'class="([^"]*)"')
+_TEMPLATE_TAG = re.compile(r"\{%.*?%\}|\{\{.*?\}\}")
+_RULE = re.compile(r"^\.([A-Za-z0-9-]+)([^{]*)\{(.*)\}$")
+
+
+def template_classes(directory=TEMPLATES):
+    """
+    Class names used in ``class`` attributes under ``directory``.
+
+    Template tags are treated as separators, so both branches of
+    ``{% if %}a{% else %}b{% endif %}`` count, as do quoted defaults such
+    as ``{{ tags|default:'bg-blue-100' }}``.
+    """
+    classes = set()
+    for path in directory.rglob("*.html"):
+        text = path.read_text(encoding="utf-8")
+        for attr in _CLASS_ATTR.findall(text):
+            classes.update(_TEMPLATE_TAG.sub(" ", attr).split())
+        for default in re.findall(r"\|default:'([^']*)'", text):
+            classes.update(default.split())
+    return classes
+
+
+def _escape(name):
+    return name.replace(":", "\\:")
+
+
+def build_bundle(source=SOURCE, classes=None):
+    """Return the CSS of ``source`` reduced to ``classes`` (those used in templates by default)."""
+    classes = template_classes() if classes is None else classes
+    base, _, utilities = source.read_text(encoding="utf-8").partition(MARKER)
+    rules = {}  # class name -> [(selector suffix, declarations)], in source order
+    for line in utilities.splitlines():
+        match = _RULE.match(line.strip())
+        if match:
+            name, selector, body = match.groups()
+            rules.setdefault(name, []).append((selector, body))
+
+    # Source order is cascade order, so rules are emitted in it: plain
+    # utilities, then state variants, then each breakpoint.
+    def emit(prefix, state=""):
+        return [
+            f".{_escape(prefix + name)}{state}{selector}{{{body}}}"
+            for name, bodies in rules.items() if prefix + name in classes
+            for selector, body in bodies
+        ]
+
+    plain = emit("")
+    for variant, state in PSEUDO.items():
+        plain += emit(f"{variant}:", state)
+    responsive = {bp: emit(f"{bp}:") for bp in BREAKPOINTS}
+
+    # Drop the comment header; keep the rest of the base layer verbatim.
+    base = re.sub(r"/\*.*?\*/", "", base, flags=re.S).strip()
+    css = [base, *plain]
+    for bp, rules_at in responsive.items():
+        if rules_at:
+            css.append(f"@media (min-width:{BREAKPOINTS[bp]}px){{{''.join(rules_at)}}}")
+    return "\n".join(css) + "\n"
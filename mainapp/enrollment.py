@@ -0,0 +1,151 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .audit import record
+from .models import CourseRun, Enrollment, Term
+from .stats import schedule_refresh
+
+
+# -----------------------
+# Run resolution
+# -----------------------
+def current_run_for(course, today=None):
+    """
+    Return the CourseRun students should join for ``course`` today.
+
+    Prefers a run whose term covers ``today``; otherwise the default "Main"
+    run of the current or next term is fetched or created. Returns None when
+    the institution has no term to attach a run to.
+    """
+    today = today or timezone.localdate()
+    runs = CourseRun.objects.filter(course=course).select_related("term")
+    run = (
+        runs.filter(term__start_date__lte=today, term__end_date__gte=today)
+        .order_by("term__start_date", "id")
+        .first()
+    )
+    if run is not None:
+        return run
+
+    term = (
+        Term.objects.filter(institution_id=course.institution_id, end_date__gte=today)
+        .order_by("start_date", "id")
+        .first()
+    )
+    if term is None:
+        return runs.order_by("-term__start_date", "id").first()
+
+    # (course, term, name) is unique, so concurrent first clicks converge on one row.
+    run, _ = CourseRun.objects.get_or_create(
+        course=course,
+        term=term,
+        name="Main",
+        defaults={"institution_id": course.institution_id},
+    )
+    return run
+
+
+# -----------------------
+# Seats
+# -----------------------
+def _claim_seat(run_id):
+    # A single conditional UPDATE: the database serialises concurrent claims on
+    # the row, so enrolled_count can never pass capacity.
+    return CourseRun.objects.filter(pk=run_id).filter(
+        Q(capacity=0) | Q(enrolled_count__lt=F("capacity"))
+    ).update(enrolled_count=F("enrolled_count") + 1) == 1
+
+
+def _release_seat(run_id):
+    CourseRun.objects.filter(pk=run_id, enrolled_count__gt=0).update(
+        enrolled_count=F("enrolled_count") - 1
+    )
+
+
+# -----------------------
+# Enrollment
+# -----------------------
+def enroll(course_run, student):
+    """
+    Enroll ``student`` in ``course_run``, or waitlist them when it is full.
+
+    Safe to call concurrently: the seat is claimed atomically and the
+    (course_run, student) constraint absorbs double clicks. Returns the
+    student's Enrollment.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                enrollment = Enrollment.objects.create(
+                    institution_id=course_run.institution_id,
+                    course_run=course_run,
+                    student=student,
+                    status="waitlisted",
+                    is_active=False,
+                )
+        except IntegrityError:
+            enrollment = Enrollment.objects.get(course_run=course_run, student=student)
+            if enrollment.status != "dropped":
+                return enrollment
+            if not Enrollment.objects.filter(pk=enrollment.pk, status="dropped").update(
+                status="waitlisted", date_enrolled=timezone.now()
+            ):
+                enrollment.refresh_from_db()
+                return enrollment
+
+        if _claim_seat(course_run.pk):
+            Enrollment.objects.filter(pk=enrollment.pk).update(status="enrolled", is_active=True)
+            schedule_refresh(course_run.pk)
+        enrollment.refresh_from_db()
+        record(f"enrollment.{enrollment.status}", enrollment, actor_id=student.pk, course_run=course_run.pk)
+    return enrollment
+
+
+def drop(enrollment):
+    """Drop an enrollment, freeing its seat for the head of the waitlist."""
+    with transaction.atomic():
+        freed = Enrollment.objects.filter(pk=enrollment.pk, status="enrolled").update(
+            status="dropped", is_active=False
+        )
+        if not freed:
+            Enrollment.objects.filter(pk=enrollment.pk, status="waitlisted").update(
+                status="dropped", is_active=False
+            )
+        else:
+            _release_seat(enrollment.course_run_id)
+            promote_waitlist(enrollment.course_run_id)
+            schedule_refresh(enrollment.course_run_id)
+        record("enrollment.dropped", enrollment, actor_id=enrollment.student_id, course_run=enrollment.course_run_id)
+    enrollment.refresh_from_db()
+    return enrollment
+
+
+def promote_waitlist(run_id):
+    """
+    Move waitlisted students into free seats, oldest first.
+
+    Also called after a run's capacity is raised. Returns the promoted
+    enrollment ids.
+    """
+    promoted = []
+    with transaction.atomic():
+        while True:
+            next_id = (
+                Enrollment.objects.filter(course_run_id=run_id, status="waitlisted")
+                .order_by("date_enrolled", "id")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if next_id is None or not _claim_seat(run_id):
+                break
+            if Enrollment.objects.filter(pk=next_id, status="waitlisted").update(
+                status="enrolled", is_active=True
+            ):
+                promoted.append(next_id)
+                record("enrollment.promoted", object_type="enrollment", object_id=next_id, course_run=run_id)
+            else:
+                _release_seat(run_id)
+        if promoted:
+            schedule_refresh(run_id)
+    return promoted
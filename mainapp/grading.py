@@ -0,0 +1,234 @@
+import datetime
+import json
+import uuid
+import zlib
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .api import bump
+from .audit import record
+from .models import Choice, Question, Quiz, QuizResponse, Submission
+from .stats import schedule_refresh
+
+
+class SyncError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def score_answers(submission, quiz, questions, answers, choices):
+    """
+    Return ``(score, responses)`` for one attempt.
+
+    ``answers`` maps question ids to a choice id (or None); ``choices`` maps
+    choice ids to Choice-like objects with ``question_id`` and
+    ``is_correct``. A choice belonging to another question counts as no
+    answer. The QuizResponse objects are returned unsaved.
+    """
+    responses, score = [], 0
+    for question in questions:
+        selected_choice = choices.get(answers.get(question.id))
+        if selected_choice and selected_choice.question_id != question.id:
+            selected_choice = None
+        if selected_choice and selected_choice.is_correct:
+            score += question.points
+        responses.append(QuizResponse(
+            submission=submission,
+            question=question,
+            selected_choice_id=selected_choice.pk if selected_choice else None,
+            quiz=quiz,
+        ))
+    return score, responses
+
+
+# -----------------------
+# Offline sync
+# -----------------------
+def read_batch(request):
+    """
+    Decode a sync batch from ``request``: JSON, optionally gzip-compressed.
+
+    The decompressed size is capped at QUIZ_SYNC_MAX_BYTES, so a small
+    compressed body cannot expand without bound.
+    """
+    body, limit = request.body, settings.QUIZ_SYNC_MAX_BYTES
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, limit + 1)
+        except zlib.error:
+            raise SyncError("body is not valid gzip")
+    if len(body) > limit:
+        raise SyncError("batch too large", status=413)
+    try:
+        batch = json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise SyncError("body is not valid JSON")
+    attempts = batch.get("attempts") if isinstance(batch, dict) else None
+    if not isinstance(attempts, list):
+        raise SyncError("expected {\"attempts\": [...]}")
+    if len(attempts) > settings.QUIZ_SYNC_MAX_ATTEMPTS:
+        raise SyncError(f"at most {settings.QUIZ_SYNC_MAX_ATTEMPTS} attempts per batch", status=413)
+    return attempts
+
+
+def _parse_attempt(raw):
+    """Validate the shape of one attempt; return ``(key, quiz_id, started, submitted, answers)``."""
+    if not isinstance(raw, dict):
+        raise ValueError("attempt must be an object")
+    try:
+        key = uuid.UUID(str(raw["key"]))
+        quiz_id = int(raw["quiz"])
+        started = parse_datetime(str(raw["started_at"]))
+        submitted = parse_datetime(str(raw["submitted_at"]))
+        answers = {int(q): (int(c) if c not in (None, "") else None) for q, c in dict(raw.get("answers", {})).items()}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("needs key, quiz, started_at, submitted_at and answers {question: choice}")
+    if started is None or submitted is None or timezone.is_naive(started) or timezone.is_naive(submitted):
+        raise ValueError("timestamps must be ISO 8601 with a UTC offset")
+    return key, quiz_id, started, submitted, answers
+
+
+def _check_times(quiz, started, submitted, now):
+    skew = datetime.timedelta(seconds=settings.QUIZ_SYNC_CLOCK_SKEW)
+    if submitted < started:
+        return "submitted before it was started"
+    if submitted > now + skew:
+        return "submitted in the future"
+    if quiz.time_limit_minutes:
+        allowed = datetime.timedelta(minutes=quiz.time_limit_minutes) + skew
+        if submitted - started > allowed:
+            return f"took longer than the {quiz.time_limit_minutes} minute limit"
+    return None
+
+
+def sync_attempts(student, attempts):
+    """
+    Grade and store offline quiz ``attempts`` for ``student`` in one go.
+
+    Each attempt carries a client-generated ``key``; attempts already stored
+    under that key are reported as duplicates, so a batch can be re-sent
+    until it is acknowledged. Whatever the batch size the work is a fixed
+    number of queries: quizzes, questions, choices and known keys are read
+    once, and submissions and responses are inserted with two bulk_create
+    calls in a single transaction. Submissions keep the client's validated
+    ``submitted_at``. bulk_create sends no post_save, so the API stamp and
+    the course run stats refresh the signals would have handled are done here.
+
+    Returns one result dict per attempt, in order.
+    """
+    now = timezone.now()
+    results, parsed = [], []
+    for raw in attempts:
+        try:
+            parsed.append(_parse_attempt(raw))
+            results.append(None)
+        except ValueError as exc:
+            parsed.append(None)
+            results.append({"key": raw.get("key") if isinstance(raw, dict) else None, "status": "rejected", "error": str(exc)})
+
+    valid = [p for p in parsed if p]
+    quizzes = Quiz.objects.in_bulk({p[1] for p in valid})
+    questions = {}
+    for question in Question.objects.filter(quiz__in=quizzes):
+        questions.setdefault(question.quiz_id, []).append(question)
+    choices = Choice.objects.filter(question__quiz__in=quizzes).only("id", "question", "is_correct").in_bulk()
+
+    for attempt in range(2):
+        known = dict(
+            Submission.objects.filter(student=student, idempotency_key__in=[p[0] for p in valid])
+            .values_list("idempotency_key", "pk")
+        )
+        pending, seen = [], set()
+        for i, item in enumerate(parsed):
+            if item is None or (results[i] and results[i]["status"] == "rejected"):
+                continue
+            key, quiz_id, started, submitted, answers = item
+            if key in known or key in seen:
+                results[i] = {"key": str(key), "status": "duplicate", "submission": known.get(key)}
+                continue
+            quiz = quizzes.get(quiz_id)
+            problem = "unknown quiz" if quiz is None else _check_times(quiz, started, submitted, now)
+            if problem:
+                results[i] = {"key": str(key), "status": "rejected", "error": problem}
+                continue
+            seen.add(key)
+            submission = Submission(quiz=quiz, student=student, idempotency_key=key, submitted_at=submitted)
+            submission.score, responses = score_answers(submission, quiz, questions.get(quiz_id, []), answers, choices)
+            pending.append((i, submission, responses))
+        try:
+            with transaction.atomic():
+                Submission.objects.bulk_create([s for _, s, _ in pending])
+                QuizResponse.objects.bulk_create([r for _, _, responses in pending for r in responses])
+                for _, submission, _ in pending:
+                    record("submission.created", submission, actor_id=student.pk, score=submission.score, offline=True)
+            break
+        except IntegrityError:
+            # A concurrent retry of this batch stored some keys first; their
+            # attempts are duplicates now.
+            if attempt:
+                raise
+    if pending:
+        bump(f"submissions:{student.pk}")
+        for quiz_id in {submission.quiz_id for _, submission, _ in pending}:
+            schedule_refresh(quiz=quiz_id)
+    stored = {}
+    for i, submission, _ in pending:
+        stored[str(submission.idempotency_key)] = submission.pk
+        results[i] = {
+            "key": str(submission.idempotency_key), "status": "accepted",
+            "submission": submission.pk, "score": submission.score,
+        }
+    for result in results:
+        if result["status"] == "duplicate" and result["submission"] is None:
+            result["submission"] = stored.get(result["key"])  # repeated within this batch
+    return results
+
+
+# -----------------------
+# Grading queue
+# -----------------------
+def grading_queue(assignment, after=0, limit=None):
+    """
+    The next ``limit`` ungraded submissions to ``assignment`` (GRADING_QUEUE_PAGE
+    by default) with pk above ``after``, oldest first, students included: one
+    query.
+    """
+    limit = limit or settings.GRADING_QUEUE_PAGE
+    return list(
+        Submission.objects.filter(assignment=assignment, score__isnull=True, pk__gt=after)
+        .select_related("student").order_by("pk")[:limit]
+    )
+
+
+def save_grades(assignment, grader, scores):
+    """
+    Store ``scores`` ({submission_id: Decimal}) for submissions to
+    ``assignment`` and return the graded submissions.
+
+    One read and one bulk_update whatever the batch size. Ids of other
+    assignments' submissions are ignored; a score outside 0..max_points
+    raises ValueError and nothing is saved. bulk_update sends no post_save,
+    so the audit events and API stamps the signals would have handled are
+    recorded here.
+    """
+    for pk, score in scores.items():
+        if not 0 <= score <= assignment.max_points:
+            raise ValueError(f"Score {score} for submission {pk} is outside 0-{assignment.max_points}.")
+    now = timezone.now()
+    with transaction.atomic():
+        submissions = list(
+            Submission.objects.filter(assignment=assignment, pk__in=list(scores))
+            .only("pk", "student", "score", "graded_by", "graded_at")
+        )
+        for submission in submissions:
+            submission.score, submission.graded_by, submission.graded_at = scores[submission.pk], grader, now
+            record("submission.graded", submission, actor_id=grader.pk, score=submission.score, graded_at=now)
+        Submission.objects.bulk_update(submissions, ["score", "graded_by", "graded_at"])
+    for student_id in {s.student_id for s in submissions}:
+        bump(f"submissions:{student_id}")
+    return submissions
@@ -0,0 +1,118 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+# name -> (longest edge in px, crop to square)
+RENDITIONS = {
+    "thumb": (64, True),
+    "small": (160, True),
+    "medium": (400, True),
+    "logo": (240, False),
+}
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Upload directories whose images may be rendered; keeps the rendition view
+# from being pointed at arbitrary media files.
+SOURCE_PREFIXES = ("avatars/", "institutions/logos/")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renditions")
+
+
+class UnreadableImage(Exception):
+    """The source is not an image, or is too large to decode safely."""
+
+
+def rendition_name(name, size, fmt):
+    return f"renditions/{size}/{os.path.splitext(name)[0]}.{fmt}"
+
+
+def render(name, size, fmt, storage=None):
+    """
+    Render one rendition of the image ``name`` and cache it on disk.
+
+    Returns the rendition's storage name; existing renditions are reused.
+    Raises UnreadableImage when Pillow cannot or will not open the source.
+    """
+    from PIL import Image, ImageOps  # imported here to keep Pillow out of worker boot
+
+    storage = storage or default_storage
+    target = rendition_name(name, size, fmt)
+    if storage.exists(target):
+        return target
+
+    edge, crop = RENDITIONS[size]
+    pil_format, _, options = FORMATS[fmt]
+    with storage.open(name, "rb") as source:
+        try:
+            image = ImageOps.exif_transpose(Image.open(source))
+            if crop:
+                image = ImageOps.fit(image, (edge, edge), Image.LANCZOS)
+            else:
+                image.thumbnail((edge, edge), Image.LANCZOS)
+        except (OSError, Image.DecompressionBombError) as exc:  # UnidentifiedImageError is an OSError
+            raise UnreadableImage(f"{name}: {exc}") from exc
+    if pil_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, "white")
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    storage.save(target, ContentFile(buffer.getvalue()))
+    return target
+
+
+def ensure_renditions(name, sizes, storage=None):
+    try:
+        for size in sizes:
+            for fmt in FORMATS:
+                render(name, size, fmt, storage)
+    except UnreadableImage:
+        # Retrying will not help; pages keep linking the original.
+        logger.warning("Not rendering %s", name, exc_info=True)
+
+
+def schedule_renditions(fieldfile, sizes):
+    """
+    Render ``sizes`` for a freshly saved image once the transaction commits.
+
+    Work runs on a small thread pool so uploads return immediately; set
+    ``IMAGE_RENDITIONS_ASYNC = False`` to render inline (tests, scripts).
+    """
+    if not fieldfile:
+        return
+    name, storage = fieldfile.name, fieldfile.storage
+
+    def run():
+        if jobs.queued():
+            jobs.enqueue("renditions", name, list(sizes))
+        elif settings.IMAGE_RENDITIONS_ASYNC:
+            _executor.submit(ensure_renditions, name, sizes, storage)
+        else:
+            ensure_renditions(name, sizes, storage)
+
+    transaction.on_commit(run)
+
+
+def record_savings(request, fieldfile, rendition):
+    """Add the bytes a rendition saved over its original to ``request``."""
+    storage = fieldfile.storage
+    try:
+        saved = storage.size(fieldfile.name) - storage.size(rendition)
+    except OSError:
+        return
+    request.image_bytes_saved = getattr(request, "image_bytes_saved", 0) + saved
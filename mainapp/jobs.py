@@ -0,0 +1,103 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Queueable work by name. Arguments must be JSON-serializable, and every task
+# must be safe to run twice: a worker that dies mid-job has it retried.
+TASKS = {
+    "renditions": "mainapp.images.ensure_renditions",
+    "similarity": "mainapp.similarity.index_submission",
+    "course_package": "mainapp.packages.build_package",
+}
+
+
+def queued():
+    """True when background work goes through the shared Job table (JOB_BACKEND 'db')."""
+    return settings.JOB_BACKEND == "db"
+
+
+def enqueue(task, *args):
+    """
+    Queue ``task`` for a `run_jobs` worker on any node.
+
+    Call it after commit, as the thread pools are. A job identical to one
+    still waiting is dropped, so a burst of edits queues one rebuild.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown job task {task!r}")
+    key = f"{task}:{json.dumps(args, separators=(',', ':'))}"[:255]
+    Job.objects.bulk_create([Job(task=task, args=list(args), key=key)], ignore_conflicts=True)
+
+
+# -----------------------
+# Workers
+# -----------------------
+def _ready(now):
+    stale = now - datetime.timedelta(seconds=settings.JOB_CLAIM_TIMEOUT)
+    return Job.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale), attempts__lt=settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim(worker):
+    """
+    Claim the oldest runnable job for ``worker``, or return None.
+
+    The claim is a conditional UPDATE, so two workers never get the same
+    job. Jobs claimed more than JOB_CLAIM_TIMEOUT seconds ago, by a worker
+    that has presumably died, are runnable again.
+    """
+    now = timezone.now()
+    for pk in _ready(now).order_by("pk").values_list("pk", flat=True)[:10]:
+        claimed = _ready(now).filter(pk=pk).update(claimed_at=now, claimed_by=worker, attempts=F("attempts") + 1)
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Run a claimed job; delete it when done, release it for a retry when not."""
+    try:
+        import_string(TASKS[job.task])(*job.args)
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed, attempt %d", job.pk, job.task, job.attempts)
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            Job.objects.filter(pk=job.pk).update(last_error=repr(exc))  # kept for inspection
+            return False
+        try:
+            Job.objects.filter(pk=job.pk).update(claimed_at=None, claimed_by="", last_error=repr(exc))
+        except IntegrityError:
+            Job.objects.filter(pk=job.pk).delete()  # the same work was queued again meanwhile
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def work(max_jobs=None, idle_exit=False):
+    """Claim and run jobs until ``max_jobs`` have run (forever by default); returns how many ran."""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = claim(worker)
+        if job is None:
+            if idle_exit:
+                break
+            connection.close()
+            time.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        run(job)
+        done += 1
+    return done
@@ -0,0 +1,164 @@
+import hashlib
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, quote, urlsplit
+
+from django.core.cache import cache
+
+# Bump when the sanitizer output changes so cached bodies are re-rendered.
+RENDER_VERSION = 1
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "caption", "code", "em", "figcaption",
+    "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "li", "ol",
+    "p", "pre", "span", "strong", "sub", "sup", "table", "tbody", "td", "tfoot",
+    "th", "thead", "tr", "u", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "abbr": {"title"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_SCHEMES = {"", "http", "https", "mailto"}
+# Dropped together with everything inside them.
+DROPPED_TAGS = {"script", "style", "iframe", "object", "embed", "template", "noscript"}
+VOID_TAGS = {"br", "hr", "img"}
+
+_CONTROL = re.compile(r"[\x00-\x20\x7f]+")
+
+
+# -----------------------
+# Sanitizing
+# -----------------------
+def _safe_url(value):
+    scheme = urlsplit(_CONTROL.sub("", value)).scheme.lower()
+    return scheme in ALLOWED_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not _safe_url(value):
+                continue
+            parts.append(f'{name}="{escape(value)}"')
+        if tag == "a":
+            parts.append('rel="noopener nofollow"')
+        elif tag == "img":
+            parts.append('loading="lazy" decoding="async"')
+        self.out.append(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        self.out.extend(f"</{tag}>" for tag in reversed(self.open_tags))
+        return "".join(self.out)
+
+
+def sanitize_html(html):
+    """Reduce author HTML to an allowlist of tags, attributes and URL schemes."""
+    parser = _Sanitizer()
+    parser.feed(html)
+    return parser.result()
+
+
+def render_body(body):
+    """
+    Return the sanitized HTML for a ``Content.body``.
+
+    Output is cached under the SHA-256 of the source, so each distinct body is
+    sanitized once and edits are picked up without explicit invalidation.
+    """
+    if not body:
+        return ""
+    digest = hashlib.sha256(body.encode()).hexdigest()
+    key = f"content-html:{RENDER_VERSION}:{digest}"
+    html = cache.get(key)
+    if html is None:
+        html = sanitize_html(body)
+        cache.set(key, html, None)
+    return html
+
+
+# -----------------------
+# Embeds
+# -----------------------
+def video_embed_url(url):
+    """Return an iframe URL for YouTube/Vimeo links, or None for direct video files."""
+    parts = urlsplit(url or "")
+    host = parts.netloc.lower().removeprefix("www.").removeprefix("m.")
+    video_id = None
+    if host == "youtu.be":
+        video_id = parts.path.strip("/")
+    elif host in ("youtube.com", "youtube-nocookie.com"):
+        if parts.path.startswith("/embed/"):
+            video_id = parts.path.split("/")[2]
+        else:
+            video_id = parse_qs(parts.query).get("v", [None])[0]
+    if video_id:
+        return f"https://www.youtube-nocookie.com/embed/{quote(video_id, safe='')}?autoplay=1"
+    if host == "vimeo.com" and parts.path.strip("/").isdigit():
+        return f"https://player.vimeo.com/video/{parts.path.strip('/')}?autoplay=1"
+    return None
+
+
+# -----------------------
+# Lessons
+# -----------------------
+def lesson_items(lesson, eager=3):
+    """
+    Load a lesson's visible Content in one ordered query, ready to render.
+
+    The first ``eager`` items are rendered normally; later ones are marked
+    ``deferred`` so the template can let the browser skip their layout until
+    they scroll into view. Videos are always rendered as click-to-load
+    facades and files as links, so no heavy resource loads with the page.
+    """
+    items = []
+    contents = lesson.content_set.filter(is_visible=True).select_related("quiz", "assignment")
+    for index, content in enumerate(contents):
+        item = {"content": content, "deferred": index >= eager, "html": render_body(content.body)}
+        if content.type == "video":
+            item["embed_url"] = video_embed_url(content.video_url)
+        items.append(item)
+    return items
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.archive import ArchiveError, archive_term, closed_terms
+from mainapp.models import Term
+
+
+class Command(BaseCommand):
+    help = "Move submissions, attendance and discussions of closed terms into compressed archive chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--term", type=int, action="append", dest="terms", help="Only these term ids.")
+        parser.add_argument("--chunk-size", type=int, help="Rows per transaction (ARCHIVE_CHUNK_SIZE by default).")
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between chunks.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be moved.")
+
+    def handle(self, *args, **options):
+        terms = Term.objects.filter(pk__in=options["terms"]) if options["terms"] else closed_terms()
+        for term in terms.order_by("end_date"):
+            try:
+                counts = archive_term(term, options["chunk_size"], options["pause"], options["dry_run"])
+            except ArchiveError as exc:
+                raise CommandError(str(exc))
+            summary = ", ".join(f"{n} {name}" for name, n in sorted(counts.items())) or "nothing to move"
+            verb = "would move" if options["dry_run"] else "moved"
+            self.stdout.write(f"{term} (#{term.pk}): {verb} {summary}")
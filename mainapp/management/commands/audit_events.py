@@ -0,0 +1,46 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from mainapp.audit import flush, replay
+
+
+def _moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a date or datetime: {value!r}")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = "Stream audit events in a time range as JSON lines, oldest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", required=True, help="Start (inclusive), e.g. 2026-01-31 or 2026-01-31T08:00Z.")
+        parser.add_argument("--until", help="End (exclusive); defaults to now.")
+        parser.add_argument("--kind", action="append", dest="kinds", help="Only these kinds, e.g. submission.graded.")
+        parser.add_argument("--object", help="Only events about one object, e.g. submission:42.")
+        parser.add_argument("--source", choices=["db", "jsonl"], help="Where to read from (AUDIT_SINK by default).")
+        parser.add_argument("--count", action="store_true", help="Print the number of matching events only.")
+
+    def handle(self, *args, **options):
+        since = _moment(options["since"])
+        until = _moment(options["until"]) if options["until"] else timezone.now()
+        object_type = object_id = None
+        if options["object"]:
+            object_type, _, object_id = options["object"].partition(":")
+            object_id = int(object_id) if object_id else None
+        flush()  # include anything this process has buffered
+        events = replay(since, until, options["kinds"], object_type, object_id, options["source"])
+        if options["count"]:
+            self.stdout.write(str(sum(1 for _ in events)))
+            return
+        for event in events:
+            self.stdout.write(json.dumps(event, cls=DjangoJSONEncoder, separators=(",", ":")))
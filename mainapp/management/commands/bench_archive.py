@@ -0,0 +1,148 @@
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import override_settings
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from mainapp.archive import archive_term, archived_rows
+from mainapp.models import (
+    AcademicYear, ArchivedChunk, Assignment, Attendance, Content, Course, CourseRun, Discussion,
+    Institution, Lesson, Module, Question, Quiz, QuizResponse, Submission, Term, User,
+)
+
+
+class Command(BaseCommand):
+    help = "Time hot-table queries for the current term before and after archiving closed terms."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--closed-terms", type=int, default=6)
+        parser.add_argument("--students", type=int, default=300)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Runs against a throwaway copy of the schema, like the test suite.
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(AUDIT_SINK=None):
+                self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        institution = Institution.objects.create(name="Bench", slug="bench")
+        students = User.objects.bulk_create(
+            [User(username=f"s{i}", institution=institution) for i in range(options["students"])]
+        )
+        today = timezone.localdate()
+        terms = []
+        for n in range(options["closed_terms"], -1, -1):
+            end = today - datetime.timedelta(days=150 * n) + datetime.timedelta(days=30)
+            year = AcademicYear.objects.create(
+                institution=institution, name=f"Y{n}", start_date=end - datetime.timedelta(days=110), end_date=end,
+            )
+            term = Term.objects.create(
+                institution=institution, academic_year=year, name="Term", start_date=year.start_date, end_date=end,
+            )
+            terms.append((term, self._seed_term(institution, term, students)))
+        current, (run, quiz) = terms[-1]
+        student = students[0]
+
+        hot = {
+            "student's recent submissions": lambda: list(
+                Submission.objects.filter(student=student).order_by("-submitted_at")[:20]
+            ),
+            "quiz attempt count": lambda: Submission.objects.filter(quiz=quiz).aggregate(Count("pk")),
+            "quiz responses for analysis": lambda: list(QuizResponse.objects.filter(quiz=quiz).values_list("question", "selected_choice")),
+            "run attendance rate": lambda: Attendance.objects.filter(course_run=run).aggregate(
+                n=Count("pk"), attended=Count("pk", filter=Q(status="present")),
+            ),
+            "run discussion page": lambda: list(Discussion.objects.filter(course_run=run).order_by("-created_at")[:20]),
+            "ungraded submissions (scan)": lambda: Submission.objects.filter(score__isnull=True).count(),
+        }
+        self._analyze()
+        before = self._measure(hot, options["repeat"])
+        self.stdout.write(self._sizes("before"))
+
+        started = time.perf_counter()
+        for term, _ in terms[:-1]:
+            archive_term(term)
+        elapsed = time.perf_counter() - started
+        self._analyze()
+        after = self._measure(hot, options["repeat"])
+        self.stdout.write(self._sizes("after "))
+        packed = sum(len(p) for p in ArchivedChunk.objects.values_list("payload", flat=True))
+        self.stdout.write(f"archived {options['closed_terms']} terms in {elapsed:.2f} s; chunks hold {packed / 1024:.0f} KiB")
+
+        for label in hot:
+            self.stdout.write(f"{label:30} {before[label]:8.3f} ms -> {after[label]:8.3f} ms")
+        started = time.perf_counter()
+        found = sum(1 for _ in archived_rows(Submission, term=terms[0][0], student=student.pk))
+        self.stdout.write(f"read path: {found} archived submissions of one student in one term, "
+                          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _seed_term(self, institution, term, students):
+        course = Course.objects.create(institution=institution, code=f"C{term.pk}", title="Course")
+        run = CourseRun.objects.create(institution=institution, course=course, term=term)
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="M"), title="L")
+        assignments = [
+            Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title=f"A{i}"))
+            for i in range(5)
+        ]
+        quizzes = [Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title=f"Q{i}")) for i in range(5)]
+        questions = {
+            quiz.pk: Question.objects.bulk_create([Question(quiz=quiz, text=f"q{i}") for i in range(10)]) for quiz in quizzes
+        }
+        submissions = Submission.objects.bulk_create(
+            [Submission(assignment=a, student=s, text_answer="answer " * 40) for a in assignments for s in students]
+            + [Submission(quiz=q, student=s, score=5) for q in quizzes for s in students],
+            batch_size=500,
+        )
+        QuizResponse.objects.bulk_create(
+            [
+                QuizResponse(submission=sub, question=question, quiz_id=sub.quiz_id)
+                for sub in submissions if sub.quiz_id for question in questions[sub.quiz_id]
+            ],
+            batch_size=500,
+        )
+        Attendance.objects.bulk_create(
+            [
+                Attendance(course_run=run, student=s, date=term.start_date + datetime.timedelta(days=d),
+                           status="present" if (s.pk + d) % 5 else "absent")
+                for s in students for d in range(30)
+            ],
+            batch_size=500,
+        )
+        Discussion.objects.bulk_create(
+            [Discussion(course_run=run, user=students[i % len(students)], content="post " * 20) for i in range(500)],
+            batch_size=500,
+        )
+        return run, quizzes[0]
+
+    def _analyze(self):
+        # Fresh planner statistics on both sides, so plans reflect table sizes.
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _measure(self, queries, repeat):
+        results = {}
+        for label, query in queries.items():
+            query()  # warm the page cache
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                timings.append(time.perf_counter() - started)
+            results[label] = statistics.median(timings) * 1000
+        return results
+
+    def _sizes(self, label):
+        counts = ", ".join(
+            f"{model.__name__} {model.objects.count()}" for model in (Submission, QuizResponse, Attendance, Discussion)
+        )
+        return f"{label}: {counts}"
@@ -0,0 +1,52 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+
+from mainapp.models import User
+
+CONFIGS = [
+    ("db sessions, full user", "django.contrib.sessions.backends.db", "django.contrib.auth.backends.ModelBackend"),
+    ("cached_db sessions, cached user", "django.contrib.sessions.backends.cached_db", "mainapp.auth.CachedUserBackend"),
+    ("signed cookies, cached user", "django.contrib.sessions.backends.signed_cookies", "mainapp.auth.CachedUserBackend"),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure authenticated request overhead on dashboard and profile per session/auth setup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Runs against a throwaway copy of the schema, like the test suite.
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            user = User.objects.create_user("bench-auth", "bench@example.com", "x", bio="x" * 4000)
+            for label, engine, backend in CONFIGS:
+                with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]):
+                    client = Client()
+                    client.force_login(user, backend=backend)
+                    for view in ("dashboard", "users_profile"):
+                        self._measure(client, label, reverse(view), options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _measure(self, client, label, path, n):
+        client.get(path)  # warm caches and templates
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(n):
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        self.stdout.write(
+            f"{label:34} {path:10} median {statistics.median(timings) * 1000:6.2f} ms, "
+            f"{len(queries) / n:.1f} queries/request"
+        )
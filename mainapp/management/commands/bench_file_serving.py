@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from mainapp.storage import ContentAddressedStorage, serve_file
+
+
+class _FieldFile:
+    # Just enough of FieldFile for serve_file.
+    def __init__(self, storage, name):
+        self.storage, self.name = storage, name
+
+
+class Command(BaseCommand):
+    help = "Compare buffered and streamed downloads of a large content file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=300)
+
+    def handle(self, *args, **options):
+        size = options["size_mb"] * 1024 * 1024
+        with tempfile.TemporaryDirectory() as root:
+            storage = ContentAddressedStorage(location=root)
+            source = os.path.join(root, "source.bin")
+            with open(source, "wb") as handle:
+                block = os.urandom(1024 * 1024)
+                for _ in range(options["size_mb"]):
+                    handle.write(block)
+            with open(source, "rb") as handle:
+                name = storage.save("content/files/lecture.mp4", File(handle))
+            os.remove(source)
+
+            field = _FieldFile(storage, name)
+            request = RequestFactory().get("/")
+            ranged = RequestFactory().get("/", HTTP_RANGE=f"bytes={size // 2}-{size // 2 + 1024 * 1024 - 1}")
+
+            def buffered():
+                with storage.open(name, "rb") as handle:
+                    return HttpResponse(handle.read())
+
+            self._measure("buffered HttpResponse", buffered)
+            self._measure("streamed serve_file", lambda: serve_file(request, field))
+            self._measure("1 MiB Range request", lambda: serve_file(ranged, field))
+
+    def _measure(self, label, build):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = build()
+        sent = 0
+        for chunk in response:
+            sent += len(chunk)
+        response.close()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{label:<24} {sent / 1048576:8.1f} MiB  {elapsed * 1000:8.1f} ms  peak {peak / 1048576:8.1f} MiB"
+        )
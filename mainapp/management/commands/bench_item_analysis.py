@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from mainapp.analytics import item_statistics
+
+
+class Command(BaseCommand):
+    help = "Time item_statistics on synthetic quiz responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--responses", type=int, default=100_000)
+        parser.add_argument("--questions", type=int, default=40)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        n_questions, n_choices = options["questions"], options["choices"]
+        n_attempts = max(options["responses"] // n_questions, 1)
+
+        questions = [(q + 1, 1) for q in range(n_questions)]
+        choices = [
+            (q * n_choices + c + 1, q + 1, c == 0)
+            for q in range(n_questions) for c in range(n_choices)
+        ]
+        submission_ids = np.repeat(np.arange(1, n_attempts + 1), n_questions)
+        question_ids = np.tile(np.arange(1, n_questions + 1), n_attempts)
+        # Stronger students pick the correct (first) choice more often.
+        ability = np.repeat(rng.random(n_attempts), n_questions)
+        picks = np.where(rng.random(len(question_ids)) < ability, 0, rng.integers(1, n_choices, len(question_ids)))
+        choice_ids = (question_ids - 1) * n_choices + picks + 1
+
+        timings = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            result = item_statistics(submission_ids, question_ids, choice_ids, questions, choices)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"{result['responses']} responses, {n_questions} questions: "
+            f"best {min(timings) * 1000:.1f} ms, median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms"
+        )
@@ -0,0 +1,80 @@
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from mainapp.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Flood login with bad passwords while a student browses, on a fixed pool of "
+        "workers, and report the student's latency with and without rate limiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="size of the simulated worker pool")
+        parser.add_argument("--attack-rate", type=int, default=20, help="bad logins per second")
+        parser.add_argument("--seconds", type=float, default=5)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger("django.request").setLevel(logging.ERROR)  # one warning per 429 otherwise
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            student = User.objects.create_user("student", "student@example.com", "right")
+            browser = Client()
+            browser.force_login(student)
+            self.cookies = browser.cookies
+            for enabled in (False, True):
+                with override_settings(RATE_LIMITS_ENABLED=enabled):
+                    self._run("rate limiting on " if enabled else "rate limiting off", options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, label, options):
+        local = threading.local()
+
+        def client():
+            if not hasattr(local, "client"):
+                local.client = Client()
+            return local.client
+
+        def attack():
+            return client().post(reverse("login"), {"username": "student@example.com", "password": "wrong"}).status_code
+
+        def browse(queued_at):
+            c = client()
+            c.cookies = self.cookies
+            c.get(reverse("users_profile"))
+            return time.perf_counter() - queued_at
+
+        pool = ThreadPoolExecutor(max_workers=options["workers"])
+        attacks, visits = [], []
+        started = time.perf_counter()
+        next_attack = next_visit = started
+        while time.perf_counter() - started < options["seconds"]:
+            now = time.perf_counter()
+            if now >= next_attack:
+                attacks.append(pool.submit(attack))
+                next_attack += 1 / options["attack_rate"]
+            if now >= next_visit:
+                visits.append(pool.submit(browse, now))
+                next_visit += 0.1
+            time.sleep(0.001)
+        latencies = sorted(f.result() for f in visits)
+        statuses = [f.result() for f in attacks]
+        pool.shutdown()
+        self.stdout.write(
+            f"{label}: student median {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms; "
+            f"{len(statuses)} bad logins, {statuses.count(429)} rejected with 429"
+        )
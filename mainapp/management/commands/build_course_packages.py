@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import CourseRun
+from mainapp.packages import build_package
+
+
+class Command(BaseCommand):
+    help = "Build offline packages (and deltas) for course runs whose contents changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", type=int, action="append", dest="runs", help="Limit to these course run ids.")
+        parser.add_argument("--all", action="store_true", help="Include runs that have never been packaged.")
+
+    def handle(self, *args, **options):
+        runs = CourseRun.objects.order_by("pk")
+        if options["runs"]:
+            runs = runs.filter(pk__in=options["runs"])
+        elif not options["all"]:
+            runs = runs.filter(packages__isnull=False).distinct()
+        for run_id in runs.values_list("pk", flat=True):
+            package = build_package(run_id)
+            deltas = package.course_run.packages.filter(version=package.version, base_version__isnull=False)
+            sizes = ", ".join(f"from v{d.base_version} {d.size} B" for d in deltas.order_by("-base_version"))
+            self.stdout.write(f"run {run_id}: v{package.version} {package.size} B" + (f" ({sizes})" if sizes else ""))
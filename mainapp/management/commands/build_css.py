@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.cssbundle import BUNDLE, SOURCE, build_bundle
+
+
+class Command(BaseCommand):
+    help = "Build the purged CSS bundle from mainapp/assets/utilities.css and the classes templates use."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Fail if the committed bundle is out of date.")
+
+    def handle(self, *args, **options):
+        css = build_bundle()
+        current = BUNDLE.read_text(encoding="utf-8") if BUNDLE.exists() else None
+        if options["check"]:
+            if css != current:
+                raise CommandError(f"{BUNDLE} is out of date; run manage.py build_css.")
+            self.stdout.write(self.style.SUCCESS("CSS bundle is up to date."))
+            return
+        BUNDLE.parent.mkdir(parents=True, exist_ok=True)
+        BUNDLE.write_text(css, encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {BUNDLE} ({len(css.encode())} bytes, {len(SOURCE.read_bytes())} in the source)."
+        ))
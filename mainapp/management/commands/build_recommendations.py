@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored \"students also took\" neighbours of every course from enrollments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, help="Neighbours per course (RECOMMENDATIONS_TOP_K by default).")
+        parser.add_argument("--min-shared", type=int, help="Students two courses must share (RECOMMENDATIONS_MIN_SHARED).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stored = build_recommendations(options["top"], options["min_shared"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} course neighbour(s) in {time.perf_counter() - started:.2f} s."
+        ))
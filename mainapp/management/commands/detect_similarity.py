@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import Submission
+from mainapp.similarity import index_submission
+
+
+class Command(BaseCommand):
+    help = "(Re)index text submissions for similarity and flag near-duplicates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assignment", type=int, action="append", dest="assignments")
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.filter(assignment__isnull=False).exclude(text_answer="")
+        if options["assignments"]:
+            submissions = submissions.filter(assignment_id__in=options["assignments"])
+        indexed = flagged = 0
+        for submission_id in submissions.order_by("pk").values_list("pk", flat=True).iterator():
+            flagged += len(index_submission(submission_id)) // 2
+            indexed += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} submission(s), flagged {flagged} pair(s)."))
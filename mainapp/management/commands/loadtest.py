@@ -0,0 +1,273 @@
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Round-robin TCP proxy standing in for the load balancer: each client
+# connection goes to the next node. Prints connections per node on SIGTERM.
+PROXY = r"""
+import asyncio, json, os, signal, sys
+port, backends = int(sys.argv[1]), [int(p) for p in sys.argv[2:]]
+counts = [0] * len(backends)
+turn = 0
+
+async def pipe(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def handle(client_reader, client_writer):
+    global turn
+    index, turn = turn, (turn + 1) % len(backends)
+    counts[index] += 1
+    try:
+        node_reader, node_writer = await asyncio.open_connection("127.0.0.1", backends[index])
+    except OSError:
+        client_writer.close()
+        return
+    await asyncio.gather(pipe(client_reader, node_writer), pipe(node_reader, client_writer))
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    print("ready", flush=True)
+    await stop.wait()
+    print(json.dumps(counts), flush=True)
+    os._exit(0)  # drop open pipes rather than cancel them noisily
+
+asyncio.run(main())
+"""
+
+def _client(port, paths, cookie, seconds, results):
+    # One load-generating process: sequential requests, a new connection each
+    # time so the proxy spreads them over the nodes.
+    latencies, errors = {name: [] for name in paths}, 0
+    deadline = time.perf_counter() + seconds
+    names = list(paths)
+    i = 0
+    while time.perf_counter() < deadline:
+        name = names[i % len(names)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request("GET", paths[name], headers={"Cookie": cookie, "Connection": "close"})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+        except OSError:
+            errors += 1
+            continue
+        if response.status != 200:
+            errors += 1
+            continue
+        latencies[name].append(time.perf_counter() - started)
+    results.put((latencies, errors))
+
+
+def _request(port, method, path, cookie, headers=None, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request(method, path, body=body, headers={"Cookie": cookie, **(headers or {})})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        "Run N gunicorn nodes sharing DJANGO_SHARED_DIR behind a round-robin proxy and measure "
+        "dashboard and quiz throughput as nodes are added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nodes", default="1,2,4", help="Node counts to measure, e.g. 1,2,4.")
+        parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers per node.")
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent load-generating processes.")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--port", type=int, default=8700)
+
+    def handle(self, *args, **options):
+        if not settings.SHARED_DIR:
+            # Re-run in a scratch deployment: its own database, shared state
+            # directory and production settings, so nothing here is touched.
+            with tempfile.TemporaryDirectory(prefix="olms-loadtest-") as shared:
+                env = {
+                    **os.environ, "DJANGO_SHARED_DIR": shared, "DJANGO_DEBUG": "0",
+                    "DJANGO_DB_PATH": os.path.join(shared, "db.sqlite3"),
+                }
+                code = subprocess.call([sys.executable, *sys.argv], env=env)
+            if code:
+                raise CommandError(f"Load test failed ({code}).")
+            return
+
+        call_command("migrate", verbosity=0)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        quiz_path, cookies = self._seed(options["clients"])
+        paths = {"dashboard": "/", "quiz": quiz_path}
+
+        baseline = None
+        for nodes in [int(n) for n in options["nodes"].split(",")]:
+            with self._cluster(nodes, options) as proxy_port:
+                if nodes > 1:
+                    self._check_shared_state(options["port"] + 1, options["port"] + 2, cookies[0], quiz_path)
+                rate, latencies, errors = self._load(proxy_port, paths, cookies, options)
+            baseline = baseline or rate / nodes
+            p95 = {name: statistics.quantiles(l, n=20)[-1] * 1000 if len(l) > 1 else 0 for name, l in latencies.items()}
+            self.stdout.write(
+                f"{nodes} node(s) x {options['workers']} workers: {rate:7.1f} req/s "
+                f"({rate / (baseline * nodes):.0%} of linear), "
+                f"p95 dashboard {p95['dashboard']:.0f} ms, quiz {p95['quiz']:.0f} ms, "
+                f"{errors} errors, connections per node {self.spread}"
+            )
+
+    # -----------------------
+    # Setup
+    # -----------------------
+    def _seed(self, clients):
+        import datetime
+
+        from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+        from django.contrib.sessions.backends.cached_db import SessionStore
+        from django.utils import timezone
+
+        from mainapp.models import (
+            AcademicYear, Choice, Content, Course, CourseRun, Enrollment, Institution, Lesson, Module,
+            Question, Quiz, Term, User,
+        )
+
+        today = timezone.localdate()
+        institution = Institution.objects.create(name="Load test", slug="loadtest")
+        year = AcademicYear.objects.create(
+            institution=institution, name="Load", start_date=today - datetime.timedelta(days=30),
+            end_date=today + datetime.timedelta(days=300),
+        )
+        term = Term.objects.create(
+            institution=institution, academic_year=year, name="Term 1",
+            start_date=year.start_date, end_date=year.end_date,
+        )
+        course = Course.objects.create(institution=institution, code="LOAD101", title="Load", is_published=True)
+        run = CourseRun.objects.create(institution=institution, course=course, term=term)
+        lesson = Lesson.objects.create(
+            module=Module.objects.create(course_run=run, title="Week 1"), title="Lesson", is_published=True,
+        )
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Quiz"))
+        for i in range(20):
+            question = Question.objects.create(quiz=quiz, text=f"Question {i}")
+            Choice.objects.bulk_create(Choice(question=question, text=f"Choice {c}", is_correct=c == 0) for c in range(4))
+
+        cookies = []
+        for i in range(clients):
+            student = User.objects.create_user(f"load{i}", f"load{i}@example.com", "x", institution=institution)
+            Enrollment.objects.create(institution=institution, course_run=run, student=student)
+            session = SessionStore()
+            session[SESSION_KEY] = str(student.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = student.get_session_auth_hash()
+            session.create()
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={session.session_key}")
+        return f"/quizzes/{quiz.pk}/", cookies
+
+    def _cluster(self, nodes, options):
+        command = self
+
+        class Cluster:
+            def __enter__(self):
+                base = options["port"]
+                env = {**os.environ, "GUNICORN_WORKERS": str(options["workers"])}
+                self.processes = [subprocess.Popen(
+                    [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{base + 1 + n}"],
+                    env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                ) for n in range(nodes)]
+                self.processes.append(subprocess.Popen(
+                    [sys.executable, "manage.py", "run_jobs"], cwd=settings.BASE_DIR,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                ))
+                self.proxy = subprocess.Popen(
+                    [sys.executable, "-c", PROXY, str(base), *(str(base + 1 + n) for n in range(nodes))],
+                    stdout=subprocess.PIPE, text=True,
+                )
+                self.proxy.stdout.readline()
+                for n in range(nodes):
+                    command._wait_for(base + 1 + n)
+                return base
+
+            def __exit__(self, *exc):
+                self.proxy.send_signal(signal.SIGTERM)
+                command.spread = json.loads(self.proxy.stdout.readline() or "[]")
+                self.proxy.wait()
+                for process in self.processes:
+                    process.terminate()
+                for process in self.processes:
+                    process.wait()
+
+        return Cluster()
+
+    def _wait_for(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                _request(port, "GET", "/login/", "")
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Node on port {port} did not start.")
+
+    def _check_shared_state(self, first, second, cookie, quiz_path):
+        # A quiz submitted through one node must invalidate the submissions
+        # API validator that another node hands out: per-process caches fail this.
+        before = _request(second, "GET", "/api/submissions/", cookie)
+        page = _request(first, "GET", quiz_path, cookie)
+        token = page.getheader("Set-Cookie", "").split("csrftoken=")[1].split(";")[0]
+        cookies = f"{cookie}; csrftoken={token}"
+        submitted = _request(
+            first, "POST", f"{quiz_path}submit/", cookies,
+            {"X-CSRFToken": token, "Content-Type": "application/x-www-form-urlencoded"}, "",
+        )
+        after = _request(second, "GET", "/api/submissions/", cookie, {"If-None-Match": before.getheader("ETag")})
+        if submitted.status != 302 or after.status != 200:
+            raise CommandError(
+                f"Nodes disagree: submit returned {submitted.status}, the other node answered {after.status}."
+            )
+        self.stdout.write("shared state: a submission through one node is visible to the other")
+
+    # -----------------------
+    # Load
+    # -----------------------
+    def _load(self, port, paths, cookies, options):
+        for cookie in cookies:  # warm every worker's templates and caches
+            for path in paths.values():
+                _request(port, "GET", path, cookie)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=_client, args=(port, paths, cookies[i], options["seconds"], results))
+            for i in range(options["clients"])
+        ]
+        for client in clients:
+            client.start()
+        latencies, errors = {name: [] for name in paths}, 0
+        for _ in clients:
+            client_latencies, client_errors = results.get()
+            errors += client_errors
+            for name, values in client_latencies.items():
+                latencies[name] += values
+        for client in clients:
+            client.join()
+        total = sum(len(values) for values in latencies.values())
+        return total / options["seconds"], latencies, errors
@@ -0,0 +1,79 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter, the way a non-preloaded worker starts.
+CHILD = r"""
+import io, json, sys, time
+started = time.perf_counter()
+import django
+django.setup(set_prefix=False)
+setup_done = time.perf_counter()
+import olms.wsgi
+wsgi_done = time.perf_counter()
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": %(path)r, "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+}
+first_started = time.perf_counter()
+b"".join(olms.wsgi.application(environ, lambda status, headers: None))
+first_done = time.perf_counter()
+print(json.dumps({
+    "setup": setup_done - started,
+    "wsgi": wsgi_done - setup_done,
+    "first_request": first_done - first_started,
+    "boot_to_first_response": first_done - started,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Report per-module import time, app-ready time and worker boot time with and without warmup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Number of slowest imports to list.")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--path", default="/login/", help="URL used for the first request.")
+
+    def _run(self, warmup, importtime=False, path="/login/"):
+        env = dict(os.environ, OLMS_WARMUP="1" if warmup else "0", DJANGO_SETTINGS_MODULE=os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "olms.settings"))
+        command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD % {"path": path}]
+        result = subprocess.run(command, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, check=True)
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        _, stderr = self._run(warmup=False, importtime=True, path=options["path"])
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+            imports.append((int(cumulative_us), int(self_us), name))
+
+        self.stdout.write(f"Slowest imports (cumulative ms / self ms), {len(imports)} modules:")
+        for cumulative_us, self_us, name in sorted(imports, reverse=True)[:options["top"]]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+        project = [i for i in imports if i[2].startswith(("mainapp", "olms"))]
+        self.stdout.write("Project modules:")
+        for cumulative_us, self_us, name in sorted(project, reverse=True):
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+        for warmup in (False, True):
+            runs = [self._run(warmup, path=options["path"])[0] for _ in range(options["repeat"])]
+            median = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            label = "with warmup (preload master)" if warmup else "cold worker"
+            self.stdout.write(
+                f"{label}: setup {median['setup']:.0f} ms, wsgi import {median['wsgi']:.0f} ms, "
+                f"first request {median['first_request']:.0f} ms, total {median['boot_to_first_response']:.0f} ms"
+            )
+        self.stdout.write(
+            "With preload_app the master pays setup, wsgi import and warmup once; "
+            "each forked worker pays only the warm first request."
+        )
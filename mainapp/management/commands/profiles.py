@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.profiling import load_report, reports
+
+
+class Command(BaseCommand):
+    help = "List stored request profiles, or show one with its hottest functions and SQL timeline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", help="Report to show; lists reports when omitted.")
+        parser.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls...).")
+        parser.add_argument("--limit", type=int, default=30, help="Functions to list.")
+        parser.add_argument("--path", help="When listing, only reports whose path contains this.")
+
+    def handle(self, *args, **options):
+        if not options["name"]:
+            for report in reports():
+                if options["path"] and options["path"] not in report["path"]:
+                    continue
+                self.stdout.write(
+                    f"{report['name']}  {report['status']}  {report['ms']:8.1f} ms  "
+                    f"{report['sql_count']:3} queries {report['sql_ms']:7.1f} ms  {report['method']} {report['path']}"
+                )
+            return
+        try:
+            summary, stats = load_report(options["name"], options["sort"], options["limit"])
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"{summary['method']} {summary['path']} -> {summary['status']} in {summary['ms']:.1f} ms, "
+            f"{summary['sql_count']} queries in {summary['sql_ms']:.1f} ms"
+        )
+        self.stdout.write(stats)
+        self.stdout.write("SQL timeline (start ms, duration ms):")
+        for query in summary["queries"]:
+            self.stdout.write(f"  {query['start_ms']:9.2f} {query['ms']:8.2f}  {query['sql'][:200]}")
@@ -0,0 +1,34 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from mainapp.archive import ARCHIVED_MODELS, ArchiveError, archived_rows
+
+
+class Command(BaseCommand):
+    help = "Print archived rows as JSON lines, e.g. query_archive submission --where student=7."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(ARCHIVED_MODELS))
+        parser.add_argument("--term", type=int, help="Only rows archived from this term id.")
+        parser.add_argument("--where", action="append", default=[], help="field=value; may be repeated.")
+        parser.add_argument("--count", action="store_true", help="Print the number of matching rows only.")
+
+    def handle(self, *args, **options):
+        filters = {}
+        for condition in options["where"]:
+            field, sep, value = condition.partition("=")
+            if not sep:
+                raise CommandError(f"Expected field=value, got {condition!r}")
+            filters[field] = value
+        try:
+            rows = archived_rows(options["model"], options["term"], **filters)
+            if options["count"]:
+                self.stdout.write(str(sum(1 for _ in rows)))
+                return
+            for row in rows:
+                self.stdout.write(json.dumps(row, cls=DjangoJSONEncoder, separators=(",", ":")))
+        except (ArchiveError, FieldDoesNotExist, ValidationError) as exc:
+            raise CommandError(str(exc))
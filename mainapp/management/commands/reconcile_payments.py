@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.payments import CHUNK_SIZE, read_statement, reconcile, refresh_balances
+
+
+class Command(BaseCommand):
+    help = "Reconcile a gateway statement CSV against Payment references, or rebuild student balances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", nargs="?", help="CSV with reference, amount and status columns.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+        parser.add_argument("--discrepancies", metavar="CSV", help="Write unmatched lines to this file.")
+        parser.add_argument("--rebuild-balances", action="store_true", help="Recompute every StudentBalance.")
+
+    def handle(self, *args, **options):
+        if options["rebuild_balances"]:
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {refresh_balances()} student balance(s)."))
+            return
+        if not options["statement"]:
+            raise CommandError("Give a statement file or --rebuild-balances.")
+        try:
+            summary, discrepancies = reconcile(
+                read_statement(options["statement"]), options["chunk_size"], options["dry_run"]
+            )
+        except (OSError, KeyError) as exc:
+            raise CommandError(f"Cannot read statement: {exc}")
+
+        if options["discrepancies"]:
+            with open(options["discrepancies"], "w", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(["line", "reference", "problem"])
+                writer.writerows(discrepancies)
+        else:
+            for line_no, reference, problem in discrepancies:
+                self.stdout.write(f"line {line_no}: {reference}: {problem}")
+
+        self.stdout.write(self.style.SUCCESS(
+            ("Dry run: " if options["dry_run"] else "")
+            + f"{summary['lines']} line(s), {summary['matched']} matched, {summary['updated']} status update(s), "
+            f"{len(discrepancies)} discrepanc{'y' if len(discrepancies) == 1 else 'ies'}, "
+            f"{summary['students']} student balance(s) affected."
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.stats import check_stats, refresh_dirty, refresh_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild CourseRunStats from source tables, or check them for drift with --check. "
+        "Run it with --dirty every minute or so: writes only mark their run dirty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", type=int, action="append", dest="runs", help="Limit to these course run ids.")
+        parser.add_argument("--check", action="store_true", help="Report drift without writing; exit non-zero if any.")
+        parser.add_argument("--dirty", action="store_true", help="Only refresh runs changed since their last refresh.")
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+        if options["check"]:
+            drift = check_stats(runs)
+            for run_id, field, stored, expected in drift:
+                self.stdout.write(f"run {run_id}: {field} is {stored}, expected {expected}")
+            if drift:
+                raise CommandError(f"{len(drift)} course run stat(s) out of date.")
+            self.stdout.write(self.style.SUCCESS("Course run stats are consistent."))
+            return
+        updated = refresh_dirty() if options["dirty"] else refresh_stats(runs)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} course run stat row(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (JOB_BACKEND 'db'); start one or more per node."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs.")
+        parser.add_argument("--until-idle", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        done = work(options["max_jobs"], idle_exit=options["until_idle"])
+        self.stdout.write(f"Ran {done} job(s).")
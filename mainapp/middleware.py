@@ -0,0 +1,55 @@
+import logging
+import random
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageSavingsMiddleware:
+    """
+    Report how many image bytes renditions saved on the rendered page.
+
+    The {% picture %} tag only counts them while IMAGE_SAVINGS_REPORT is
+    on; otherwise this is a getattr per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        saved = getattr(request, "image_bytes_saved", None)
+        if saved is not None:
+            response["X-Image-Bytes-Saved"] = str(saved)
+            logger.debug("%s: renditions saved %d image bytes", request.path, saved)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a PROFILE_SAMPLE_RATE fraction of requests, plus staff requests
+    that send the PROFILE_HEADER header; see mainapp.profiling.
+
+    Only installed when PROFILING is on. Requests that are not picked cost a
+    random() call and a header lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._wanted(request):
+            return self.get_response(request)
+        from .profiling import profile
+
+        response, name = profile(request, self.get_response)
+        response["X-Profile-Report"] = name
+        logger.info("Profiled %s %s: %s", request.method, request.path, name)
+        return response
+
+    def _wanted(self, request):
+        rate, header = settings.PROFILE_SAMPLE_RATE, settings.PROFILE_HEADER
+        if rate and random.random() < rate:
+            return True
+        return bool(header and request.headers.get(header) and request.user.is_staff)
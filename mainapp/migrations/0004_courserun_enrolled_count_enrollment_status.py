@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:06
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_enrollment_state(apps, schema_editor):
+    Enrollment = apps.get_model('mainapp', 'Enrollment')
+    CourseRun = apps.get_model('mainapp', 'CourseRun')
+    Enrollment.objects.filter(is_active=False).update(status='dropped')
+    runs = CourseRun.objects.annotate(active=Count('enrollment', filter=Q(enrollment__is_active=True)))
+    for run in runs.iterator():
+        CourseRun.objects.filter(pk=run.pk).update(enrolled_count=run.active)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0003_user_avatar_user_bio_user_last_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courserun',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='status',
+            field=models.CharField(choices=[('enrolled', 'Enrolled'), ('waitlisted', 'Waitlisted'), ('dropped', 'Dropped')], default='enrolled', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course_run', 'status', 'date_enrolled'], name='mainapp_enr_course__7caca6_idx'),
+        ),
+        migrations.RunPython(backfill_enrollment_state, migrations.RunPython.noop),
+    ]
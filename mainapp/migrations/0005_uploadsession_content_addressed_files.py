@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:08
+
+import django.db.models.deletion
+import mainapp.storage
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0004_courserun_enrolled_count_enrollment_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='content',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=mainapp.storage.content_storage, upload_to='content/files/'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=mainapp.storage.content_storage, upload_to='submissions/'),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('received', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0005_uploadsession_content_addressed_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRunStats',
+            fields=[
+                ('course_run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='mainapp.courserun')),
+                ('enrolled_count', models.PositiveIntegerField(default=0)),
+                ('assignment_count', models.PositiveIntegerField(default=0)),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('quiz_attempt_count', models.PositiveIntegerField(default=0)),
+                ('average_quiz_score', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('attendance_count', models.PositiveIntegerField(default=0)),
+                ('attended_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
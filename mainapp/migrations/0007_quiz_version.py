@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0006_courserunstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0007_quiz_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSignature',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='mainapp.submission')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SignatureBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.assignment')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainapp.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignment', 'band', 'bucket'], name='mainapp_sig_assignm_be47a2_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarityFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mainapp.submission')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_flags', to='mainapp.submission')),
+            ],
+            options={
+                'ordering': ['-similarity'],
+                'unique_together': {('submission', 'other')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0008_submission_similarity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='mainapp_att_date_3364af_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', 'date_enrolled'], name='mainapp_enr_status_177bd6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='mainapp_pay_status_c4bb18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at'], name='mainapp_sub_submitt_278ff2_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0009_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('student', 'idempotency_key'), name='unique_submission_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0010_submission_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentBalance',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0011_student_balance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='academicyear',
+            index=models.Index(fields=['institution', 'start_date', 'end_date'], name='mainapp_aca_institu_14c948_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courserun',
+            index=models.Index(fields=['start_date', 'end_date'], name='mainapp_cou_start_d_53b425_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['institution', 'start_date', 'end_date'], name='mainapp_ter_institu_81933c_idx'),
+        ),
+    ]
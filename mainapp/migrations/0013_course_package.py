@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:42
+
+import django.db.models.deletion
+import mainapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0012_calendar_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoursePackage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('base_version', models.PositiveIntegerField(blank=True, null=True)),
+                ('archive', models.FileField(storage=mainapp.storage.content_storage, upload_to='packages/')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('manifest', models.JSONField(default=dict)),
+                ('built_at', models.DateTimeField(auto_now_add=True)),
+                ('course_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='packages', to='mainapp.courserun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course_run', '-version'], name='mainapp_cou_course__681406_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('base_version__isnull', True)), fields=('course_run', 'version'), name='unique_full_course_package'), models.UniqueConstraint(fields=('course_run', 'version', 'base_version'), name='unique_course_package_delta')],
+            },
+        ),
+    ]
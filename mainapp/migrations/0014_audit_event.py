@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:52
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0013_course_package'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+                ('kind', models.CharField(max_length=40)),
+                ('object_type', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['at'], name='mainapp_aud_at_e6453b_idx'), models.Index(fields=['object_type', 'object_id', 'at'], name='mainapp_aud_object__a8d057_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0014_audit_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='term',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('first_pk', models.BigIntegerField()),
+                ('last_pk', models.BigIntegerField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chunks', to='mainapp.term')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'model', 'first_pk'], name='mainapp_arc_term_id_c9590d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0015_term_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('shared_students', models.PositiveIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='mainapp.course')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='mainapp.course')),
+            ],
+            options={
+                'ordering': ['course', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('course', 'rank'), name='unique_course_neighbour_rank')],
+            },
+        ),
+    ]
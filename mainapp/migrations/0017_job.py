@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0016_course_neighbour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=64)),
+                ('args', models.JSONField(default=list)),
+                ('key', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=128)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['claimed_at', 'id'], name='mainapp_job_claimed_054b03_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('claimed_at__isnull', True)), fields=('key',), name='unique_pending_job')],
+            },
+        ),
+    ]
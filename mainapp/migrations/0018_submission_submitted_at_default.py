@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0017_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
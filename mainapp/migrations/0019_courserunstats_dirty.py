@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0018_submission_submitted_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courserunstats',
+            name='dirty',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -1,10 +1,15 @@
 # core/models.py
+import uuid
+
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 
+from .storage import content_storage
+
 
 class Institution(models.Model):
     name = models.CharField(max_length=255)
@@ -38,6 +43,15 @@ class User(AbstractUser):
     bio = models.TextField(blank=True)
     avatar = models.ImageField(upload_to="avatars/", blank=True, null=True)
 
+    session_auth_hash = None  # set by mainapp.auth.CachedUserBackend, which does not load password
+
+    def get_session_auth_hash(self):
+        return self.session_auth_hash or super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self.session_auth_hash = None
+        super().set_password(raw_password)
+
 
 
 class Profile(models.Model):
@@ -63,7 +77,7 @@ class AcademicYear(models.Model):
     name = models.CharField(max_length=64)  # e.g., 2025/2026
     start_date = models.DateField()
     end_date = models.DateField()
-    is_current = models.BooleanField(default=False)
+    is_current = models.BooleanField(default=False)  # informational; see mainapp.academic_calendar
 
     def __str__(self):
         return self.name
@@ -71,6 +85,13 @@ class AcademicYear(models.Model):
 
     class Meta:
         unique_together = ("institution", "name")
+        indexes = [models.Index(fields=["institution", "start_date", "end_date"])]
+
+
+class TermManager(models.Manager):
+    # __str__ shows the academic year, so fetch it with the term.
+    def get_queryset(self):
+        return super().get_queryset().select_related("academic_year")
 
 
 class Term(models.Model):
@@ -79,6 +100,9 @@ class Term(models.Model):
     name = models.CharField(max_length=64) # Term 1, Term 2, etc.
     start_date = models.DateField()
     end_date = models.DateField()
+    archived_at = models.DateTimeField(null=True, blank=True)  # set by mainapp.archive
+
+    objects = TermManager()
 
     def __str__(self):
         return f"{self.name} ({self.academic_year.name})"
@@ -86,6 +110,7 @@ class Term(models.Model):
 
     class Meta:
         unique_together = ("academic_year", "name")
+        indexes = [models.Index(fields=["institution", "start_date", "end_date"])]
 
 class Department(models.Model):
     institution = models.ForeignKey(Institution, on_delete=models.CASCADE)
@@ -136,6 +161,7 @@ class CourseRun(models.Model): # aka Section/Offering in a specific term
     name = models.CharField(max_length=64, default="Main")
     teachers = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="teaching_runs", blank=True)
     capacity = models.PositiveIntegerField(default=0) # 0 = unlimited
+    enrolled_count = models.PositiveIntegerField(default=0) # maintained by mainapp.enrollment
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
 
@@ -145,6 +171,7 @@ class CourseRun(models.Model): # aka Section/Offering in a specific term
 
     class Meta:
         unique_together = ("course", "term", "name")
+        indexes = [models.Index(fields=["start_date", "end_date"])]
 
 
 class Enrollment(models.Model):
@@ -153,11 +180,18 @@ class Enrollment(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date_enrolled = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
-
-   
+    status = models.CharField(
+        max_length=16,
+        choices=[("enrolled", "Enrolled"), ("waitlisted", "Waitlisted"), ("dropped", "Dropped")],
+        default="enrolled",
+    )
 
     class Meta:
         unique_together = ("course_run", "student")
+        indexes = [
+            models.Index(fields=["course_run", "status", "date_enrolled"]),
+            models.Index(fields=["status", "date_enrolled"]),
+        ]
 
 
 class Module(models.Model):
@@ -190,7 +224,7 @@ class Content(models.Model):
     type = models.CharField(max_length=16, choices=CONTENT_TYPES)
     title = models.CharField(max_length=255)
     body = models.TextField(blank=True) # for text/HTML
-    file = models.FileField(upload_to="content/files/", blank=True, null=True)
+    file = models.FileField(upload_to="content/files/", storage=content_storage, blank=True, null=True)
     video_url = models.URLField(blank=True, null=True)
     link_url = models.URLField(blank=True, null=True)
     order = models.PositiveIntegerField(default=0)
@@ -216,6 +250,7 @@ class Quiz(models.Model):
     shuffle_questions = models.BooleanField(default=True)
     shuffle_choices = models.BooleanField(default=True)
     pass_mark_percent = models.DecimalField(max_digits=5, decimal_places=2, default=50)
+    version = models.PositiveIntegerField(default=1) # bumped when questions or choices change
 
 class Question(models.Model):
     QUIZ_TYPES = [("mcq", "Multiple Choice"), ("tf", "True/False"), ("short", "Short Answer"), ("numeric", "Numeric")]
@@ -240,12 +275,72 @@ class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, null=True, blank=True)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, null=True, blank=True)
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    submitted_at = models.DateTimeField(auto_now_add=True)
-    file = models.FileField(upload_to="submissions/", blank=True, null=True)
+    submitted_at = models.DateTimeField(default=timezone.now)  # offline sync stores the client's time
+    file = models.FileField(upload_to="submissions/", storage=content_storage, blank=True, null=True)
     text_answer = models.TextField(blank=True)
     score = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     graded_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="graded_submissions")
     graded_at = models.DateTimeField(null=True, blank=True)
+    # Sent with the submit form; a retried POST with the same key returns the
+    # first submission instead of creating another.
+    idempotency_key = models.UUIDField(null=True, blank=True, editable=False)
+
+    GRADE_FIELDS = ("score", "graded_by_id", "graded_at")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The grade as loaded, so saves that change it are audited without a read.
+        if all(f in instance.__dict__ for f in cls.GRADE_FIELDS):
+            instance._loaded_grade = tuple(instance.__dict__[f] for f in cls.GRADE_FIELDS)
+        return instance
+
+    class Meta:
+        indexes = [models.Index(fields=["submitted_at"])]
+        constraints = [
+            models.UniqueConstraint(fields=["student", "idempotency_key"], name="unique_submission_idempotency_key"),
+        ]
+
+# MinHash signature and LSH buckets of a text submission; see mainapp.similarity.
+class SubmissionSignature(models.Model):
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True, related_name="signature")
+    minhash = models.BinaryField()
+
+
+class SignatureBucket(models.Model):
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=["assignment", "band", "bucket"])]
+
+
+class SimilarityFlag(models.Model):
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="similarity_flags")
+    other = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="+")
+    similarity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("submission", "other")
+        ordering = ["-similarity"]
+
+
+# Resumable upload of a large Content/Submission file, assembled chunk by chunk.
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def is_complete(self):
+        return self.received >= self.size
+
 
 class QuizResponse(models.Model):
     submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="responses")
@@ -271,6 +366,32 @@ class Attendance(models.Model):
         default="present",
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["date", "status"])]
+
+
+
+# Denormalized per-run figures for dashboards; maintained by mainapp.stats.
+class CourseRunStats(models.Model):
+    course_run = models.OneToOneField(CourseRun, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    enrolled_count = models.PositiveIntegerField(default=0)
+    assignment_count = models.PositiveIntegerField(default=0)
+    submission_count = models.PositiveIntegerField(default=0) # distinct (student, assignment)
+    quiz_attempt_count = models.PositiveIntegerField(default=0)
+    average_quiz_score = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    attendance_count = models.PositiveIntegerField(default=0)
+    attended_count = models.PositiveIntegerField(default=0) # present or late
+    refreshed_at = models.DateTimeField(auto_now=True)
+    dirty = models.BooleanField(default=False, db_index=True) # source rows changed since refreshed_at
+
+    @property
+    def submission_rate(self):
+        expected = self.enrolled_count * self.assignment_count
+        return self.submission_count / expected if expected else None
+
+    @property
+    def attendance_rate(self):
+        return self.attended_count / self.attendance_count if self.attendance_count else None
 
 
 # Submissions already store scores, but institutions often want a summary per term or course.
@@ -314,5 +435,103 @@ class Payment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+
+# Per-student payment totals, rebuilt by mainapp.payments after reconciliation.
+class StudentBalance(models.Model):
+    student = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="balance")
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # completed payments
+    pending = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
     
 
+
+
+# Offline download of a CourseRun, built by mainapp.packages. A row with
+# base_version is a delta holding only what changed since that version.
+class CoursePackage(models.Model):
+    course_run = models.ForeignKey(CourseRun, on_delete=models.CASCADE, related_name="packages")
+    version = models.PositiveIntegerField()
+    base_version = models.PositiveIntegerField(null=True, blank=True)
+    archive = models.FileField(upload_to="packages/", storage=content_storage)
+    size = models.PositiveBigIntegerField(default=0)
+    manifest = models.JSONField(default=dict)  # archive path -> sha256, full packages only
+    built_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["course_run", "version"], condition=models.Q(base_version__isnull=True), name="unique_full_course_package"),
+            models.UniqueConstraint(fields=["course_run", "version", "base_version"], name="unique_course_package_delta"),
+        ]
+        indexes = [models.Index(fields=["course_run", "-version"])]
+
+
+# Append-only history written in batches by mainapp.audit. No foreign keys:
+# rows outlive what they describe and inserts skip constraint checks.
+class AuditEvent(models.Model):
+    at = models.DateTimeField()
+    kind = models.CharField(max_length=40)  # e.g. "submission.graded"
+    object_type = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["at"]),
+            models.Index(fields=["object_type", "object_id", "at"]),
+        ]
+
+
+# Rows of a closed term moved out of the hot tables by mainapp.archive: one
+# zlib-compressed JSON batch of a single model per row.
+class ArchivedChunk(models.Model):
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name="archived_chunks")
+    model = models.CharField(max_length=32)  # model_name, e.g. "submission"
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField()
+    row_count = models.PositiveIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["term", "model", "first_pk"])]
+
+
+# Precomputed "students also took" neighbours of a course; rebuilt by
+# mainapp.recommendations from co-enrollment.
+class CourseNeighbour(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="neighbours")
+    neighbour = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="neighbour_of")
+    rank = models.PositiveSmallIntegerField()  # 0 = most similar
+    score = models.FloatField()  # cosine similarity of the two courses' student sets
+    shared_students = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["course", "rank"]
+        constraints = [models.UniqueConstraint(fields=["course", "rank"], name="unique_course_neighbour_rank")]
+
+
+# Background work queued for any node's `manage.py run_jobs`; see mainapp.jobs.
+class Job(models.Model):
+    task = models.CharField(max_length=64)
+    args = models.JSONField(default=list)
+    # task + args; one pending job per key, so repeats of queued work collapse.
+    key = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=128, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["claimed_at", "id"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"], condition=models.Q(claimed_at__isnull=True), name="unique_pending_job",
+            ),
+        ]
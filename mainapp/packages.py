@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
+
+from . import jobs
+from .lessons import render_body
+from .models import Content, CoursePackage, CourseRun, Lesson, Module
+from .storage import STREAM_CHUNK_SIZE, content_hash, file_sha256
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_FORMAT = 1
+
+# Already-compressed media is stored as is; deflating it again costs CPU on
+# every build and saves nothing.
+STORED_EXTENSIONS = {
+    ".zip", ".gz", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".mp3", ".m4a", ".mp4", ".webm", ".docx", ".pptx", ".xlsx",
+}
+
+# Fixed member timestamps keep archives byte-identical across rebuilds, so
+# content-addressed storage keeps one copy of an unchanged package.
+_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="packages")
+_lock = threading.Lock()
+_pending = set()
+
+
+# -----------------------
+# Contents
+# -----------------------
+def course_tree(run):
+    """
+    Return ``(document, files)`` for ``run``.
+
+    ``document`` is the course outline with sanitized text bodies; ``files``
+    maps archive paths to the FieldFiles they come from. Only published
+    lessons and visible content are included, and quiz/assignment items
+    carry no answers.
+    """
+    modules = Module.objects.filter(course_run=run).prefetch_related(
+        Prefetch("lesson_set", queryset=Lesson.objects.filter(is_published=True)),
+        Prefetch("lesson_set__content_set", queryset=Content.objects.filter(is_visible=True)),
+    )
+    files = {}
+    outline = []
+    for module in modules:
+        lessons = []
+        for lesson in module.lesson_set.all():
+            contents = []
+            for content in lesson.content_set.all():
+                item = {"id": content.pk, "type": content.type, "title": content.title}
+                if content.body:
+                    item["body"] = render_body(content.body)
+                if content.file:
+                    stored = os.path.basename(content.file.name)
+                    path = f"files/{stored}" if content_hash(stored) else f"files/{content.pk}-{stored}"
+                    files[path] = content.file
+                    item["file"] = path
+                for url in ("video_url", "link_url"):
+                    if getattr(content, url):
+                        item[url] = getattr(content, url)
+                contents.append(item)
+            lessons.append({"id": lesson.pk, "title": lesson.title, "contents": contents})
+        outline.append({"id": module.pk, "title": module.title, "lessons": lessons})
+    document = {
+        "course_run": run.pk,
+        "course": {"code": run.course.code, "title": run.course.title},
+        "term": run.term.name,
+        "modules": outline,
+    }
+    return document, files
+
+
+def _file_digest(fieldfile):
+    digest = content_hash(fieldfile.name)
+    if digest is None:
+        with fieldfile.storage.open(fieldfile.name, "rb") as handle:
+            digest = file_sha256(File(handle))
+    return digest
+
+
+def _write_archive(handle, header, document, files, paths):
+    with zipfile.ZipFile(handle, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        archive.writestr(zipfile.ZipInfo("manifest.json", _EPOCH), header, zipfile.ZIP_DEFLATED)
+        if "course.json" in paths:
+            archive.writestr(zipfile.ZipInfo("course.json", _EPOCH), document, zipfile.ZIP_DEFLATED)
+        for path in sorted(paths):
+            if path not in files:
+                continue
+            info = zipfile.ZipInfo(path, _EPOCH)
+            ext = os.path.splitext(path)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            fieldfile = files[path]
+            with fieldfile.storage.open(fieldfile.name, "rb") as source, archive.open(info, "w") as target:
+                shutil.copyfileobj(source, target, STREAM_CHUNK_SIZE)
+
+
+def _store(package, run, header, document, files, paths):
+    with tempfile.TemporaryFile() as handle:
+        _write_archive(handle, header, document, files, paths)
+        package.size = handle.tell()
+        handle.seek(0)
+        suffix = f"-from{package.base_version}" if package.base_version else ""
+        package.archive.save(f"course-run-{run.pk}-v{package.version}{suffix}.zip", File(handle), save=False)
+    package.save()
+    return package
+
+
+# -----------------------
+# Builds
+# -----------------------
+def build_package(course_run_id):
+    """
+    Build the next package version for a CourseRun, plus deltas to it.
+
+    Nothing is built when the contents match the latest version, which is
+    returned instead. Each new version also gets a delta from each of the
+    previous COURSE_PACKAGE_DELTAS versions, holding the changed files and a
+    manifest listing removed ones. Older versions are pruned.
+    """
+    run = CourseRun.objects.select_related("course", "term").get(pk=course_run_id)
+    outline, files = course_tree(run)
+    document = json.dumps(outline, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    manifest = {"course.json": hashlib.sha256(document).hexdigest()}
+    for path, fieldfile in files.items():
+        manifest[path] = _file_digest(fieldfile)
+
+    fulls = list(run.packages.filter(base_version__isnull=True).order_by("-version")[:settings.COURSE_PACKAGE_DELTAS])
+    if fulls and fulls[0].manifest == manifest:
+        return fulls[0]
+    version = fulls[0].version + 1 if fulls else 1
+
+    try:
+        with transaction.atomic():
+            header = {"format": PACKAGE_FORMAT, "course_run": run.pk, "version": version, "files": manifest}
+            package = _store(
+                CoursePackage(course_run=run, version=version, manifest=manifest),
+                run, json.dumps(header).encode(), document, files, manifest,
+            )
+            for base in fulls:
+                changed = {path for path, digest in manifest.items() if base.manifest.get(path) != digest}
+                header = {
+                    "format": PACKAGE_FORMAT, "course_run": run.pk, "version": version,
+                    "base_version": base.version, "files": {path: manifest[path] for path in changed},
+                    "removed": sorted(set(base.manifest).difference(manifest)),
+                }
+                _store(
+                    CoursePackage(course_run=run, version=version, base_version=base.version),
+                    run, json.dumps(header).encode(), document, files, changed,
+                )
+            _prune(run, version)
+    except IntegrityError:
+        # Another worker built this version first.
+        return run.packages.get(version=version, base_version__isnull=True)
+    return package
+
+
+def _prune(run, version):
+    keep_from = version - settings.COURSE_PACKAGE_DELTAS + 1
+    stale = run.packages.exclude(version=version).exclude(base_version__isnull=True, version__gte=keep_from)
+    names = set(stale.values_list("archive", flat=True))
+    stale.delete()
+    # Identical archives share one file; only remove files nothing else uses.
+    names -= set(CoursePackage.objects.filter(archive__in=names).values_list("archive", flat=True))
+    storage = CoursePackage._meta.get_field("archive").storage
+
+    def remove():
+        for name in names:
+            storage.delete(name)
+
+    transaction.on_commit(remove)
+
+
+def _build_in_background(course_run_id):
+    with _lock:
+        _pending.discard(course_run_id)
+    # Nothing inspects the executor's futures: log here or the error is lost.
+    try:
+        build_package(course_run_id)
+    except Exception:
+        logger.exception("Building the package of course run %s failed", course_run_id)
+    finally:
+        connection.close()
+
+
+def schedule_build(course_run_id):
+    """
+    Rebuild a CourseRun's package after commit, on a worker thread unless
+    COURSE_PACKAGES_ASYNC is off. A run already waiting for a build is not
+    queued twice, so a burst of edits costs one build.
+    """
+    def run():
+        if jobs.queued():
+            jobs.enqueue("course_package", course_run_id)
+        elif settings.COURSE_PACKAGES_ASYNC:
+            with _lock:
+                if course_run_id in _pending:
+                    return
+                _pending.add(course_run_id)
+            _executor.submit(_build_in_background, course_run_id)
+        else:
+            build_package(course_run_id)
+
+    transaction.on_commit(run)
+
+
+def rebuild_packages_of(**lookup):
+    """Schedule a rebuild for the packaged CourseRun matching ``lookup``, if any."""
+    course_run_id = (
+        CourseRun.objects.filter(packages__isnull=False, **lookup).values_list("pk", flat=True).first()
+    )
+    if course_run_id is not None:
+        schedule_build(course_run_id)
@@ -0,0 +1,171 @@
+import csv
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .audit import record
+from .models import Payment, StudentBalance
+
+# References per IN (...) lookup; well under SQLite's bound-variable limit.
+CHUNK_SIZE = 1000
+
+STATEMENT_COLUMNS = ("reference", "amount", "status")
+
+# Gateway wording -> Payment.status
+GATEWAY_STATUSES = {
+    "success": "completed",
+    "successful": "completed",
+    "completed": "completed",
+    "paid": "completed",
+    "failed": "failed",
+    "declined": "failed",
+    "reversed": "failed",
+    "cancelled": "failed",
+    "pending": "pending",
+}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# -----------------------
+# Statements
+# -----------------------
+def read_statement(path):
+    """
+    Yield ``(line_no, reference, amount, status)`` from a gateway CSV statement.
+
+    The file needs ``reference``, ``amount`` and ``status`` columns; other
+    columns are ignored. Rows are read one at a time. A field that is missing
+    from a short row, or is not valid UTF-8, is yielded as None.
+    """
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as handle:
+        reader = csv.DictReader(handle)
+        missing = [column for column in STATEMENT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise KeyError(", ".join(missing))
+        for line_no, row in enumerate(reader, start=2):
+            reference, amount, status = (
+                None if value is None or "\ufffd" in value else value.strip()
+                for value in (row[column] for column in STATEMENT_COLUMNS)
+            )
+            yield line_no, reference, amount, status and status.lower()
+
+
+def reconcile(lines, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Match statement ``lines`` against Payment.reference and apply gateway statuses.
+
+    Lines are consumed ``chunk_size`` at a time; each chunk costs one IN
+    lookup and one UPDATE per changed status, so memory stays flat whatever the
+    statement size. Unknown references, unreadable lines and amount
+    mismatches are reported, never applied. Balances of students whose
+    payments changed are refreshed in the same transaction as the change, so
+    a run that stops half way leaves no balance behind its payments.
+
+    Returns ``(summary, discrepancies)``: a Counter of lines, matched,
+    updated, unknown, invalid, amount_mismatch and students, and a list of
+    ``(line_no, reference, problem)``.
+    """
+    summary, discrepancies, students = Counter(), [], set()
+    for chunk in _chunks(lines, chunk_size):
+        with transaction.atomic():
+            # Plain tuples rather than model instances: a statement touches
+            # every row once and instantiation would dominate the run time.
+            payments = {
+                reference: [pk, amount, status, student_id]
+                for reference, pk, amount, status, student_id in Payment.objects.filter(
+                    reference__in={reference for _, reference, _, _ in chunk if reference}
+                ).values_list("reference", "pk", "amount", "status", "student_id")
+            }
+            changed = {}
+            for line_no, reference, raw_amount, status in chunk:
+                summary["lines"] += 1
+                if None in (reference, raw_amount, status):
+                    summary["invalid"] += 1
+                    discrepancies.append((line_no, reference or "", f"unreadable line (amount {raw_amount!r}, status {status!r})"))
+                    continue
+                payment = payments.get(reference)
+                if payment is None:
+                    summary["unknown"] += 1
+                    discrepancies.append((line_no, reference, "unknown reference"))
+                    continue
+                pk, expected, current, student_id = payment
+                try:
+                    amount = Decimal(raw_amount)
+                except InvalidOperation:
+                    amount = None
+                target = GATEWAY_STATUSES.get(status)
+                if amount is None or target is None:
+                    summary["invalid"] += 1
+                    discrepancies.append((line_no, reference, f"unreadable line (amount {raw_amount!r}, status {status!r})"))
+                    continue
+                if amount != expected:
+                    summary["amount_mismatch"] += 1
+                    discrepancies.append((line_no, reference, f"amount {amount}, expected {expected}"))
+                    continue
+                summary["matched"] += 1
+                if current != target:
+                    payment[2] = target  # later lines for the same reference see the new status
+                    changed[pk] = (target, student_id)
+            summary["updated"] += len(changed)
+            changed_students = {student_id for _, student_id in changed.values()}
+            students.update(changed_students)
+            if changed and not dry_run:
+                # One UPDATE ... WHERE id IN (...) per target status; far cheaper
+                # than bulk_update()'s per-row CASE for a single changed column.
+                by_status = {}
+                for pk, (target, _) in changed.items():
+                    by_status.setdefault(target, []).append(pk)
+                for target, ids in by_status.items():
+                    Payment.objects.filter(pk__in=ids).update(status=target)
+                for pk, (target, student_id) in changed.items():
+                    record("payment.reconciled", object_type="payment", object_id=pk, status=target, student=student_id)
+                refresh_balances(changed_students)
+    summary["students"] = len(students)
+    return summary, discrepancies
+
+
+# -----------------------
+# Balances
+# -----------------------
+def refresh_balances(student_ids=None, batch_size=500):
+    """Recompute StudentBalance for ``student_ids`` (every paying student when None)."""
+    if student_ids is None:
+        student_ids = Payment.objects.values_list("student_id", flat=True).distinct().order_by().iterator()
+    refreshed = 0
+    for chunk in _chunks(student_ids, CHUNK_SIZE):
+        totals = (
+            Payment.objects.filter(student_id__in=chunk)
+            .values("student_id")
+            .annotate(
+                total_paid=Sum("amount", filter=Q(status="completed"), default=Decimal("0")),
+                total_pending=Sum("amount", filter=Q(status="pending"), default=Decimal("0")),
+                n=Count("pk"),
+            )
+            .order_by()
+        )
+        now = timezone.now()
+        rows = [
+            StudentBalance(
+                student_id=row["student_id"], paid=row["total_paid"], pending=row["total_pending"],
+                payment_count=row["n"], refreshed_at=now,
+            )
+            for row in totals
+        ]
+        StudentBalance.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["student"],
+            update_fields=["paid", "pending", "payment_count", "refreshed_at"],
+        )
+        refreshed += len(rows)
+    return refreshed
@@ -0,0 +1,108 @@
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+class SqlTimeline:
+    """Execute wrapper recording each query's start offset, duration and SQL."""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "start_ms": round((began - self.started) * 1000, 3),
+                "ms": round((time.perf_counter() - began) * 1000, 3),
+                "sql": sql,
+                "many": many,
+            })
+
+
+def profile(request, get_response):
+    """
+    Run ``get_response(request)`` under cProfile with every query timed;
+    return ``(response, report name)``.
+    """
+    started = time.perf_counter()
+    timeline = SqlTimeline(started)
+    profiler = cProfile.Profile()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timeline))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    elapsed = (time.perf_counter() - started) * 1000
+    return response, write_report(request, response, profiler, timeline.queries, elapsed)
+
+
+# -----------------------
+# Reports
+# -----------------------
+# Each profiled request leaves <name>.prof (pstats, for snakeviz and friends)
+# and <name>.json (request, timings and the SQL timeline) in PROFILE_DIR.
+def write_report(request, response, profiler, queries, elapsed):
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-")[:60] or "root"
+    name = f"{timezone.now():%Y%m%dT%H%M%S%f}-{request.method.lower()}-{slug}"
+    profiler.dump_stats(directory / f"{name}.prof")
+    summary = {
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "user_id": request.user.pk if hasattr(request, "user") and request.user.is_authenticated else None,
+        "ms": round(elapsed, 3),
+        "sql_count": len(queries),
+        "sql_ms": round(sum(q["ms"] for q in queries), 3),
+        "queries": queries,
+    }
+    (directory / f"{name}.json").write_text(json.dumps(summary, indent=1), encoding="utf-8")
+    _prune(directory)
+    return name
+
+
+def _prune(directory):
+    stale = sorted(directory.glob("*.json"), reverse=True)[settings.PROFILE_KEEP:]
+    for path in stale:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def reports():
+    """Summaries of the stored reports, newest first, without their SQL."""
+    found = []
+    for path in sorted(Path(settings.PROFILE_DIR).glob("*.json"), reverse=True):
+        summary = json.loads(path.read_text(encoding="utf-8"))
+        summary.pop("queries")
+        found.append({"name": path.stem, **summary})
+    return found
+
+
+def load_report(name, sort="cumulative", limit=30):
+    """Return ``(summary, stats text)`` for the report called ``name``."""
+    directory = Path(settings.PROFILE_DIR)
+    path = directory / f"{Path(name).stem}.json"
+    if not path.is_file():
+        raise FileNotFoundError(f"No profile report named {name!r} in {directory}.")
+    summary = json.loads(path.read_text(encoding="utf-8"))
+    text = io.StringIO()
+    pstats.Stats(str(path.with_suffix(".prof")), stream=text).strip_dirs().sort_stats(sort).print_stats(limit)
+    return summary, text.getvalue()
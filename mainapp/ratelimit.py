@@ -0,0 +1,99 @@
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+_PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# The cache has no compare-and-set, so bucket updates are serialised per
+# process. With a shared cache two workers may occasionally both spend the
+# last token; the limit is approximate across processes, exact within one.
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    count, period = rate.split("/")
+    return int(count), _PERIODS[period[0]]
+
+
+def client_key(request, key):
+    """
+    Bucket identity for ``key``: 'user' (falling back to the IP when
+    anonymous), 'ip', or 'ip+<field>' for the IP together with a POSTed
+    field such as the username, so one NAT address is not one bucket.
+    """
+    if key == "user" and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    ip = f"ip:{request.META.get('REMOTE_ADDR', '')}"
+    if key.startswith("ip+"):
+        value = request.POST.get(key[3:], "").strip().lower()
+        return f"{ip}:{hashlib.sha256(value.encode()).hexdigest()[:16]}"
+    return ip
+
+
+# -----------------------
+# Token bucket
+# -----------------------
+def take_token(scope, ident, rate, burst=None, now=None):
+    """
+    Spend one token from the ``scope``/``ident`` bucket.
+
+    Buckets hold up to ``burst`` tokens (the rate's count by default) and
+    refill continuously at ``rate``. Returns ``(allowed, retry_after)``
+    where ``retry_after`` is the seconds until the next token.
+    """
+    count, period = parse_rate(rate)
+    capacity = burst or count
+    per_second = count / period
+    now = time.time() if now is None else now
+    key = f"ratelimit:{scope}:{ident}"
+    with _lock:
+        tokens, stamp = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Keep the entry until the bucket would be full again.
+        cache.set(key, (tokens, now), math.ceil((capacity - tokens) / per_second) + 1)
+    _counters[scope, "allowed" if allowed else "limited"] += 1
+    return allowed, 0 if allowed else math.ceil((1 - tokens) / per_second)
+
+
+def counters():
+    """Allowed/limited request counts per scope since this process started."""
+    result = {}
+    for (scope, outcome), n in _counters.items():
+        result.setdefault(scope, {"allowed": 0, "limited": 0})[outcome] = n
+    return result
+
+
+def rate_limit(scope, methods=("POST",)):
+    """
+    Throttle a view with the RATE_LIMITS[scope] token bucket.
+
+    Only ``methods`` spend tokens, so showing a form is never limited.
+    Over-limit requests get 429 with Retry-After before the view (and any
+    password hashing or grading in it) runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            config = settings.RATE_LIMITS.get(scope)
+            if settings.RATE_LIMITS_ENABLED and config and request.method in methods:
+                allowed, retry_after = take_token(
+                    scope, client_key(request, config.get("key", "ip")), config["rate"], config.get("burst")
+                )
+                if not allowed:
+                    response = HttpResponse("Too many requests, please slow down.", status=429, content_type="text/plain")
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import Course, CourseNeighbour, Enrollment
+
+# Students per block of the co-enrollment product; a block is a dense
+# students x courses float32 matrix, so this bounds its memory.
+BLOCK_CELLS = 4_000_000
+
+
+# -----------------------
+# Batch job
+# -----------------------
+# NumPy is imported inside the batch functions: pages only read the stored
+# neighbours and should not pay for the import.
+def co_enrollment(students, courses, n_courses):
+    """
+    Return ``(co, counts)`` for enrollment pairs given as parallel index arrays.
+
+    ``co[i, j]`` is the number of students enrolled in both courses i and j,
+    ``counts[i]`` the number enrolled in course i. The students x courses
+    incidence matrix is sparse, so it is never built whole: students are
+    taken a block at a time and each dense block adds ``X.T @ X`` to the total.
+    """
+    import numpy as np
+
+    co = np.zeros((n_courses, n_courses), dtype=np.float64)
+    if len(students):
+        block = max(BLOCK_CELLS // max(n_courses, 1), 1)
+        order = np.argsort(students, kind="stable")
+        students, courses = students[order], courses[order]
+        # Block edges run past the last student, so its block is always closed.
+        bounds = np.searchsorted(students, np.arange(0, students[-1] + 1 + block, block))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if start == stop:
+                continue
+            rows = students[start:stop] - students[start]
+            x = np.zeros((rows[-1] + 1, n_courses), dtype=np.float32)
+            x[rows, courses[start:stop]] = 1
+            co += x.T @ x
+    counts = np.diag(co).copy()
+    return co, counts
+
+
+def top_neighbours(co, counts, allowed, k, min_shared):
+    """
+    Yield ``(course, neighbour, rank, score, shared)`` index tuples: for each
+    course, up to ``k`` other courses in ``allowed`` (a boolean mask) by
+    cosine similarity, sharing at least ``min_shared`` students.
+    """
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        norms = np.sqrt(counts)
+        similarity = co / np.outer(norms, norms)
+    similarity[~np.isfinite(similarity)] = 0
+    similarity[co < min_shared] = 0
+    similarity[:, ~allowed] = 0
+    np.fill_diagonal(similarity, 0)
+
+    k = min(k, similarity.shape[1])
+    if not k:
+        return
+    best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    for course, candidates in enumerate(best):
+        candidates = candidates[np.argsort(-similarity[course, candidates], kind="stable")]
+        rank = 0
+        for neighbour in candidates:
+            score = similarity[course, neighbour]
+            if score <= 0:
+                break
+            yield course, neighbour, rank, float(score), int(co[course, neighbour])
+            rank += 1
+
+
+def build_recommendations(k=None, min_shared=None):
+    """
+    Recompute every course's top ``k`` neighbours from current enrollments and
+    replace the stored ones in one transaction; returns the number stored.
+
+    Only published courses are recommended. ``k`` and ``min_shared`` default
+    to RECOMMENDATIONS_TOP_K and RECOMMENDATIONS_MIN_SHARED.
+    """
+    import numpy as np
+
+    k = settings.RECOMMENDATIONS_TOP_K if k is None else k
+    min_shared = settings.RECOMMENDATIONS_MIN_SHARED if min_shared is None else min_shared
+    pairs = np.array(
+        list(
+            Enrollment.objects.filter(status="enrolled")
+            .values_list("student_id", "course_run__course_id").distinct().order_by()
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    course_ids, course_index = np.unique(pairs[:, 1], return_inverse=True)
+    _, student_index = np.unique(pairs[:, 0], return_inverse=True)
+    co, counts = co_enrollment(student_index, course_index, len(course_ids))
+    published = set(Course.objects.filter(pk__in=course_ids.tolist(), is_published=True).values_list("pk", flat=True))
+    allowed = np.array([pk in published for pk in course_ids.tolist()], dtype=bool)
+
+    rows = [
+        CourseNeighbour(
+            course_id=int(course_ids[course]), neighbour_id=int(course_ids[neighbour]),
+            rank=rank, score=score, shared_students=shared,
+        )
+        for course, neighbour, rank, score, shared in top_neighbours(co, counts, allowed, k, min_shared)
+    ]
+    with transaction.atomic():
+        CourseNeighbour.objects.all().delete()
+        CourseNeighbour.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# -----------------------
+# Lookups
+# -----------------------
+def recommended_courses(user, limit=None):
+    """
+    Published courses that students of ``user``'s current courses also took,
+    best first, leaving out any course ``user`` has enrolled in before (even
+    if dropped): one query on the stored neighbours.
+    """
+    enrollments = Enrollment.objects.filter(student=user)
+    current = enrollments.filter(status="enrolled").values("course_run__course")
+    return list(
+        Course.objects.filter(is_published=True, neighbour_of__course__in=current)
+        .exclude(pk__in=enrollments.values("course_run__course"))
+        .annotate(affinity=Sum("neighbour_of__score"))
+        .order_by("-affinity", "pk")[:limit or settings.RECOMMENDATIONS_SHOWN]
+    )
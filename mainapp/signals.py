@@ -0,0 +1,230 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .academic_calendar import invalidate_calendar
+from .audit import record
+from .api import bump, bump_course_of
+from .packages import rebuild_packages_of
+from .models import (
+    AcademicYear, Announcement, Assignment, Attendance, Choice, Content, Course, CourseRun,
+    Enrollment, Institution, Lesson, Module, Payment, Profile, Question, Quiz, Submission, Term, User,
+)
+from .auth import invalidate_user
+from .stats import run_for_content, run_for_submission, schedule_refresh
+
+
+# Handlers that need Pillow or NumPy import them on first use, so that merely
+# loading the app (every worker boot, every management command) does not.
+def _image_saved(instance, field, update_fields):
+    return getattr(instance, field) and (update_fields is None or field in update_fields)
+
+
+# -----------------------
+# Cached users
+# -----------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+# -----------------------
+# Academic calendar
+# -----------------------
+@receiver(post_save, sender=AcademicYear)
+@receiver(post_delete, sender=AcademicYear)
+@receiver(post_save, sender=Term)
+@receiver(post_delete, sender=Term)
+def forget_current_period(sender, instance, **kwargs):
+    invalidate_calendar(instance.institution_id)
+
+
+# -----------------------
+# Image renditions
+# -----------------------
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def render_avatar(sender, instance, update_fields=None, **kwargs):
+    if _image_saved(instance, "avatar", update_fields):
+        from .images import schedule_renditions
+        schedule_renditions(instance.avatar, ["thumb", "small", "medium"])
+
+
+@receiver(post_save, sender=Institution)
+def render_logo(sender, instance, update_fields=None, **kwargs):
+    if _image_saved(instance, "logo", update_fields):
+        from .images import schedule_renditions
+        schedule_renditions(instance.logo, ["logo"])
+
+
+# -----------------------
+# Course run stats
+# -----------------------
+# Saves leave the run to be found at commit, once per transaction; deleted
+# rows' content may be gone by then, so deletes look their run up now.
+@receiver(post_save, sender=Submission)
+def refresh_submission_stats(sender, instance, **kwargs):
+    schedule_refresh(assignment=instance.assignment_id, quiz=instance.quiz_id)
+
+
+@receiver(post_delete, sender=Submission)
+def refresh_stats_of_deleted_submission(sender, instance, **kwargs):
+    schedule_refresh(run_for_submission(instance))
+
+
+@receiver(post_save, sender=Assignment)
+def refresh_assignment_stats(sender, instance, **kwargs):
+    schedule_refresh(pk=instance.content_id)
+
+
+@receiver(post_delete, sender=Assignment)
+def refresh_stats_of_deleted_assignment(sender, instance, **kwargs):
+    schedule_refresh(run_for_content(pk=instance.content_id))
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def refresh_run_stats(sender, instance, **kwargs):
+    schedule_refresh(instance.course_run_id)
+
+
+# -----------------------
+# Similarity
+# -----------------------
+@receiver(post_save, sender=Submission)
+def index_submission_text(sender, instance, update_fields=None, **kwargs):
+    if instance.assignment_id and instance.text_answer and (update_fields is None or "text_answer" in update_fields):
+        from .similarity import schedule_indexing
+        schedule_indexing(instance)
+
+
+# -----------------------
+# Quiz versions
+# -----------------------
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_quiz_version_for_question(sender, instance, **kwargs):
+    Quiz.objects.filter(pk=instance.quiz_id).update(version=F("version") + 1)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def bump_quiz_version_for_choice(sender, instance, **kwargs):
+    Quiz.objects.filter(questions=instance.question_id).update(version=F("version") + 1)
+
+
+# -----------------------
+# API validators
+# -----------------------
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course(sender, instance, **kwargs):
+    bump("courses")
+    bump(f"course:{instance.pk}")
+
+
+@receiver(post_save, sender=CourseRun)
+@receiver(post_delete, sender=CourseRun)
+def bump_course_for_run(sender, instance, **kwargs):
+    bump(f"course:{instance.course_id}")
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def bump_course_for_module(sender, instance, **kwargs):
+    bump_course_of(pk=instance.course_run_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def bump_course_for_lesson(sender, instance, **kwargs):
+    bump_course_of(module=instance.module_id)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def bump_course_for_content(sender, instance, **kwargs):
+    bump_course_of(module__lesson=instance.lesson_id)
+    if instance.type == "quiz":
+        quiz_id = Quiz.objects.filter(content=instance.pk).values_list("pk", flat=True).first()
+        if quiz_id:
+            bump(f"quiz:{quiz_id}")
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_quiz(sender, instance, **kwargs):
+    bump(f"quiz:{instance.pk if sender is Quiz else instance.quiz_id}")
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def bump_quiz_for_choice(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list("quiz_id", flat=True).first()
+    if quiz_id:
+        bump(f"quiz:{quiz_id}")
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def bump_submissions(sender, instance, **kwargs):
+    bump(f"submissions:{instance.student_id}")
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def bump_announcements(sender, instance, **kwargs):
+    bump(f"announcements:{instance.institution_id}")
+
+
+# -----------------------
+# Course packages
+# -----------------------
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def rebuild_package_for_module(sender, instance, **kwargs):
+    rebuild_packages_of(pk=instance.course_run_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def rebuild_package_for_lesson(sender, instance, **kwargs):
+    rebuild_packages_of(module=instance.module_id)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def rebuild_package_for_content(sender, instance, **kwargs):
+    rebuild_packages_of(module__lesson=instance.lesson_id)
+
+
+# -----------------------
+# Audit trail
+# -----------------------
+# Enrollment changes and statement reconciliation write through
+# QuerySet.update(); mainapp.enrollment and mainapp.payments record those.
+@receiver(post_save, sender=Submission)
+def audit_submission(sender, instance, created, update_fields=None, **kwargs):
+    grade = tuple(getattr(instance, f) for f in Submission.GRADE_FIELDS)
+    loaded = getattr(instance, "_loaded_grade", None)
+    if created:
+        record("submission.created", instance, actor_id=instance.student_id, score=instance.score)
+    elif loaded != grade if loaded is not None else bool(set(update_fields or ()) & {"score", "graded_by", "graded_at"}):
+        record(
+            "submission.graded", instance, actor_id=instance.graded_by_id,
+            score=instance.score, graded_at=instance.graded_at,
+        )
+    instance._loaded_grade = grade
+
+
+@receiver(post_save, sender=Payment)
+def audit_payment(sender, instance, created, **kwargs):
+    record(
+        "payment.created" if created else "payment.saved", instance, actor_id=instance.student_id,
+        amount=instance.amount, status=instance.status, reference=instance.reference,
+    )
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import jobs
+from .models import SignatureBucket, SimilarityFlag, Submission, SubmissionSignature
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS  # pairs above ~(1/BANDS)**(1/ROWS) = 0.42 Jaccard usually share a bucket
+MIN_WORDS = 20  # shorter answers match too easily to be meaningful
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Fixed seed: signatures must be comparable across processes and restarts.
+_rng = np.random.default_rng(20251)
+_A = _rng.integers(1, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+
+
+# -----------------------
+# Signatures
+# -----------------------
+def shingles(text):
+    words = _WORD.findall((text or "").lower())
+    if len(words) < MIN_WORDS:
+        return set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text):
+    """Return a NUM_PERM MinHash signature of ``text``'s word shingles, or None if it is too short."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    # Universal hashing, one row per permutation; uint64 arithmetic wraps by design.
+    permuted = ((hashes[None, :] * _A[:, None] + _B[:, None]) % _MERSENNE) & _MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_hashes(signature):
+    rows = signature.reshape(BANDS, ROWS)
+    return [
+        int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), "little", signed=True)
+        for row in rows
+    ]
+
+
+def estimate_similarity(signature, others):
+    """Estimated Jaccard similarity between ``signature`` and each row of ``others``."""
+    return (others == signature[None, :]).mean(axis=1)
+
+
+# -----------------------
+# Indexing
+# -----------------------
+def index_submission(submission_id):
+    """
+    Sign a text submission, add it to its assignment's LSH buckets and flag
+    near-duplicates from other students.
+
+    Only submissions sharing at least one band bucket are compared, so the
+    cost grows with the number of likely matches rather than the number of
+    submissions. Returns the flags created.
+    """
+    submission = Submission.objects.filter(pk=submission_id, assignment__isnull=False).first()
+    if submission is None:
+        return []
+    signature = minhash(submission.text_answer)
+    if signature is None:
+        return []
+    buckets = band_hashes(signature)
+
+    with transaction.atomic():
+        SubmissionSignature.objects.update_or_create(
+            submission=submission, defaults={"minhash": signature.tobytes()}
+        )
+        SignatureBucket.objects.filter(submission=submission).delete()
+        SignatureBucket.objects.bulk_create(
+            SignatureBucket(assignment_id=submission.assignment_id, band=band, bucket=bucket, submission=submission)
+            for band, bucket in enumerate(buckets)
+        )
+
+        SimilarityFlag.objects.filter(Q(submission=submission) | Q(other=submission)).delete()
+
+        same_bucket = reduce(or_, (Q(band=band, bucket=bucket) for band, bucket in enumerate(buckets)))
+        candidates = set(
+            SignatureBucket.objects.filter(same_bucket, assignment_id=submission.assignment_id)
+            .exclude(submission__student_id=submission.student_id)
+            .values_list("submission_id", flat=True)
+        )
+        if not candidates:
+            return []
+
+        rows = list(SubmissionSignature.objects.filter(submission_id__in=candidates).values_list("submission_id", "minhash"))
+        others = np.stack([np.frombuffer(bytes(blob), dtype=np.uint32) for _, blob in rows])
+        scores = estimate_similarity(signature, others)
+        flags = []
+        for (other_id, _), score in zip(rows, scores):
+            if score >= settings.SIMILARITY_THRESHOLD:
+                flags.append(SimilarityFlag(submission=submission, other_id=other_id, similarity=float(score)))
+                flags.append(SimilarityFlag(submission_id=other_id, other=submission, similarity=float(score)))
+        return SimilarityFlag.objects.bulk_create(flags, ignore_conflicts=True)
+
+
+def _index_in_background(submission_id):
+    # Nothing inspects the executor's futures: log here or the error is lost.
+    try:
+        index_submission(submission_id)
+    except Exception:
+        logger.exception("Indexing submission %s for similarity failed", submission_id)
+    finally:
+        connection.close()
+
+
+def schedule_indexing(submission):
+    """Index ``submission`` after commit, on a worker thread unless SIMILARITY_ASYNC is off."""
+    submission_id = submission.pk
+
+    def run():
+        if jobs.queued():
+            jobs.enqueue("similarity", submission_id)
+        elif settings.SIMILARITY_ASYNC:
+            _executor.submit(_index_in_background, submission_id)
+        else:
+            index_submission(submission_id)
+
+    transaction.on_commit(run)
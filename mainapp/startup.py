@@ -0,0 +1,52 @@
+import time
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver
+
+# Loaded lazily by request handlers; importing them before fork lets every
+# worker share the pages copy-on-write instead of paying for them itself.
+HEAVY_MODULES = ["numpy", "PIL.Image", "mainapp.analytics", "mainapp.similarity"]
+
+
+def _template_names():
+    for config in apps.get_app_configs():
+        root = Path(config.path) / "templates"
+        if root.is_dir():
+            for path in sorted(root.rglob("*.html")):
+                yield path.relative_to(root).as_posix()
+
+
+def warmup():
+    """
+    Do the work a fresh worker would otherwise do on its first requests.
+
+    Populates the URL resolver, compiles every app template into the cached
+    loader and imports the lazily loaded heavy modules. Database connections
+    are closed afterwards so none is shared across a fork. Returns the time
+    spent per step in seconds.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    timings["urls"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for engine in engines.all():
+        for name in _template_names():
+            engine.get_template(name)
+    timings["templates"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for module in HEAVY_MODULES:
+        import_module(module)
+    timings["modules"] = time.perf_counter() - started
+
+    connections.close_all()
+    return timings
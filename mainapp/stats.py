@@ -0,0 +1,206 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+
+from .models import Assignment, Attendance, CourseRun, CourseRunStats, Enrollment, Module, Submission
+
+STAT_FIELDS = [
+    "enrolled_count", "assignment_count", "submission_count", "quiz_attempt_count",
+    "average_quiz_score", "attendance_count", "attended_count",
+]
+
+_ASSIGNMENT_RUN = "content__lesson__module__course_run"
+
+
+# -----------------------
+# Aggregation
+# -----------------------
+def _grouped(queryset, run_path, run_ids, **aggregates):
+    if run_ids is not None:
+        queryset = queryset.filter(**{f"{run_path}__in": run_ids})
+    return queryset.values(run=F(run_path)).annotate(**aggregates).order_by()
+
+
+def compute_stats(run_ids=None):
+    """
+    Aggregate fresh figures for ``run_ids`` (every run when None).
+
+    Issues one grouped query per source table regardless of how many runs
+    are involved. Returns ``{run_id: {field: value}}``. Runs of archived
+    terms are left out: their rows have moved to mainapp.archive, so their
+    stored figures are final.
+    """
+    runs = CourseRun.objects.all()
+    if run_ids is not None:
+        runs = runs.filter(pk__in=run_ids)
+    stats, archived = {}, []
+    for pk, archived_at in runs.values_list("pk", "term__archived_at"):
+        stats[pk] = {field: None if field == "average_quiz_score" else 0 for field in STAT_FIELDS}
+        if archived_at:
+            archived.append(pk)
+
+    for row in _grouped(Enrollment.objects.filter(status="enrolled"), "course_run", run_ids, n=Count("pk")):
+        stats[row["run"]]["enrolled_count"] = row["n"]
+
+    for row in _grouped(Assignment.objects.all(), _ASSIGNMENT_RUN, run_ids, n=Count("pk")):
+        stats[row["run"]]["assignment_count"] = row["n"]
+
+    # Distinct students per assignment, summed per run: repeat attempts count once.
+    submissions = Submission.objects.filter(assignment__isnull=False)
+    if run_ids is not None:
+        submissions = submissions.filter(**{f"assignment__{_ASSIGNMENT_RUN}__in": run_ids})
+    per_assignment = (
+        submissions.values("assignment", run=F(f"assignment__{_ASSIGNMENT_RUN}"))
+        .annotate(n=Count("student", distinct=True))
+        .order_by()
+    )
+    for row in per_assignment:
+        stats[row["run"]]["submission_count"] += row["n"]
+
+    quizzes = _grouped(
+        Submission.objects.filter(quiz__isnull=False), f"quiz__{_ASSIGNMENT_RUN}", run_ids,
+        n=Count("pk"), average=Avg("score"),
+    )
+    for row in quizzes:
+        stats[row["run"]]["quiz_attempt_count"] = row["n"]
+        if row["average"] is not None:
+            stats[row["run"]]["average_quiz_score"] = Decimal(row["average"]).quantize(Decimal("0.01"))
+
+    attendance = _grouped(
+        Attendance.objects.all(), "course_run", run_ids,
+        n=Count("pk"), attended=Count("pk", filter=Q(status__in=["present", "late"])),
+    )
+    for row in attendance:
+        stats[row["run"]]["attendance_count"] = row["n"]
+        stats[row["run"]]["attended_count"] = row["attended"]
+
+    for pk in archived:
+        del stats[pk]
+    return stats
+
+
+def refresh_stats(run_ids=None, batch_size=500):
+    """Recompute and store CourseRunStats for ``run_ids`` (every run when None)."""
+    with transaction.atomic():
+        fresh = compute_stats(run_ids)
+        existing = CourseRunStats.objects.in_bulk(list(fresh))
+        now = timezone.now()
+        rows = [
+            CourseRunStats(course_run_id=run_id, refreshed_at=now, **values)
+            for run_id, values in fresh.items()
+            if run_id not in existing
+            or any(getattr(existing[run_id], field) != value for field, value in values.items())
+        ]
+        # Upsert: a concurrent refresh may have created the row since in_bulk().
+        CourseRunStats.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["course_run"],
+            update_fields=STAT_FIELDS + ["refreshed_at"],
+        )
+    return len(rows)
+
+
+def check_stats(run_ids=None):
+    """Return ``(run_id, field, stored, expected)`` for every stored figure that has drifted."""
+    fresh = compute_stats(run_ids)
+    stored = CourseRunStats.objects.in_bulk(list(fresh))
+    drift = []
+    for run_id, values in fresh.items():
+        row = stored.get(run_id)
+        for field, expected in values.items():
+            actual = getattr(row, field) if row else None
+            if actual != expected:
+                drift.append((run_id, field, actual, expected))
+    return drift
+
+
+# -----------------------
+# Incremental maintenance
+# -----------------------
+# Writes only mark their run dirty, once per transaction and after it commits;
+# `refresh_course_run_stats --dirty`, run every minute or so, recomputes the
+# marked runs in one batch. Requests never re-aggregate a run themselves.
+class _Marks:
+    """The on_commit callback of one transaction, holding what it changed."""
+
+    def __init__(self):
+        self.runs, self.content, self.done = set(), {}, False
+
+    def __call__(self):
+        self.done = True
+        runs = set(self.runs)
+        lookups = Q()
+        for key, values in self.content.items():
+            lookups |= Q(**{f"lesson__content__{key}__in": values})
+        if self.content:
+            runs.update(Module.objects.filter(lookups).values_list("course_run_id", flat=True))
+        mark_dirty(runs)
+
+
+def _marks():
+    # Found among the pending on_commit callbacks, so a rollback, which
+    # discards them, discards its marks too.
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        for _, callback, _ in connection.run_on_commit:
+            if isinstance(callback, _Marks) and not callback.done:
+                return callback
+    marks = _Marks()
+    if connection.in_atomic_block:
+        transaction.on_commit(marks)
+    return marks
+
+
+def schedule_refresh(run_id=None, **content):
+    """
+    Mark a run's stats dirty once the current transaction commits.
+
+    Give the run's id, or one Content lookup such as ``quiz=7`` or
+    ``assignment=3`` for the run to be found at commit time, in one query
+    for everything the transaction changed.
+    """
+    marks = _marks()
+    if run_id is not None:
+        marks.runs.add(run_id)
+    for key, value in content.items():
+        if value is not None:
+            marks.content.setdefault(key, set()).add(value)
+    if not transaction.get_connection().in_atomic_block:
+        marks()
+
+
+def mark_dirty(run_ids):
+    """Flag ``run_ids`` for the next `refresh_dirty`; runs without stats get a row."""
+    CourseRunStats.objects.bulk_create(
+        [CourseRunStats(course_run_id=run_id, dirty=True) for run_id in run_ids],
+        update_conflicts=True,
+        unique_fields=["course_run"],
+        update_fields=["dirty"],
+    )
+
+
+def refresh_dirty():
+    """Refresh the runs marked dirty; returns how many stat rows changed."""
+    run_ids = list(CourseRunStats.objects.filter(dirty=True).values_list("course_run_id", flat=True))
+    if not run_ids:
+        return 0
+    # Cleared before recomputing: a run marked again meanwhile stays dirty.
+    CourseRunStats.objects.filter(course_run__in=run_ids).update(dirty=False)
+    return refresh_stats(run_ids)
+
+
+def run_for_content(**lookup):
+    modules = Module.objects.filter(**{f"lesson__content__{key}": value for key, value in lookup.items()})
+    return modules.values_list("course_run_id", flat=True).first()
+
+
+def run_for_submission(submission):
+    if submission.assignment_id:
+        return run_for_content(assignment=submission.assignment_id)
+    if submission.quiz_id:
+        return run_for_content(quiz=submission.quiz_id)
+    return None
@@ -0,0 +1,210 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.deconstruct import deconstructible
+from django.utils.http import http_date, quote_etag
+
+HASH_CHUNK_SIZE = 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_sha256(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(name):
+    """Return the SHA-256 embedded in a content-addressed file name, if any."""
+    stem = os.path.splitext(os.path.basename(name or ""))[0]
+    return stem if _DIGEST.match(stem) else None
+
+
+# -----------------------
+# Storage
+# -----------------------
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names each file after its SHA-256 digest.
+
+    The ``upload_to`` directory and the extension are kept, so a lecture PDF
+    lands at ``content/files/3f/3fa1...c2.pdf``. Identical uploads resolve to
+    the same name and are stored once.
+    """
+
+    def _save(self, name, content):
+        digest = file_sha256(content)
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        content.seek(0)
+        return super()._save(name, content)
+
+
+def content_storage():
+    return ContentAddressedStorage()
+
+
+class PartialFile(File):
+    """
+    An assembled chunked upload on local disk.
+
+    Exposing ``temporary_file_path`` lets FileSystemStorage move the file into
+    place with a rename instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+# -----------------------
+# Chunked uploads
+# -----------------------
+def partial_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{session.pk}.part")
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Append ``length`` bytes from ``stream`` to the session's partial file at ``offset``.
+
+    Returns the number of bytes written.
+    """
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = "r+b" if os.path.exists(path) else "wb"
+    written = 0
+    with open(path, mode) as partial:
+        partial.seek(offset)
+        partial.truncate()
+        while written < length:
+            data = stream.read(min(STREAM_CHUNK_SIZE, length - written))
+            if not data:
+                break
+            partial.write(data)
+            written += len(data)
+    return written
+
+
+def finish_upload(session, fieldfile):
+    """Store a completed upload in ``fieldfile`` and remove the session."""
+    path = partial_path(session)
+    with open(path, "rb") as partial:
+        fieldfile.save(session.filename, PartialFile(partial), save=True)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
+    return fieldfile
+
+
+# -----------------------
+# Downloads
+# -----------------------
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header into inclusive ``(start, end)``.
+
+    Returns None for headers we do not honour (multiple or malformed ranges),
+    in which case the whole file is served. Raises ValueError when the range
+    cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == "":
+        if end == "":
+            return None
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _read_range(handle, length):
+    try:
+        while length > 0:
+            data = handle.read(min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        handle.close()
+
+
+def serve_file(request, fieldfile, as_attachment=False):
+    """
+    Stream ``fieldfile`` with ETag/Last-Modified validators and Range support.
+
+    Full responses go through FileResponse so the WSGI server can use
+    ``wsgi.file_wrapper``/sendfile. When ``SENDFILE_HEADER`` is configured the
+    body is left to the front-end server entirely.
+    """
+    storage, name = fieldfile.storage, fieldfile.name
+    size = storage.size(name)
+    modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(content_hash(name) or f"{size:x}-{modified:x}")
+    filename = os.path.basename(name)
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        return response
+
+    if settings.SENDFILE_HEADER:
+        response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response[settings.SENDFILE_HEADER] = settings.SENDFILE_URL_PREFIX + name
+    else:
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        handle = storage.open(name, "rb")
+        if byte_range:
+            start, end = byte_range
+            handle.seek(start)
+            response = StreamingHttpResponse(
+                _read_range(handle, end - start + 1),
+                status=206,
+                content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            )
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            response = FileResponse(handle, as_attachment=as_attachment, filename=filename)
+            response.block_size = STREAM_CHUNK_SIZE
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified)
+    if content_hash(name):
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
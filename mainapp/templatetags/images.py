@@ -0,0 +1,36 @@
+from django import template
+from django.conf import settings
+from django.urls import reverse
+
+from mainapp.images import RENDITIONS, record_savings, rendition_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition_url(fieldfile, size="thumb", fmt="webp"):
+    if not fieldfile:
+        return ""
+    return reverse("images_rendition", args=[size, fmt, fieldfile.name])
+
+
+@register.inclusion_tag("images/picture.html", takes_context=True)
+def picture(context, fieldfile, size="thumb", alt="", css_class=""):
+    """
+    Render a lazily loaded ``<picture>`` with WebP and JPEG renditions.
+
+    Falls back to nothing when the field is empty, so templates can call it
+    unconditionally.
+    """
+    edge, square = RENDITIONS[size]
+    if fieldfile and settings.IMAGE_SAVINGS_REPORT and "request" in context:
+        record_savings(context["request"], fieldfile, rendition_name(fieldfile.name, size, "webp"))
+    return {
+        "fieldfile": fieldfile,
+        "webp": rendition_url(fieldfile, size, "webp"),
+        "jpg": rendition_url(fieldfile, size, "jpg"),
+        "edge": edge,
+        "square": square,
+        "alt": alt,
+        "css_class": css_class,
+    }
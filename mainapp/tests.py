@@ -1,3 +1,1443 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .academic_calendar import active_runs, current_period, current_term
+from .admin import EstimatedCountPaginator
+from .analytics import analyse_quiz, item_statistics
+from .archive import ArchiveError, archive_term, archived_rows
+from .audit import flush as flush_audit, record, replay
+from .auth import user_cache_key
+from .enrollment import current_run_for, drop, enroll
+from .images import ensure_renditions, rendition_name
+from .jobs import claim, enqueue, run as run_job
+from .lessons import lesson_items, sanitize_html
+from .packages import build_package, schedule_build
+from .payments import read_statement, reconcile
+from .ratelimit import take_token
+from .recommendations import co_enrollment, recommended_courses
+from .stats import check_stats, refresh_dirty
+from .models import (
+    AcademicYear, Announcement, ArchivedChunk, Assignment, Attendance, AuditEvent, Choice, Content, Course, CourseNeighbour, CoursePackage, CourseRun, CourseRunStats,
+    Discussion, Enrollment, Institution, Job, Lesson, Module, Payment, Question, Quiz, QuizResponse, SimilarityFlag,
+    StudentBalance, Submission, Term, UploadSession, User,
+)
+from .storage import content_hash, finish_upload
+
+
+def make_course(capacity=0):
+    institution = Institution.objects.create(name="Makerere", slug="makerere")
+    year = AcademicYear.objects.create(
+        institution=institution, name="2025/2026",
+        start_date=datetime.date(2025, 8, 1), end_date=datetime.date(2026, 7, 31),
+    )
+    term = Term.objects.create(
+        institution=institution, academic_year=year, name="Term 1",
+        start_date=datetime.date(2025, 8, 1), end_date=datetime.date(2026, 7, 31),
+    )
+    course = Course.objects.create(institution=institution, code="CS101", title="Intro", is_published=True)
+    run = CourseRun.objects.create(institution=institution, course=course, term=term, capacity=capacity)
+    return course, run
+
+
+# What settings choose when every worker shares the cache; in one test
+# process LocMemCache is shared, so the cached paths can be exercised here.
+SHARED_CACHE_SETTINGS = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+    "AUTHENTICATION_BACKENDS": ["mainapp.auth.CachedUserBackend"],
+    "API_CONDITIONAL_GETS": True,
+}
+
+
+# -----------------------
+# Enrollment
+# -----------------------
+class EnrollmentTests(TestCase):
+    def test_waitlist_and_promotion(self):
+        _, run = make_course(capacity=1)
+        first = enroll(run, User.objects.create(username="a"))
+        second = enroll(run, User.objects.create(username="b"))
+        self.assertEqual((first.status, second.status), ("enrolled", "waitlisted"))
+
+        drop(first)
+        second.refresh_from_db()
+        run.refresh_from_db()
+        self.assertEqual(second.status, "enrolled")
+        self.assertEqual(run.enrolled_count, 1)
+
+    def test_repeat_enroll_is_noop(self):
+        _, run = make_course(capacity=5)
+        student = User.objects.create(username="a")
+        enroll(run, student)
+        enroll(run, student)
+        run.refresh_from_db()
+        self.assertEqual(run.enrolled_count, 1)
+
+    def test_course_without_program_resolves_run(self):
+        course, run = make_course()
+        self.assertIsNone(course.program)
+        self.assertEqual(current_run_for(course, today=datetime.date(2025, 9, 1)), run)
+
+
+@override_settings(AUDIT_SINK=None)
+class EnrollmentConcurrencyTests(TransactionTestCase):
+    students = 200
+    capacity = 25
+
+    def test_parallel_enrollments_never_overbook(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database that supports concurrent connections")
+        _, run = make_course(capacity=self.capacity)
+        students = [User.objects.create(username=f"s{i}") for i in range(self.students)]
+
+        def attempt(student):
+            try:
+                return enroll(run, student).status
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            statuses = list(pool.map(attempt, students))
+
+        run.refresh_from_db()
+        self.assertEqual(statuses.count("enrolled"), self.capacity)
+        self.assertEqual(run.enrolled_count, self.capacity)
+        self.assertEqual(Enrollment.objects.filter(course_run=run, status="enrolled").count(), self.capacity)
+        self.assertEqual(Enrollment.objects.filter(course_run=run, status="waitlisted").count(), self.students - self.capacity)
+
+
+# -----------------------
+# Files
+# -----------------------
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media.name,
+            CHUNKED_UPLOAD_DIR=os.path.join(self.media.name, ".partial"),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.student = User.objects.create(username="a")
+        self.client.force_login(self.student)
+
+    def upload(self, data, chunk=4):
+        started = self.client.post(reverse("uploads_start"), {"filename": "essay.txt", "size": len(data)}).json()
+        url = reverse("uploads_chunk", args=[started["id"]])
+        for start in range(0, len(data), chunk):
+            part = data[start:start + chunk]
+            response = self.client.put(
+                url, part, content_type="application/octet-stream",
+                headers={"Content-Range": f"bytes {start}-{start + len(part) - 1}/{len(data)}"},
+            )
+            self.assertEqual(response.status_code, 200)
+        return started["id"]
+
+    def test_out_of_order_chunk_reports_offset(self):
+        started = self.client.post(reverse("uploads_start"), {"filename": "a.txt", "size": 8}).json()
+        response = self.client.put(
+            reverse("uploads_chunk", args=[started["id"]]), b"5678",
+            content_type="application/octet-stream", headers={"Content-Range": "bytes 4-7/8"},
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["received"], 0)
+
+    def test_identical_uploads_share_storage_and_serve_ranges(self):
+        data = b"the quick brown fox jumps"
+        first = Submission.objects.create(student=self.student)
+        second = Submission.objects.create(student=self.student)
+        finish_upload(UploadSession.objects.get(pk=self.upload(data)), first.file)
+        finish_upload(UploadSession.objects.get(pk=self.upload(data)), second.file)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(content_hash(first.file.name), hashlib.sha256(data).hexdigest())
+
+        url = reverse("submissions_file", args=[first.pk])
+        response = self.client.get(url, headers={"Range": "bytes=4-8"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"quick")
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+    @override_settings(AUDIT_SINK=None)
+    def test_submit_rejects_unknown_and_unfinished_uploads(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="A"))
+        url = reverse("assignments_submit", args=[assignment.pk])
+        self.assertEqual(self.client.post(url, {"upload_id": "not-a-uuid"}).status_code, 404)
+        started = self.client.post(reverse("uploads_start"), {"filename": "a.txt", "size": 8}).json()
+        self.client.post(url, {"upload_id": started["id"]})
+        self.assertFalse(Submission.objects.exists())
+        self.client.post(url, {"upload_id": self.upload(b"finished")})
+        self.assertEqual(Submission.objects.get().file.read(), b"finished")
+
+
+# -----------------------
+# Images
+# -----------------------
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media.name, IMAGE_RENDITIONS_ASYNC=False, IMAGE_SAVINGS_REPORT=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_avatar_renditions_rendered_on_upload_and_served_cached(self):
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 900), "red").save(buffer, "PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username="a", avatar=SimpleUploadedFile("me.png", buffer.getvalue()))
+        self.assertTrue(default_storage.exists(rendition_name(user.avatar.name, "thumb", "webp")))
+
+        response = self.client.get(reverse("images_rendition", args=["thumb", "jpg", user.avatar.name]))
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        with Image.open(BytesIO(b"".join(response.streaming_content))) as thumb:
+            self.assertEqual(thumb.size, (64, 64))
+
+        self.client.force_login(user)
+        page = self.client.get(reverse("users_user_list"))
+        self.assertGreater(int(page["X-Image-Bytes-Saved"]), 0)
+
+    def test_private_and_broken_files_are_not_rendered(self):
+        buffer = BytesIO()
+        Image.new("RGB", (10, 10), "red").save(buffer, "PNG")
+        private = default_storage.save("submissions/secret.png", ContentFile(buffer.getvalue()))
+        broken = default_storage.save("avatars/broken.png", ContentFile(b"not an image"))
+        huge = default_storage.save("avatars/huge.png", ContentFile(buffer.getvalue()))
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 10):  # 10x10 is a decompression bomb now
+            for path in (f"avatars/../{private}", broken, huge):
+                with self.subTest(path=path):
+                    self.assertEqual(self.client.get(reverse("images_rendition", args=["thumb", "jpg", path])).status_code, 404)
+            with self.assertLogs("mainapp.images", "WARNING"):
+                ensure_renditions(huge, ["thumb"])
+
+
+# -----------------------
+# Lessons
+# -----------------------
+class LessonRenderingTests(TestCase):
+    def test_sanitizer_strips_scripts_handlers_and_unsafe_urls(self):
+        html = sanitize_html(
+            '<p onclick="x()">Hi <script>alert(1)</script><a href=" javascript:alert(1)">a</a>'
+            '<a href="https://example.com">b</a><img src="x.png">'
+        )
+        self.assertEqual(
+            html,
+            '<p>Hi <a rel="noopener nofollow">a</a><a href="https://example.com" rel="noopener nofollow">b</a>'
+            '<img src="x.png" loading="lazy" decoding="async"></p>',
+        )
+
+    def test_lesson_items_load_in_one_query(self):
+        _, run = make_course()
+        module = Module.objects.create(course_run=run, title="Week 1")
+        lesson = Lesson.objects.create(module=module, title="Intro", is_published=True)
+        Content.objects.create(lesson=lesson, type="text", title="Read", body="<p>one</p>", order=2)
+        Content.objects.create(lesson=lesson, type="video", title="Watch", video_url="https://youtu.be/abc", order=1)
+        Content.objects.create(lesson=lesson, type="text", title="Hidden", is_visible=False)
+        with self.assertNumQueries(1):
+            items = lesson_items(lesson)
+        self.assertEqual([item["content"].title for item in items], ["Watch", "Read"])
+        self.assertEqual(items[0]["embed_url"], "https://www.youtube-nocookie.com/embed/abc?autoplay=1")
+
+
+# -----------------------
+# Course run stats
+# -----------------------
+@override_settings(AUDIT_SINK=None)
+class CourseRunStatsTests(TestCase):
+    def test_stats_follow_writes_and_match_batch_refresh(self):
+        _, run = make_course()
+        module = Module.objects.create(course_run=run, title="Week 1")
+        lesson = Lesson.objects.create(module=module, title="Intro")
+        students = [User.objects.create(username=f"s{i}") for i in range(4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="Essay"))
+            for student in students:
+                enroll(run, student)
+        with self.captureOnCommitCallbacks(execute=True):
+            Submission.objects.create(assignment=assignment, student=students[0])
+            Submission.objects.create(assignment=assignment, student=students[0])
+            Attendance.objects.create(course_run=run, student=students[0], status="present")
+            Attendance.objects.create(course_run=run, student=students[1], status="absent")
+        self.assertTrue(CourseRunStats.objects.get(course_run=run).dirty)  # marked, not recomputed
+
+        call_command("refresh_course_run_stats", "--dirty", stdout=StringIO())
+        stats = CourseRunStats.objects.get(course_run=run)
+        self.assertFalse(stats.dirty)
+        self.assertEqual(stats.enrolled_count, 4)
+        self.assertEqual(stats.submission_rate, 0.25)
+        self.assertEqual(stats.attendance_rate, 0.5)
+        self.assertEqual(check_stats(), [])
+
+        Attendance.objects.filter(status="absent").update(status="late")
+        self.assertEqual(check_stats(), [(run.pk, "attended_count", 1, 2)])
+        call_command("refresh_course_run_stats", stdout=StringIO())
+        self.assertEqual(check_stats(), [])
+
+    def test_writes_mark_their_run_once_after_commit(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Q"))
+        student = User.objects.create(username="s")
+        with self.assertRaises(ValueError), transaction.atomic():
+            Submission.objects.create(quiz=quiz, student=student, score=1)
+            raise ValueError
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(CourseRunStats.objects.exists())  # the rolled-back write marked nothing
+
+        with self.assertNumQueries(5), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for score in (1, 2, 3):
+                Submission.objects.create(quiz=quiz, student=student, score=score)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(CourseRunStats.objects.filter(dirty=True).values_list("course_run", flat=True)), [run.pk])
+        self.assertEqual(refresh_dirty(), 1)
+        self.assertEqual(CourseRunStats.objects.get(course_run=run).quiz_attempt_count, 3)
+
+
+# -----------------------
+# Item analysis
+# -----------------------
+class ItemAnalysisTests(TestCase):
+    def test_statistics_match_hand_computed_values(self):
+        # Question 1 separates strong from weak attempts; question 2 everyone gets right.
+        questions = [(1, 1), (2, 1)]
+        choices = [(11, 1, True), (12, 1, False), (21, 2, True), (22, 2, False)]
+        submissions = np.array([1, 1, 2, 2, 3, 3, 4, 4])
+        question_ids = np.array([1, 2, 1, 2, 1, 2, 1, 2])
+        choice_ids = np.array([11, 21, 11, 21, 12, 21, 0, 21])
+
+        result = item_statistics(submissions, question_ids, choice_ids, questions, choices)
+        first, second = result["questions"]
+        self.assertEqual(result["submissions"], 4)
+        self.assertEqual(first["difficulty"], 0.5)
+        self.assertEqual(first["discrimination"], 1.0)
+        self.assertEqual(first["omitted"], 1)
+        self.assertEqual([c["count"] for c in first["choices"]], [2, 1])
+        self.assertEqual(second["difficulty"], 1.0)
+        self.assertIsNone(second["point_biserial"])
+
+    def test_choice_edit_invalidates_cached_analysis(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Q"))
+        question = Question.objects.create(quiz=quiz, text="2+2")
+        right = Choice.objects.create(question=question, text="4", is_correct=True)
+        wrong = Choice.objects.create(question=question, text="5")
+        submission = Submission.objects.create(quiz=quiz, student=User.objects.create(username="a"))
+        QuizResponse.objects.create(submission=submission, question=question, selected_choice=wrong)
+
+        quiz.refresh_from_db()
+        self.assertEqual(analyse_quiz(quiz)["questions"][0]["difficulty"], 0.0)
+        wrong.is_correct, right.is_correct = True, False
+        wrong.save()
+        right.save()
+        quiz.refresh_from_db()
+        self.assertEqual(analyse_quiz(quiz)["questions"][0]["difficulty"], 1.0)
+
+
+# -----------------------
+# Similarity
+# -----------------------
+@override_settings(SIMILARITY_ASYNC=False, AUDIT_SINK=None)
+class SimilarityTests(TestCase):
+    essay = (
+        "The water cycle describes how water evaporates from oceans and lakes, condenses into clouds, "
+        "falls back to the ground as rain or snow and finally flows through rivers into the sea again "
+        "where the whole process starts over driven by energy from the sun"
+    )
+
+    def test_copied_answer_is_flagged_and_original_work_is_not(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="Essay"))
+        students = [User.objects.create(username=name) for name in ("a", "b", "c")]
+        with self.captureOnCommitCallbacks(execute=True):
+            original = Submission.objects.create(assignment=assignment, student=students[0], text_answer=self.essay)
+            copy = Submission.objects.create(assignment=assignment, student=students[1], text_answer=self.essay + " indeed")
+            Submission.objects.create(
+                assignment=assignment, student=students[2],
+                text_answer=" ".join(f"word{i}" for i in range(60)),
+            )
+
+        self.assertEqual(list(original.similarity_flags.values_list("other_id", flat=True)), [copy.pk])
+        self.assertEqual(SimilarityFlag.objects.count(), 2)
+
+
+# -----------------------
+# Admin
+# -----------------------
+@override_settings(**SHARED_CACHE_SETTINGS)
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(self.admin)
+        self.client.get(reverse("admin:index"))  # load the session and user into the cache
+
+    def test_changelists_render_with_bounded_queries(self):
+        _, run = make_course()
+        for i in range(20):
+            student = User.objects.create(username=f"s{i}", institution=run.institution)
+            Enrollment.objects.create(institution=run.institution, course_run=run, student=student)
+        for model in ("enrollment", "user", "courserun", "submission", "payment", "attendance"):
+            # count, page, and the password the "Change password" link checks:
+            # the cached user deliberately does not carry it.
+            with self.subTest(model=model), self.assertNumQueries(4):
+                response = self.client.get(reverse(f"admin:mainapp_{model}_changelist"))
+                self.assertEqual(response.status_code, 200)
+
+    def test_unfiltered_count_uses_table_estimate(self):
+        with mock.patch("mainapp.admin.estimated_row_count", return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(Submission.objects.all(), 50).count, 5_000_000)
+            self.assertEqual(EstimatedCountPaginator(Submission.objects.filter(score__gt=1), 50).count, 0)
+
+
+# -----------------------
+# Cached users
+# -----------------------
+@override_settings(**SHARED_CACHE_SETTINGS)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("amina", "amina@example.com", "pw", first_name="Amina")
+        self.client.force_login(self.user)
+
+    def test_user_is_served_from_cache_and_refreshed_on_save(self):
+        self.client.get(reverse("users_profile"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("users_profile"))
+        self.assertContains(response, "Amina")
+
+        self.user.first_name = "Aminah"
+        self.user.save()
+        self.assertContains(self.client.get(reverse("users_profile")), "Aminah")
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.get(reverse("users_profile"))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("users_profile")).status_code, 302)
+
+    def test_password_is_not_cached_and_changing_it_ends_sessions(self):
+        self.client.get(reverse("users_profile"))
+        values, _ = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, values)
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("users_profile")).status_code, 302)
+
+    def test_changing_own_password_keeps_the_session(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.get(reverse("users_profile"))
+        response = self.client.post(reverse("admin:password_change"), {
+            "old_password": "pw", "new_password1": "a-new-Passw0rd", "new_password2": "a-new-Passw0rd",
+        })
+        self.assertRedirects(response, reverse("admin:password_change_done"))
+        self.assertEqual(self.client.get(reverse("users_profile")).status_code, 200)
+
+
+# -----------------------
+# Rate limiting
+# -----------------------
+@override_settings(RATE_LIMITS={"login": {"rate": "2/m", "key": "ip+username"}})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_token_bucket_refills_over_time(self):
+        self.assertEqual(take_token("t", "a", "2/m", now=0), (True, 0))
+        self.assertEqual(take_token("t", "a", "2/m", now=0), (True, 0))
+        self.assertEqual(take_token("t", "a", "2/m", now=1), (False, 29))
+        self.assertEqual(take_token("t", "a", "2/m", now=30), (True, 0))
+
+    def test_login_posts_are_limited_per_ip_and_username(self):
+        self.assertEqual(self.client.get(reverse("login")).status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse("login"), {"username": "x", "password": "y"}).status_code, 302)
+        response = self.client.post(reverse("login"), {"username": "X ", "password": "y"})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response["Retry-After"]) > 0)
+        other = self.client.post(reverse("login"), {"username": "x", "password": "y"}, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(other.status_code, 302)
+        # Someone else behind the same NAT address can still log in.
+        self.assertEqual(self.client.post(reverse("login"), {"username": "z", "password": "y"}).status_code, 302)
+
+
+# -----------------------
+# Idempotent submissions
+# -----------------------
+@override_settings(RATE_LIMITS_ENABLED=False, AUDIT_SINK=None)
+class IdempotentSubmissionTests(TransactionTestCase):
+    retries = 8
+
+    def test_concurrent_retries_create_one_graded_attempt(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database that supports concurrent connections")
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Q"))
+        question = Question.objects.create(quiz=quiz, text="2+2", points=1)
+        right = Choice.objects.create(question=question, text="4", is_correct=True)
+        student = User.objects.create(username="a")
+        key = str(uuid.uuid4())
+
+        def retry(_):
+            client = Client()
+            client.force_login(student)
+            try:
+                response = client.post(
+                    reverse("quizzes_submit", args=[quiz.pk]),
+                    {"idempotency_key": key, f"question_{question.pk}": right.pk},
+                )
+                return response.status_code, response["Location"]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.retries) as pool:
+            results = set(pool.map(retry, range(self.retries)))
+
+        submission = Submission.objects.get(student=student)
+        self.assertEqual(results, {(302, reverse("quizzes_quiz_response", args=[submission.pk]))})
+        self.assertEqual(submission.score, 1)
+        self.assertEqual(QuizResponse.objects.filter(submission=submission).count(), 1)
+
+    def test_submissions_without_a_key_are_not_deduplicated(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="A"))
+        self.client.force_login(User.objects.create(username="a"))
+        url = reverse("assignments_submit", args=[assignment.pk])
+        key = str(uuid.uuid4())
+        for data in ({"submission": "x"}, {"submission": "x"}, {"submission": "y", "idempotency_key": key}, {"submission": "y", "idempotency_key": key}):
+            self.client.post(url, data)
+        self.assertEqual(Submission.objects.filter(assignment=assignment).count(), 3)
+
+    def test_a_key_is_not_reused_for_another_item(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        first, second = (
+            Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title=title))
+            for title in ("A", "B")
+        )
+        self.client.force_login(User.objects.create(username="a"))
+        data = {"submission": "x", "idempotency_key": str(uuid.uuid4())}
+        self.assertEqual(self.client.post(reverse("assignments_submit", args=[first.pk]), data).status_code, 302)
+        self.assertEqual(self.client.post(reverse("assignments_submit", args=[second.pk]), data).status_code, 400)
+        self.assertFalse(Submission.objects.filter(assignment=second).exists())
+
+
+@override_settings(RATE_LIMITS_ENABLED=False, AUDIT_SINK=None)
+class QuizSyncTests(TestCase):
+    def setUp(self):
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        self.quiz = Quiz.objects.create(
+            content=Content.objects.create(lesson=lesson, type="quiz", title="Q"), time_limit_minutes=10
+        )
+        self.questions = [Question.objects.create(quiz=self.quiz, text=f"Q{i}", points=2) for i in range(3)]
+        self.right = [Choice.objects.create(question=q, text="yes", is_correct=True) for q in self.questions]
+        self.wrong = [Choice.objects.create(question=q, text="no") for q in self.questions]
+        self.student = User.objects.create(username="offline")
+        self.client.force_login(self.student)
+
+    def attempt(self, minutes=5, answers=None, key=None):
+        started = timezone.now() - datetime.timedelta(hours=2)
+        return {
+            "key": key or str(uuid.uuid4()), "quiz": self.quiz.pk,
+            "started_at": started.isoformat(),
+            "submitted_at": (started + datetime.timedelta(minutes=minutes)).isoformat(),
+            "answers": answers if answers is not None else {
+                str(self.questions[0].pk): self.right[0].pk, str(self.questions[1].pk): self.wrong[1].pk,
+            },
+        }
+
+    def sync(self, attempts, compress=True):
+        import gzip
+        body = json.dumps({"attempts": attempts}).encode()
+        headers = {"HTTP_CONTENT_ENCODING": "gzip"} if compress else {}
+        return self.client.post(
+            reverse("quizzes_sync"), gzip.compress(body) if compress else body,
+            content_type="application/json", **headers,
+        )
+
+    def test_batch_is_graded_validated_and_idempotent(self):
+        good, late = self.attempt(), self.attempt(minutes=30)
+        results = self.sync([good, late, {"quiz": "x"}]).json()["results"]
+        self.assertEqual([r["status"] for r in results], ["accepted", "rejected", "rejected"])
+        self.assertIn("10 minute limit", results[1]["error"])
+        submission = Submission.objects.get(student=self.student)
+        self.assertEqual(submission.score, 2)
+        self.assertEqual(submission.responses.filter(selected_choice__isnull=False).count(), 2)
+
+        again = self.sync([good], compress=False).json()["results"]
+        self.assertEqual(again, [{"key": good["key"], "status": "duplicate", "submission": submission.pk}])
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 1)
+
+    def test_synced_attempts_keep_client_time_and_refresh_stats_and_stamps(self):
+        from .api import stamp
+        attempt = self.attempt()
+        before = stamp(f"submissions:{self.student.pk}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sync([attempt])
+        self.assertEqual(Submission.objects.get().submitted_at.isoformat(), attempt["submitted_at"])
+        self.assertNotEqual(stamp(f"submissions:{self.student.pk}"), before)
+        refresh_dirty()
+        stats = CourseRunStats.objects.get(course_run=self.quiz.content.lesson.module.course_run)
+        self.assertEqual((stats.quiz_attempt_count, stats.average_quiz_score), (1, 2))
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        self.sync([self.attempt()])  # warm the session and user caches
+        with CaptureQueriesContext(connection) as small:
+            self.sync([self.attempt()])
+        with CaptureQueriesContext(connection) as large:
+            self.sync([self.attempt() for _ in range(40)])
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 42)
+
+    def test_malformed_batches(self):
+        self.assertEqual(self.client.post(reverse("quizzes_sync"), "nope", content_type="application/json").status_code, 400)
+        with override_settings(QUIZ_SYNC_MAX_ATTEMPTS=1):
+            self.assertEqual(self.sync([self.attempt(), self.attempt()]).status_code, 413)
+
+
+class GradingQueueTests(TestCase):
+    def setUp(self):
+        flush_audit()
+        _, run = make_course()
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=run, title="W1"), title="L")
+        self.assignment = Assignment.objects.create(
+            content=Content.objects.create(lesson=lesson, type="assignment", title="Essay"), max_points=10
+        )
+        self.teacher = User.objects.create(username="t")
+        run.teachers.add(self.teacher)
+        students = User.objects.bulk_create(User(username=f"s{i}") for i in range(30))
+        self.submissions = Submission.objects.bulk_create(
+            Submission(assignment=self.assignment, student=s, text_answer="essay") for s in students
+        )
+        self.url = reverse("assignments_grade", args=[self.assignment.pk])
+        self.client.force_login(self.teacher)
+
+    def test_queue_pages_through_ungraded_submissions(self):
+        with override_settings(GRADING_QUEUE_PAGE=10):
+            response = self.client.get(self.url)
+            self.assertEqual([s.pk for s in response.context["queue"]], [s.pk for s in self.submissions[:10]])
+            page = self.client.get(self.url, {"format": "json", "after": self.submissions[9].pk}).json()
+        self.assertEqual([item["id"] for item in page["submissions"]], [s.pk for s in self.submissions[10:20]])
+        self.assertEqual(page["submissions"][0]["student"], "s10")
+
+    def test_batch_is_saved_with_one_bulk_update(self):
+        self.client.get(self.url)  # warm the session and user caches
+
+        def save(submissions, score):
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.url, {f"score-{s.pk}": score for s in submissions})
+            return len(queries)
+
+        self.assertEqual(save(self.submissions[:2], "7"), save(self.submissions[2:25], "8.5"))
+        graded = Submission.objects.filter(score__isnull=False)
+        self.assertEqual(graded.count(), 25)
+        self.assertEqual(set(graded.values_list("graded_by", flat=True)), {self.teacher.pk})
+        self.assertEqual(flush_audit(), 25)
+        self.assertEqual(AuditEvent.objects.filter(kind="submission.graded", actor_id=self.teacher.pk).count(), 25)
+        self.assertEqual([s.pk for s in self.client.get(self.url).context["queue"]], [s.pk for s in self.submissions[25:]])
+
+    def test_out_of_range_scores_and_outsiders_are_refused(self):
+        self.client.post(self.url, {f"score-{self.submissions[0].pk}": "11", f"score-{self.submissions[1].pk}": "5"})
+        self.assertFalse(Submission.objects.filter(score__isnull=False).exists())
+        self.client.force_login(User.objects.create(username="outsider"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class AuditTrailTests(TestCase):
+    def setUp(self):
+        flush_audit()
+        course, self.run = make_course()
+        self.student = User.objects.create(username="s", institution=course.institution)
+        self.teacher = User.objects.create(username="t", institution=course.institution)
+
+    def test_changes_are_buffered_and_written_in_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enroll(self.run, self.student)
+            submission = Submission.objects.create(student=self.student, text_answer="essay")
+        submission = Submission.objects.get(pk=submission.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.score, submission.graded_by, submission.graded_at = 7, self.teacher, timezone.now()
+            submission.save()
+            submission.text_answer = "edited"
+            submission.save()  # no grade change, no event
+        self.assertFalse(AuditEvent.objects.exists())
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_audit(), 3)
+        self.assertEqual(
+            list(AuditEvent.objects.order_by("pk").values_list("kind", "actor_id")),
+            [("enrollment.enrolled", self.student.pk), ("submission.created", self.student.pk),
+             ("submission.graded", self.teacher.pk)],
+        )
+
+    @override_settings(RATE_LIMITS_ENABLED=False)
+    def test_quiz_submit_records_one_scored_event(self):
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=self.run, title="W1"), title="L")
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Q"))
+        question = Question.objects.create(quiz=quiz, text="2+2", points=1)
+        right = Choice.objects.create(question=question, text="4", is_correct=True)
+        self.client.force_login(self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("quizzes_submit", args=[quiz.pk]), {f"question_{question.pk}": right.pk})
+        flush_audit()
+        self.assertEqual(
+            list(AuditEvent.objects.filter(object_type="submission").values_list("kind", "actor_id", "data")),
+            [("submission.created", self.student.pk, {"score": "1.00"})],
+        )
+        self.assertEqual(QuizResponse.objects.get().submission, Submission.objects.get(quiz=quiz))
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                record("payment.created", object_type="payment", object_id=1)
+                transaction.set_rollback(True)
+        self.assertEqual(flush_audit(), 0)
+
+    def test_replay_streams_jsonl_segments_by_time_range(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            AUDIT_SINK="jsonl", AUDIT_LOG_DIR=directory, AUDIT_SEGMENT_BYTES=100
+        ):
+            moments = [timezone.now() - datetime.timedelta(hours=h) for h in (3, 2, 1)]
+            for i, moment in enumerate(moments):
+                with mock.patch("mainapp.audit.timezone.now", return_value=moment):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        record("submission.graded", object_type="submission", object_id=i, score=i)
+                        record("payment.created", object_type="payment", object_id=i)
+                flush_audit()
+            self.assertGreater(len(os.listdir(directory)), 3)  # split by hour and size
+
+            out = StringIO()
+            call_command(
+                "audit_events", "--since", (moments[1] - datetime.timedelta(minutes=1)).isoformat(),
+                "--kind", "submission.graded", stdout=out,
+            )
+            events = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual([(e["object_id"], e["data"]) for e in events], [(1, {"score": 1}), (2, {"score": 2})])
+            since = moments[0] - datetime.timedelta(minutes=1)
+            self.assertEqual(len(list(replay(since, timezone.now(), object_type="payment"))), 3)
+
+
+# -----------------------
+# Payment reconciliation
+# -----------------------
+STATEMENT = os.path.join(os.path.dirname(__file__), "fixtures", "statements", "gateway_statement.csv")
+
+
+class PaymentReconciliationTests(TestCase):
+    def setUp(self):
+        institution = Institution.objects.create(name="Makerere", slug="makerere")
+        self.first, self.second = User.objects.create(username="a"), User.objects.create(username="b")
+        for reference, student, amount in [
+            ("PAY-0001", self.first, "150000"), ("PAY-0002", self.second, "150000"),
+            ("PAY-0003", self.first, "75000"), ("PAY-0004", self.second, "85000"),
+            ("PAY-0005", self.first, "120000"), ("PAY-0006", self.second, "10000"),
+        ]:
+            Payment.objects.create(institution=institution, student=student, amount=amount, reference=reference)
+
+    def test_statement_updates_statuses_and_balances(self):
+        summary, discrepancies = reconcile(read_statement(STATEMENT), chunk_size=3)
+
+        statuses = dict(Payment.objects.values_list("reference", "status"))
+        self.assertEqual(statuses, {
+            "PAY-0001": "completed", "PAY-0002": "completed", "PAY-0003": "failed",
+            "PAY-0004": "pending", "PAY-0005": "pending", "PAY-0006": "pending",
+        })
+        self.assertEqual(
+            (summary["lines"], summary["matched"], summary["updated"], summary["students"]), (8, 5, 3, 2)
+        )
+        self.assertEqual([(line, ref) for line, ref, _ in discrepancies], [(5, "PAY-0004"), (6, "PAY-9999"), (8, "PAY-0006")])
+        self.assertEqual(discrepancies[-1][2], "unreadable line (amount 'not-a-number', status 'success')")
+
+        first, second = self.first.balance, self.second.balance
+        self.assertEqual((first.paid, first.pending, first.payment_count), (150000, 120000, 3))
+        self.assertEqual((second.paid, second.pending, second.payment_count), (150000, 95000, 3))
+
+    def test_short_and_badly_encoded_lines_are_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statement.csv")
+            with open(path, "wb") as handle:
+                handle.write(
+                    b"reference,amount,currency,status\n"
+                    b"PAY-0001,150000.00,UGX,SUCCESS\n"
+                    b"PAY-0002,150000.00\n"
+                    b"PAY-0003,75000.00,UGX,D\xe9clin\xe9\n"
+                    b"PAY-0005,120000.00,UGX,FAILED\n"
+                )
+            summary, discrepancies = reconcile(read_statement(path), chunk_size=2)
+        self.assertEqual((summary["lines"], summary["invalid"], summary["updated"]), (4, 2, 2))
+        self.assertEqual(discrepancies[0], (3, "PAY-0002", "unreadable line (amount '150000.00', status None)"))
+        self.assertEqual([line for line, _, _ in discrepancies], [3, 4])
+        # Each chunk refreshed its own students' balances.
+        self.assertEqual(self.first.balance.paid, 150000)
+        self.assertEqual(self.first.balance.payment_count, 3)
+
+    def test_dry_run_writes_nothing(self):
+        summary, _ = reconcile(read_statement(STATEMENT), dry_run=True)
+        self.assertEqual(summary["updated"], 3)
+        self.assertFalse(Payment.objects.exclude(status="pending").exists())
+        self.assertFalse(StudentBalance.objects.exists())
+
+
+# -----------------------
+# Academic calendar
+# -----------------------
+class AcademicCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course, self.run = make_course()
+        self.institution = self.course.institution
+        self.year = AcademicYear.objects.get()
+        self.first = Term.objects.get()
+        self.first.end_date = datetime.date(2025, 12, 15)
+        self.first.save()
+        self.second = Term.objects.create(
+            institution=self.institution, academic_year=self.year, name="Term 2",
+            start_date=datetime.date(2026, 1, 10), end_date=datetime.date(2026, 4, 30),
+        )
+
+    def test_current_period_is_cached_until_the_next_boundary(self):
+        with mock.patch("mainapp.academic_calendar.local_today", return_value=datetime.date(2025, 10, 1)):
+            self.assertEqual(current_period(self.institution.pk), (self.year, self.first))
+            with self.assertNumQueries(0):
+                year, term = current_period(self.institution.pk)
+                self.assertEqual(str(term), "Term 1 (2025/2026)")
+            self.assertEqual(current_period(self.institution.pk, datetime.date(2025, 12, 15))[1], self.first)
+            # The break between terms, then the second term.
+            self.assertEqual(current_period(self.institution.pk, datetime.date(2025, 12, 16)), (self.year, None))
+            self.assertEqual(current_period(self.institution.pk, datetime.date(2026, 1, 10))[1], self.second)
+
+            self.first.name = "Michaelmas"
+            self.first.save()
+            self.assertEqual(current_term(self.institution.pk).name, "Michaelmas")
+
+    def test_active_runs_fall_back_to_term_dates(self):
+        spring = CourseRun.objects.create(institution=self.institution, course=self.course, term=self.second, name="B")
+        summer = CourseRun.objects.create(
+            institution=self.institution, course=self.course, term=self.second, name="C",
+            start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2026, 7, 1),
+        )
+        late_start = CourseRun.objects.create(
+            institution=self.institution, course=self.course, term=self.first, name="D",
+            start_date=datetime.date(2025, 11, 1),
+        )
+
+        def runs(start, end):
+            return set(active_runs(datetime.date(*start), datetime.date(*end), self.institution.pk))
+
+        self.assertEqual(runs((2025, 8, 1), (2025, 8, 31)), {self.run})
+        self.assertEqual(runs((2025, 11, 1), (2025, 11, 30)), {self.run, late_start})
+        self.assertEqual(runs((2025, 12, 20), (2026, 1, 5)), set())
+        self.assertEqual(runs((2026, 2, 1), (2026, 2, 1)), {spring})
+        self.assertEqual(runs((2026, 4, 30), (2026, 6, 1)), {spring, summer})
+
+    def test_mistyped_time_zone_falls_back_to_utc(self):
+        Institution.objects.filter(pk=self.institution.pk).update(timezone="Africa/Kampal")
+        self.client.force_login(User.objects.create(username="s", institution=self.institution))
+        with self.assertLogs("mainapp.academic_calendar", "ERROR"):
+            self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+
+
+@override_settings(**SHARED_CACHE_SETTINGS)
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course, self.run = make_course()
+        self.student = User.objects.create(username="student", institution=self.course.institution)
+        self.client.force_login(self.student)
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("api_course_detail", args=[self.course.pk]), {"fields": "code,title"})
+        self.assertEqual(response.json(), {"code": "CS101", "title": "Intro"})
+        response = self.client.get(reverse("api_courses"), {"fields": "title,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["error"])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        Course.objects.bulk_create(
+            Course(institution=self.course.institution, code=f"C{i}", title=f"Course {i}", is_published=True)
+            for i in range(6)
+        )
+        seen, cursor = [], None
+        while True:
+            params = {"fields": "id", "limit": 3, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(reverse("api_courses"), params).json()
+            seen += [row["id"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted(Course.objects.values_list("pk", flat=True), reverse=True))
+        self.assertEqual(self.client.get(reverse("api_courses"), {"cursor": "!!"}).status_code, 400)
+
+    def test_conditional_get_until_the_course_changes(self):
+        url = reverse("api_course_detail", args=[self.course.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304
+        )
+
+        Module.objects.create(course_run=self.run, title="Week 1")
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["outline"][0]["title"], "Week 1")
+
+        with override_settings(API_CONDITIONAL_GETS=False):  # per-process cache
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=changed["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+    def test_quiz_hides_answers_and_requires_login(self):
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=self.run, title="Week 1"), title="L")
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Quiz"))
+        question = Question.objects.create(quiz=quiz, text="2 + 2?")
+        Choice.objects.create(question=question, text="4", is_correct=True)
+        data = self.client.get(reverse("api_quiz_detail", args=[quiz.pk]), {"fields": "title,questions"}).json()
+        self.assertEqual(data["title"], "Quiz")
+        self.assertEqual(data["questions"][0]["choices"], [{"id": question.choices.get().pk, "text": "4"}])
+        self.assertEqual(Client().get(reverse("api_submissions")).status_code, 401)
+
+
+@override_settings(COURSE_PACKAGES_ASYNC=False)
+class CoursePackageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.course, self.run = make_course()
+        self.student = User.objects.create(username="student", institution=self.course.institution)
+        Enrollment.objects.create(institution=self.course.institution, course_run=self.run, student=self.student)
+        self.lesson = Lesson.objects.create(
+            module=Module.objects.create(course_run=self.run, title="Week 1"), title="Intro", is_published=True
+        )
+        self.notes = Content.objects.create(lesson=self.lesson, type="text", title="Notes", body="<p>Hi</p><script>x</script>")
+        self.slides = Content.objects.create(lesson=self.lesson, type="file", title="Slides")
+        self.slides.file.save("slides.txt", ContentFile(b"slide " * 1000), save=True)
+        self.client.force_login(self.student)
+
+    def archive(self, response):
+        import zipfile
+        return zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+    def test_full_package_and_delta(self):
+        first = build_package(self.run.pk)
+        self.assertEqual(build_package(self.run.pk), first)  # nothing changed
+        with self.archive(self.client.get(reverse("courses_package", args=[self.run.pk]))) as archive:
+            course = json.loads(archive.read("course.json"))
+            self.assertEqual(course["modules"][0]["lessons"][0]["contents"][0]["body"], "<p>Hi</p>")
+            self.assertEqual(archive.read(course["modules"][0]["lessons"][0]["contents"][1]["file"]), b"slide " * 1000)
+
+        self.notes.body = "<p>Updated</p>"
+        self.notes.save()
+        second = build_package(self.run.pk)
+        self.assertEqual(second.version, 2)
+        response = self.client.get(reverse("courses_package", args=[self.run.pk]), {"since": 1})
+        self.assertEqual(response["X-Package-Base-Version"], "1")
+        with self.archive(response) as archive:
+            self.assertEqual(sorted(archive.namelist()), ["course.json", "manifest.json"])
+        self.assertEqual(
+            self.client.get(reverse("courses_package", args=[self.run.pk]), {"since": 2}).status_code, 204
+        )
+
+    def test_range_requests_resume_a_download(self):
+        package = build_package(self.run.pk)
+        url = reverse("courses_package", args=[self.run.pk])
+        response = self.client.get(url, HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-{package.size - 1}/{package.size}")
+
+    def test_first_request_schedules_a_build_and_edits_rebuild(self):
+        url = reverse("courses_package", args=[self.run.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(url).status_code, 202)
+        self.assertEqual(CoursePackage.objects.get().version, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Content.objects.create(lesson=self.lesson, type="link", title="More", link_url="https://example.com/")
+        self.assertEqual(
+            set(CoursePackage.objects.values_list("version", "base_version")), {(1, None), (2, None), (2, 1)}
+        )
+
+    @override_settings(COURSE_PACKAGES_ASYNC=True)
+    def test_failed_background_builds_are_logged(self):
+        from .packages import _executor
+        with mock.patch("mainapp.packages.build_package", side_effect=RuntimeError("disk full")), \
+                self.assertLogs("mainapp.packages", "ERROR") as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_build(self.run.pk)
+            _executor.submit(lambda: None).result()  # one worker: the build has run
+        self.assertIn("disk full", logs.output[0])
+
+    def test_only_enrolled_students_and_teachers(self):
+        self.client.force_login(User.objects.create(username="outsider", institution=self.course.institution))
+        self.assertEqual(self.client.get(reverse("courses_package", args=[self.run.pk])).status_code, 403)
+
+
+class StaticPipelineTests(TestCase):
+    def test_css_bundle_is_up_to_date(self):
+        call_command("build_css", "--check", stdout=StringIO())
+
+    def test_collected_css_is_hashed_precompressed_and_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={**settings.STORAGES, "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"}},
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin"])
+            html = Client().get(reverse("login")).content.decode()
+            url = re.search(r'href="(/static/mainapp/css/app\.[0-9a-f]{12}\.css)"', html).group(1)
+            self.assertTrue(os.path.exists(os.path.join(root, url.removeprefix("/static/") + ".gz")))
+            response = Client().get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+            self.assertIn("immutable", response["Cache-Control"])
+            self.assertIn(response["Content-Encoding"], {"br", "gzip"})
+
+
+# -----------------------
+# Archival
+# -----------------------
+@override_settings(AUDIT_SINK=None)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        course, self.run = make_course()
+        self.term = self.run.term
+        Term.objects.filter(pk=self.term.pk).update(end_date=datetime.date(2024, 12, 20))
+        lesson = Lesson.objects.create(module=Module.objects.create(course_run=self.run, title="W1"), title="L")
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="Essay"))
+        quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Quiz"))
+        question = Question.objects.create(quiz=quiz, text="2+2?", points=1)
+        choice = Choice.objects.create(question=question, text="4", is_correct=True)
+        self.students = [User.objects.create(username=f"s{i}", institution=course.institution) for i in range(3)]
+        open_term = Term.objects.create(
+            institution=course.institution, academic_year=self.term.academic_year, name="Term 2",
+            start_date=datetime.date(2026, 8, 1), end_date=datetime.date(2026, 12, 20),
+        )
+        open_run = CourseRun.objects.create(institution=course.institution, course=course, term=open_term)
+        with self.captureOnCommitCallbacks(execute=True):
+            essays = [
+                Submission.objects.create(assignment=assignment, student=s, text_answer="essay", score=8)
+                for s in self.students
+            ]
+            for student in self.students:
+                attempt = Submission.objects.create(quiz=quiz, student=student, score=1)
+                QuizResponse.objects.create(submission=attempt, question=question, selected_choice=choice, quiz=quiz)
+                Attendance.objects.create(course_run=self.run, student=student, status="present")
+                Attendance.objects.create(course_run=open_run, student=student, status="present")
+            Discussion.objects.create(course_run=self.run, user=self.students[0], content="Hello")
+            SimilarityFlag.objects.create(submission=essays[0], other=essays[1], similarity=0.9)
+        self.essay = essays[0]
+        refresh_dirty()
+        self.stats = CourseRunStats.objects.values().get(course_run=self.run)
+
+    def test_closed_term_rows_move_to_compressed_chunks(self):
+        out = StringIO()
+        call_command("archive_terms", "--dry-run", stdout=out)
+        self.assertIn("would move 3 attendance, 1 discussion, 3 quizresponse, 1 similarityflag, 6 submission", out.getvalue())
+        self.assertFalse(ArchivedChunk.objects.exists())
+
+        from .api import stamp
+        before = {s.pk: stamp(f"submissions:{s.pk}") for s in self.students}
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = archive_term(self.term, chunk_size=2)
+        self.assertEqual(moved["submission"], 6)
+        # No post_delete was sent, but every student's submission list changed.
+        self.assertTrue(all(stamp(f"submissions:{pk}") != value for pk, value in before.items()))
+        self.assertFalse(Submission.objects.exists())
+        self.assertFalse(QuizResponse.objects.exists() or SimilarityFlag.objects.exists() or Discussion.objects.exists())
+        self.assertEqual(Attendance.objects.count(), 3)  # the open term's
+        self.assertEqual(ArchivedChunk.objects.filter(model="submission").count(), 3)
+
+        # Final figures are kept, and later refreshes leave them alone.
+        self.assertEqual(CourseRunStats.objects.values().get(course_run=self.run), self.stats)
+        self.assertEqual(check_stats(), [])
+        self.assertEqual(archive_term(Term.objects.get(pk=self.term.pk)), {})
+
+    def test_archived_rows_are_queryable(self):
+        archive_term(self.term)
+        rows = list(archived_rows(Submission, student=self.students[1].pk))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row["score"] for row in rows}, {Decimal("8.00"), Decimal("1.00")})
+        self.assertIsInstance(rows[0]["submitted_at"], datetime.datetime)
+        with self.assertNumQueries(1):
+            self.assertEqual([row["text_answer"] for row in archived_rows("submission", pk=self.essay.pk)], ["essay"])
+
+        out = StringIO()
+        call_command("query_archive", "quizresponse", "--where", f"question={Question.objects.get().pk}", "--count", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "3")
+
+    def test_open_terms_are_refused(self):
+        Term.objects.filter(pk=self.term.pk).update(end_date=timezone.localdate())
+        with self.assertRaises(ArchiveError):
+            archive_term(Term.objects.get(pk=self.term.pk))
+
+
+# -----------------------
+# Profiling
+# -----------------------
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.reports = tempfile.TemporaryDirectory()
+        self.addCleanup(self.reports.cleanup)
+        overrides = override_settings(
+            MIDDLEWARE=[*settings.MIDDLEWARE, "mainapp.middleware.ProfilingMiddleware"],
+            PROFILE_DIR=self.reports.name, PROFILE_SAMPLE_RATE=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_staff_can_ask_for_a_profile(self):
+        self.client.force_login(User.objects.create(username="admin", is_staff=True))
+        response = self.client.get(reverse("dashboard"), HTTP_X_PROFILE="1")
+        name = response["X-Profile-Report"]
+        self.assertEqual(sorted(os.listdir(self.reports.name)), [f"{name}.json", f"{name}.prof"])
+
+        out = StringIO()
+        call_command("profiles", name, "--limit", "5", stdout=out)
+        self.assertIn("GET / -> 200", out.getvalue())
+        self.assertIn("SQL timeline", out.getvalue())
+        self.assertIn("mainapp_enrollment", out.getvalue())
+        out = StringIO()
+        call_command("profiles", stdout=out)
+        self.assertIn(name, out.getvalue())
+
+    def test_other_users_are_only_sampled(self):
+        self.client.force_login(User.objects.create(username="student"))
+        self.assertNotIn("X-Profile-Report", self.client.get(reverse("dashboard"), HTTP_X_PROFILE="1"))
+        with override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_KEEP=1):
+            self.client.get(reverse("dashboard"))
+            self.assertIn("X-Profile-Report", self.client.get(reverse("users_profile")))
+        self.assertEqual(len(os.listdir(self.reports.name)), 2)  # pruned to one report
+
+
+# -----------------------
+# Recommendations
+# -----------------------
+class RecommendationTests(TestCase):
+    def test_blocked_co_enrollment_matches_the_dense_product(self):
+        rng = np.random.default_rng(1)
+        incidence = rng.random((500, 40)) < 0.1
+        students, courses = np.nonzero(incidence)
+        with mock.patch("mainapp.recommendations.BLOCK_CELLS", 40 * 7):
+            co, counts = co_enrollment(students, courses, 40)
+        dense = incidence.astype(np.int64)
+        np.testing.assert_array_equal(co, dense.T @ dense)
+        np.testing.assert_array_equal(counts, dense.sum(axis=0))
+
+    def test_last_student_alone_in_a_block_is_counted(self):
+        # With blocks of 7 students, the last student starts a block of its own.
+        rng = np.random.default_rng(2)
+        for n in (1, 8, 7 * 20 + 1):
+            with self.subTest(students=n):
+                incidence = rng.random((n, 40)) < 0.1
+                incidence[-1, :3] = True
+                students, courses = np.nonzero(incidence)
+                with mock.patch("mainapp.recommendations.BLOCK_CELLS", 40 * 7):
+                    co, counts = co_enrollment(students, courses, 40)
+                dense = incidence.astype(np.int64)
+                np.testing.assert_array_equal(co, dense.T @ dense)
+                np.testing.assert_array_equal(counts, dense.sum(axis=0))
+
+    def test_students_also_took(self):
+        _, run = make_course()
+        institution, term = run.institution, run.term
+
+        def course(code, published=True):
+            course = Course.objects.create(institution=institution, code=code, title=code, is_published=published)
+            return CourseRun.objects.create(institution=institution, course=course, term=term)
+
+        runs = {code: course(code) for code in ("B", "C", "D")}
+        runs["A"], runs["E"] = run, course("E", published=False)
+        taking = {"A": range(9), "B": range(4), "C": range(4, 7), "D": [7], "E": range(8)}
+        students = [User.objects.create(username=f"s{i}", institution=institution) for i in range(10)]
+        Enrollment.objects.bulk_create(
+            Enrollment(institution=institution, course_run=runs[code], student=students[i])
+            for code, indexes in taking.items() for i in indexes
+        )
+        Enrollment.objects.create(institution=institution, course_run=runs["A"], student=students[9], status="dropped")
+
+        call_command("build_recommendations", "--min-shared", "2", stdout=StringIO())
+        neighbours = CourseNeighbour.objects.filter(course=run.course)
+        self.assertEqual([n.neighbour.code for n in neighbours], ["B", "C"])  # D shares one student, E is unpublished
+        self.assertAlmostEqual(neighbours[0].score, 4 / 6)  # 4 shared / sqrt(9 * 4)
+
+        newcomer = User.objects.create(username="new", institution=institution)
+        for code in ("B", "C"):
+            Enrollment.objects.create(institution=institution, course_run=runs[code], student=newcomer)
+        with self.assertNumQueries(1):
+            self.assertEqual(recommended_courses(newcomer), [run.course])
+        self.assertEqual(recommended_courses(students[9]), [])  # dropped A, so it is not offered again
+        self.client.force_login(newcomer)
+        self.assertContains(self.client.get(reverse("dashboard")), "Students in your courses also took")
+
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.course, self.run = make_course()
+
+    def test_duplicates_collapse_until_claimed(self):
+        enqueue("course_package", self.run.pk)
+        enqueue("course_package", self.run.pk)
+        self.assertEqual(Job.objects.count(), 1)
+        job = claim("node-a")
+        self.assertIsNone(claim("node-b"))  # one worker per job
+        enqueue("course_package", self.run.pk)  # queued again while the first runs
+        self.assertTrue(run_job(job))
+        self.assertEqual(list(Job.objects.values_list("claimed_at", flat=True)), [None])
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_kept(self):
+        enqueue("similarity", 0)
+        with mock.patch("mainapp.similarity.index_submission", side_effect=RuntimeError("boom")), \
+                self.assertLogs("mainapp.jobs", "ERROR"):
+            self.assertFalse(run_job(claim("node-a")))
+            self.assertFalse(run_job(claim("node-a")))
+        self.assertIsNone(claim("node-a"))
+        self.assertEqual((Job.objects.get().attempts, Job.objects.get().last_error), (2, "RuntimeError('boom')"))
+
+    def test_stale_claims_are_released(self):
+        enqueue("course_package", self.run.pk)
+        claim("node-a")
+        with override_settings(JOB_CLAIM_TIMEOUT=-1):
+            self.assertEqual(claim("node-b").claimed_by, "node-b")
+
+    def test_db_backend_queues_work_for_run_jobs(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(JOB_BACKEND="db", MEDIA_ROOT=media):
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_build(self.run.pk)
+            self.assertEqual(CoursePackage.objects.count(), 0)
+            call_command("run_jobs", "--until-idle", stdout=StringIO())
+            self.assertEqual(CoursePackage.objects.get().course_run, self.run)
+            self.assertFalse(Job.objects.exists())
+
+# -----------------------
+# Query budgets
+# -----------------------
+# url name -> (method, client, max queries, target milliseconds), counted with
+# the session and user already cached and including the on_commit work the
+# request queues (stats, API stamps, audit, background jobs). Every URL in mainapp/urls.py must be
+# listed; QueryBudgetTests also fails when a page's query count changes with
+# the amount of data behind it. Wall-clock time depends on the machine, so the
+# targets are not asserted: pages over theirs are reported on stderr.
+QUERY_BUDGETS = {
+    "dashboard": ("get", "student", 10, 300),
+    "register": ("get", "anonymous", 0, 200),
+    "login": ("get", "anonymous", 0, 200),
+    "logout": ("get", "student", 2, 200),
+    "ratelimit_stats": ("get", "teacher", 0, 200),
+    "courses_list": ("get", "student", 2, 300),
+    "courses_detail": ("get", "student", 2, 300),
+    "courses_enroll": ("post", "student", 4, 300),
+    "courses_package": ("get", "student", 3, 300),
+    "modules_detail": ("get", "student", 2, 300),
+    "modules_lesson_detail": ("get", "student", 2, 300),
+    "assignments_detail": ("get", "student", 1, 200),
+    "assignments_submit": ("post", "student", 4, 300),
+    "assignments_grade": ("get", "teacher", 2, 300),
+    "assignments_submission_detail": ("get", "teacher", 2, 300),
+    "quizzes_detail": ("get", "student", 3, 300),
+    "quizzes_submit": ("post", "student", 9, 300),
+    "quizzes_sync": ("post", "student", 10, 300),
+    "quizzes_quiz_response": ("get", "student", 2, 300),
+    "quizzes_analysis": ("get", "teacher", 7, 500),
+    "uploads_start": ("post", "student", 1, 200),
+    "uploads_chunk": ("get", "student", 1, 200),
+    "contents_file": ("get", "student", 1, 200),
+    "submissions_file": ("get", "student", 1, 200),
+    "images_rendition": ("get", "anonymous", 0, 500),
+    "users_profile": ("get", "student", 0, 200),
+    "users_user_list": ("get", "student", 1, 300),
+    "announcements_list": ("get", "student", 1, 300),
+    "api_courses": ("get", "student", 1, 200),
+    "api_course_detail": ("get", "student", 4, 200),
+    "api_quiz_detail": ("get", "student", 3, 200),
+    "api_submissions": ("get", "student", 1, 200),
+    "api_announcements": ("get", "student", 1, 200),
+}
+
+
+def seed_world(size):
+    """
+    A course whose every list and detail page holds ``size`` rows of each kind.
+
+    Returns the objects the budgeted URLs point at.
+    """
+    course, run = make_course()
+    institution = run.institution
+    teacher = User.objects.create(username="teacher", institution=institution, is_staff=True)
+    student = User.objects.create(username="student", institution=institution)
+    peers = User.objects.bulk_create(User(username=f"peer{i}", institution=institution) for i in range(size))
+    run.teachers.add(teacher)
+    Enrollment.objects.bulk_create(
+        Enrollment(institution=institution, course_run=run, student=s) for s in [student, *peers]
+    )
+    Course.objects.bulk_create(
+        Course(institution=institution, code=f"C{i}", title=f"Course {i}", is_published=True) for i in range(size)
+    )
+    other_course = Course.objects.create(institution=institution, code="ENROL", title="Open", is_published=True)
+    modules = Module.objects.bulk_create(Module(course_run=run, title=f"Week {i}", order=i) for i in range(size))
+    lessons = Lesson.objects.bulk_create(Lesson(module=modules[0], title=f"Lesson {i}", order=i) for i in range(size))
+    lesson = lessons[0]
+    Content.objects.bulk_create(
+        Content(lesson=lesson, type="text", title=f"Notes {i}", body=f"<p>Part {i}</p>", order=i) for i in range(size)
+    )
+    notes = Content.objects.create(lesson=lesson, type="file", title="Slides")
+    notes.file.save("slides.txt", ContentFile(b"slides"), save=True)
+
+    quiz = Quiz.objects.create(content=Content.objects.create(lesson=lesson, type="quiz", title="Quiz"))
+    questions = Question.objects.bulk_create(Question(quiz=quiz, text=f"Q{i}", order=i) for i in range(size))
+    choices = Choice.objects.bulk_create(
+        Choice(question=q, text=f"{q.text}-{c}", is_correct=c == 0) for q in questions for c in range(4)
+    )
+    attempts = Submission.objects.bulk_create(Submission(quiz=quiz, student=s, score=1) for s in [student, *peers])
+    QuizResponse.objects.bulk_create(
+        QuizResponse(submission=a, question=q, selected_choice=choices[i * 4], quiz=quiz)
+        for a in attempts for i, q in enumerate(questions)
+    )
+
+    assignment = Assignment.objects.create(content=Content.objects.create(lesson=lesson, type="assignment", title="Essay"))
+    essays = Submission.objects.bulk_create(
+        Submission(assignment=assignment, student=s, text_answer="essay") for s in [student, *peers]
+    )
+    essays[0].file.save("essay.txt", ContentFile(b"essay"), save=True)
+    SimilarityFlag.objects.bulk_create(
+        SimilarityFlag(submission=essays[0], other=other, similarity=0.9) for other in essays[1:]
+    )
+    Announcement.objects.bulk_create(
+        Announcement(institution=institution, title=f"News {i}", message="...", created_by=teacher) for i in range(size)
+    )
+    upload = UploadSession.objects.create(owner=student, filename="big.bin", size=10)
+    image = BytesIO()
+    Image.new("RGB", (200, 200), "navy").save(image, "PNG")
+    avatar = default_storage.save("avatars/student.png", ContentFile(image.getvalue()))
+
+    build_package(run.pk)
+
+    answers = {f"question_{q.pk}": choices[i * 4].pk for i, q in enumerate(questions)}
+    return {
+        "teacher": teacher, "student": student,
+        "requests": {
+            "courses_detail": ([course.pk], None),
+            "courses_enroll": ([other_course.pk], {}),
+            "courses_package": ([run.pk], None),
+            "modules_detail": ([modules[0].pk], None),
+            "modules_lesson_detail": ([lesson.pk], None),
+            "assignments_detail": ([assignment.pk], None),
+            "assignments_submit": ([assignment.pk], {"submission": "second draft"}),
+            "assignments_grade": ([assignment.pk], None),
+            "assignments_submission_detail": ([essays[0].pk], None),
+            "quizzes_detail": ([quiz.pk], None),
+            "quizzes_submit": ([quiz.pk], answers),
+            "quizzes_sync": ([], json.dumps({"attempts": [
+                {"key": str(uuid.uuid4()), "quiz": quiz.pk, "started_at": timezone.now().isoformat(),
+                 "submitted_at": timezone.now().isoformat(), "answers": {q.pk: choices[i * 4].pk for i, q in enumerate(questions)}}
+                for _ in range(3)
+            ]})),
+            "quizzes_quiz_response": ([attempts[0].pk], None),
+            "quizzes_analysis": ([quiz.pk], None),
+            "uploads_start": ([], {"filename": "big.bin", "size": 10}),
+            "uploads_chunk": ([upload.pk], None),
+            "contents_file": ([notes.pk], None),
+            "submissions_file": ([essays[0].pk], None),
+            "images_rendition": (["thumb", "webp", avatar], None),
+            "api_course_detail": ([course.pk], None),
+            "api_quiz_detail": ([quiz.pk], None),
+        },
+    }
+
+
+@override_settings(RATE_LIMITS_ENABLED=False, **SHARED_CACHE_SETTINGS)
+class QueryBudgetTests(TestCase):
+    sizes = (1, 5, 20)
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        # Audit events go to segments next to the media, written before it is removed.
+        overrides = override_settings(
+            MEDIA_ROOT=self.media.name, AUDIT_SINK="jsonl", AUDIT_LOG_DIR=os.path.join(self.media.name, "audit"),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(flush_audit)
+
+    def test_every_url_has_a_budget(self):
+        from .urls import urlpatterns
+        self.assertEqual({p.name for p in urlpatterns}, set(QUERY_BUDGETS))
+
+    def measure(self, size):
+        """Request every budgeted URL against a world of ``size``; return {name: (queries, ms)}."""
+        results = {}
+        with transaction.atomic():
+            cache.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                world = seed_world(size)
+            for name, (method, who, _, _) in QUERY_BUDGETS.items():
+                client = Client()
+                if who != "anonymous":
+                    client.force_login(world[who])
+                    client.get(reverse("users_profile"))  # load session and user into the cache
+                args, data = world["requests"].get(name, ([], None))
+                url = reverse(name, args=args)
+                # After-commit work (stats, stamps, audit, background jobs) runs
+                # on the request thread too, so it is measured with the request.
+                with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                    started = time.perf_counter()
+                    if method == "get":
+                        response = client.get(url)
+                    elif isinstance(data, str):
+                        response = client.post(url, data, content_type="application/json")
+                    else:
+                        response = client.post(url, data)
+                    elapsed = (time.perf_counter() - started) * 1000
+                self.assertLess(response.status_code, 400, f"{name} returned {response.status_code}")
+                results[name] = (len(queries), elapsed)
+            transaction.set_rollback(True)
+        return results
+
+    def test_pages_stay_within_budget_and_constant_in_queries(self):
+        runs = {size: self.measure(size) for size in self.sizes}
+        for name, (_, _, max_queries, target_ms) in QUERY_BUDGETS.items():
+            with self.subTest(url=name):
+                counts = [runs[size][name][0] for size in self.sizes]
+                self.assertEqual(len(set(counts)), 1, f"{name} queries grow with data: {dict(zip(self.sizes, counts))}")
+                self.assertLessEqual(counts[-1], max_queries, f"{name} ran {counts[-1]} queries")
+                elapsed = runs[self.sizes[-1]][name][1]
+                if elapsed > target_ms:
+                    sys.stderr.write(f"\nquery budgets: {name} took {elapsed:.0f} ms (target {target_ms} ms)")
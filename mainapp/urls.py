@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -9,11 +9,13 @@ urlpatterns = [
     path("register/", views.register_view, name="register"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
+    path("ratelimit/", views.rate_limit_stats, name="ratelimit_stats"),
     
     # Courses
     path('courses/', views.CourseListView.as_view(), name='courses_list'),
     path('courses/<int:pk>/', views.CourseDetailView.as_view(), name='courses_detail'),
     path('courses/<int:pk>/enroll/', views.enroll_course, name='courses_enroll'),
+    path('runs/<int:pk>/package/', views.course_package, name='courses_package'),
 
     # Modules & Lessons
     path('modules/<int:pk>/', views.ModuleDetailView.as_view(), name='modules_detail'),
@@ -22,11 +24,22 @@ urlpatterns = [
     # Assignments
     path('assignments/<int:pk>/', views.AssignmentDetailView.as_view(), name='assignments_detail'),
     path('assignments/<int:pk>/submit/', views.submit_assignment, name='assignments_submit'),
+    path('assignments/<int:pk>/grade/', views.grade_assignment, name='assignments_grade'),
+    path('submissions/<int:pk>/', views.submission_detail, name='assignments_submission_detail'),
 
     # Quizzes
     path('quizzes/<int:pk>/', views.QuizDetailView.as_view(), name='quizzes_detail'),
     path('quizzes/<int:pk>/submit/', views.submit_quiz, name='quizzes_submit'),
+    path('quizzes/sync/', views.sync_quizzes, name='quizzes_sync'),
     path('quizzes/responses/<int:pk>/', views.QuizResponseView.as_view(), name='quizzes_quiz_response'),
+    path('quizzes/<int:pk>/analysis/', views.quiz_analysis, name='quizzes_analysis'),
+
+    # Files
+    path('uploads/', views.upload_start, name='uploads_start'),
+    path('uploads/<uuid:pk>/', views.upload_chunk, name='uploads_chunk'),
+    path('contents/<int:pk>/file/', views.content_file, name='contents_file'),
+    path('submissions/<int:pk>/file/', views.submission_file, name='submissions_file'),
+    path('images/<slug:size>/<slug:fmt>/<path:path>', views.image_rendition, name='images_rendition'),
 
     # Users
     path('profile/', views.profile, name='users_profile'),
@@ -34,4 +47,11 @@ urlpatterns = [
 
     # Announcements
     path('announcements/', views.AnnouncementListView.as_view(), name='announcements_list'),
+
+    # JSON API
+    path('api/courses/', api.courses, name='api_courses'),
+    path('api/courses/<int:pk>/', api.course_detail, name='api_course_detail'),
+    path('api/quizzes/<int:pk>/', api.quiz_detail, name='api_quiz_detail'),
+    path('api/submissions/', api.submissions, name='api_submissions'),
+    path('api/announcements/', api.announcements, name='api_announcements'),
 ]
@@ -1,15 +1,36 @@
+import os
+import posixpath
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, DetailView
 from django.urls import reverse
 from .models import (
     Course, CourseRun, Module, Lesson, Assignment, Submission, Quiz, Question,
-    Choice, QuizResponse, Enrollment, User, Announcement
+    Choice, QuizResponse, Enrollment, User, Announcement, Content, UploadSession,
+    CourseRunStats, CoursePackage,
 )
 from django.utils import timezone
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from .academic_calendar import current_period
+from .enrollment import current_run_for, enroll
+from .grading import SyncError, grading_queue, read_batch, save_grades, score_answers, sync_attempts
+from .images import FORMATS, RENDITIONS, SOURCE_PREFIXES, UnreadableImage, render as render_image
+from .lessons import lesson_items
+from .packages import schedule_build
+from .ratelimit import counters as rate_limit_counters, rate_limit
+from .recommendations import recommended_courses
+from .storage import finish_upload, serve_file, write_chunk
 User = get_user_model()  # ensures your custom User model is used
 
 # -----------------------
@@ -20,10 +41,17 @@ def dashboard(request):
     enrolled_courses_count = Enrollment.objects.filter(student=request.user, is_active=True).count()
     pending_assignments_count = Submission.objects.filter(student=request.user, score__isnull=True).count()
     pending_quizzes_count = Quiz.objects.exclude(submission__student=request.user).count()
+    teaching_stats = CourseRunStats.objects.filter(
+        course_run__teachers=request.user
+    ).select_related('course_run__course', 'course_run__term')
+    current_term = current_period(request.user.institution_id)[1] if request.user.institution_id else None
     return render(request, 'dashboard.html', {
+        'current_term': current_term,
         'enrolled_courses_count': enrolled_courses_count,
         'pending_assignments_count': pending_assignments_count,
         'pending_quizzes_count': pending_quizzes_count,
+        'teaching_stats': teaching_stats,
+        'recommended_courses': recommended_courses(request.user),
     })
 
 # -----------------------
@@ -37,6 +65,12 @@ class CourseListView(ListView):
     def get_queryset(self):
         return Course.objects.filter(is_published=True)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.is_authenticated:
+            context['recommended_courses'] = recommended_courses(self.request.user)
+        return context
+
 class CourseDetailView(DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
@@ -50,9 +84,14 @@ class CourseDetailView(DetailView):
 @login_required
 def enroll_course(request, pk):
     course = get_object_or_404(Course, pk=pk)
-    run, _ = CourseRun.objects.get_or_create(course=course, term=course.program.institution.academicyear_set.first())
-    Enrollment.objects.get_or_create(course_run=run, student=request.user)
-    return redirect('courses:detail', pk=course.pk)
+    run = current_run_for(course)
+    if run is None:
+        messages.error(request, "This course has no open term to enroll in yet.")
+        return redirect('courses_detail', pk=course.pk)
+    enrollment = enroll(run, request.user)
+    if enrollment.status == "waitlisted":
+        messages.info(request, "This course is full. You have been added to the waitlist.")
+    return redirect('courses_detail', pk=course.pk)
 
 
 
@@ -77,6 +116,11 @@ class LessonDetailView(DetailView):
     template_name = 'modules/lesson_detail.html'
     context_object_name = 'lesson'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['items'] = lesson_items(self.object)
+        return context
+
 
 
 # -----------------------# Assignments
@@ -89,19 +133,142 @@ class AssignmentDetailView(DetailView):
     template_name = 'assignments/assignment_detail.html'
     context_object_name = 'assignment'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['idempotency_key'] = uuid.uuid4()
+        return context
+
+
+def _idempotency_key(request):
+    raw = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+    try:
+        return uuid.UUID(raw) if raw else None
+    except ValueError:
+        return None
+
+
+def _existing_submission(request, key, **item):
+    """
+    The caller's submission made with idempotency ``key``, or None. ``item``
+    (``quiz=`` or ``assignment=``) is what is being submitted; a key already
+    used for something else is refused rather than redirected to its work.
+    """
+    if key is None:
+        return None
+    submission = Submission.objects.filter(student=request.user, idempotency_key=key).first()
+    if submission is not None and any(getattr(submission, f"{name}_id") != obj.pk for name, obj in item.items()):
+        raise BadRequest("This idempotency key was used for another submission.")
+    return submission
+
+
+def _upload_session(request):
+    """The caller's UploadSession named by POST ``upload_id``, or None when none is given."""
+    raw = request.POST.get("upload_id")
+    if not raw:
+        return None
+    try:
+        pk = uuid.UUID(raw)
+    except ValueError:
+        raise Http404
+    return get_object_or_404(UploadSession, pk=pk, owner=request.user)
+
 @login_required
+@rate_limit('submit_assignment')
 def submit_assignment(request, pk):
     assignment = get_object_or_404(Assignment, pk=pk)
     if request.method == "POST":
+        key = _idempotency_key(request)
+        if _existing_submission(request, key, assignment=assignment):
+            return redirect('assignments_detail', pk=assignment.pk)
+        upload = _upload_session(request)
+        if upload is not None and not upload.is_complete:
+            messages.error(request, "The file upload has not finished; resume it and submit again.")
+            return redirect('assignments_detail', pk=assignment.pk)
         content = request.POST.get("submission")
-        Submission.objects.create(
-            assignment=assignment,
-            student=request.user,
-            text_answer=content,
-            submitted_at=timezone.now()
-        )
-        return redirect('assignments:detail', pk=assignment.pk)
-    return redirect('assignments:detail', pk=assignment.pk)
+        try:
+            submission = Submission.objects.create(
+                assignment=assignment,
+                student=request.user,
+                text_answer=content or "",
+                submitted_at=timezone.now(),
+                idempotency_key=key,
+            )
+        except IntegrityError:
+            # A retry of this POST got there first.
+            if _existing_submission(request, key, assignment=assignment) is None:
+                raise
+            return redirect('assignments_detail', pk=assignment.pk)
+        if upload is not None:
+            finish_upload(upload, submission.file)
+        elif request.FILES.get("file"):
+            submission.file = request.FILES["file"]
+            submission.save(update_fields=["file"])
+        return redirect('assignments_detail', pk=assignment.pk)
+    return redirect('assignments_detail', pk=assignment.pk)
+
+
+def _queue_item(submission):
+    return {
+        'id': submission.pk,
+        'student': submission.student.get_full_name() or submission.student.username,
+        'submitted_at': submission.submitted_at,
+        'text_answer': submission.text_answer,
+        'file_url': reverse('submissions_file', args=[submission.pk]) if submission.file else None,
+        'detail_url': reverse('assignments_submission_detail', args=[submission.pk]),
+    }
+
+
+@login_required
+def grade_assignment(request, pk):
+    assignment = get_object_or_404(
+        Assignment.objects.select_related('content__lesson__module__course_run'), pk=pk
+    )
+    if not _teaches(request.user, assignment.content.lesson.module.course_run):
+        return HttpResponseForbidden()
+    if request.method == 'POST':
+        # Fields are score-<submission id>; blank ones are left ungraded.
+        scores = {}
+        try:
+            for name, value in request.POST.items():
+                if name.startswith('score-') and value.strip():
+                    scores[int(name.removeprefix('score-'))] = Decimal(value)
+            graded = save_grades(assignment, request.user, scores)
+        except (ValueError, InvalidOperation) as exc:
+            messages.error(request, str(exc) if isinstance(exc, ValueError) else 'Scores must be numbers.')
+        else:
+            messages.success(request, f'Saved {len(graded)} grade(s).')
+        return redirect('assignments_grade', pk=assignment.pk)
+
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    queue = grading_queue(assignment, after)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'submissions': [_queue_item(s) for s in queue]})
+    return render(request, 'assignments/grading_queue.html', {
+        'assignment': assignment,
+        'queue': queue,
+        'page_size': settings.GRADING_QUEUE_PAGE,
+    })
+
+
+@login_required
+def submission_detail(request, pk):
+    submission = get_object_or_404(
+        Submission.objects.select_related('assignment__content__lesson__module__course_run', 'student'), pk=pk
+    )
+    is_teacher = submission.assignment is not None and _teaches(
+        request.user, submission.assignment.content.lesson.module.course_run
+    )
+    if submission.student_id != request.user.pk and not is_teacher:
+        return HttpResponseForbidden()
+    flags = submission.similarity_flags.select_related('other__student') if is_teacher else []
+    return render(request, 'assignments/submission_detail.html', {
+        'submission': submission,
+        'similarity_flags': flags,
+        'is_teacher': is_teacher,
+    })
 
 
 # -----------------------# Quizzes
@@ -117,28 +284,85 @@ class QuizDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['questions'] = self.object.questions.all()
+        context['questions'] = self.object.questions.prefetch_related('choices')
+        context['idempotency_key'] = uuid.uuid4()
         return context
 
 @login_required
+@rate_limit('submit_quiz')
 def submit_quiz(request, pk):
     quiz = get_object_or_404(Quiz, pk=pk)
     if request.method == "POST":
-        submission = Submission.objects.create(
-            quiz=quiz,
-            student=request.user,
-            submitted_at=timezone.now()
+        key = _idempotency_key(request)
+        submission = _existing_submission(request, key, quiz=quiz)
+        if submission is not None:
+            return redirect('quizzes_quiz_response', pk=submission.pk)
+        questions = list(quiz.questions.all())
+        selected = {}
+        for question in questions:
+            choice_id = request.POST.get(f"question_{question.id}", "")
+            selected[question.id] = int(choice_id) if choice_id.isdigit() else None
+        choices = Choice.objects.filter(question__quiz=quiz).in_bulk(
+            [c for c in selected.values() if c is not None]
         )
-        for question in quiz.questions.all():
-            choice_id = request.POST.get(f"question_{question.id}")
-            selected_choice = Choice.objects.filter(id=choice_id).first() if choice_id else None
-            QuizResponse.objects.create(
-                submission=submission,
-                question=question,
-                selected_choice=selected_choice
-            )
-        return redirect('quizzes:quiz_response', pk=submission.pk)
-    return redirect('quizzes:detail', pk=quiz.pk)
+        try:
+            with transaction.atomic():
+                submission = _grade_quiz(quiz, request.user, questions, selected, choices, key)
+        except IntegrityError:
+            # A retry of this POST got there first; show its result without regrading.
+            submission = _existing_submission(request, key, quiz=quiz)
+            if submission is None:
+                raise
+        return redirect('quizzes_quiz_response', pk=submission.pk)
+    return redirect('quizzes_detail', pk=quiz.pk)
+
+
+def _grade_quiz(quiz, student, questions, selected, choices, key):
+    submission = Submission(
+        quiz=quiz,
+        student=student,
+        submitted_at=timezone.now(),
+        idempotency_key=key,
+    )
+    # Stored so stats and gradebooks need not re-score every response. Scored
+    # before the insert, so the row (and its audit event) has the score from
+    # the start instead of a second save looking like a manual grade.
+    submission.score, responses = score_answers(submission, quiz, questions, selected, choices)
+    submission.save()
+    QuizResponse.objects.bulk_create(responses)
+    return submission
+
+@login_required
+@rate_limit('sync_quiz')
+def sync_quizzes(request):
+    """
+    Accept quiz attempts answered offline as one JSON (optionally gzipped)
+    batch; see mainapp.grading.sync_attempts for the format and results.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        attempts = read_batch(request)
+    except SyncError as exc:
+        return JsonResponse({"error": str(exc)}, status=exc.status)
+    return JsonResponse({"results": sync_attempts(request.user, attempts)})
+
+@login_required
+def quiz_analysis(request, pk):
+    quiz = get_object_or_404(Quiz.objects.select_related('content__lesson__module__course_run'), pk=pk)
+    if not _teaches(request.user, quiz.content.lesson.module.course_run):
+        return HttpResponseForbidden()
+    from .analytics import analyse_quiz  # NumPy: keep it out of worker boot
+    analysis = analyse_quiz(quiz)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(analysis)
+    questions = quiz.questions.prefetch_related('choices').in_bulk()
+    choices = {c.id: c for q in questions.values() for c in q.choices.all()}
+    for item in analysis['questions']:
+        item['question'] = questions[item['id']]
+        for choice in item['choices']:
+            choice['choice'] = choices[choice['id']]
+    return render(request, 'quizzes/quiz_analysis.html', {'quiz': quiz, 'analysis': analysis})
 
 class QuizResponseView(DetailView):
     model = Submission
@@ -147,12 +371,180 @@ class QuizResponseView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['responses'] = self.object.responses.all()
-        context['score'] = sum(r.question.points for r in self.object.responses.all() if r.selected_choice and r.selected_choice.is_correct)
-        context['total'] = sum(r.question.points for r in self.object.responses.all())
+        responses = list(self.object.responses.select_related('question', 'selected_choice'))
+        context['responses'] = responses
+        context['score'] = sum(r.question.points for r in responses if r.selected_choice and r.selected_choice.is_correct)
+        context['total'] = sum(r.question.points for r in responses)
         return context
 
 
+# -----------------------
+# Files
+# -----------------------
+def _teaches(user, course_run):
+    return user.is_staff or course_run.teachers.filter(pk=user.pk).exists()
+
+
+@login_required
+def upload_start(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        return JsonResponse({"error": "size is required"}, status=400)
+    filename = os.path.basename(request.POST.get("filename", "")).strip()
+    if not filename or size <= 0:
+        return JsonResponse({"error": "filename and a positive size are required"}, status=400)
+    session = UploadSession.objects.create(owner=request.user, filename=filename, size=size)
+    return JsonResponse({
+        "id": str(session.pk),
+        "received": 0,
+        "chunk_size": settings.CHUNKED_UPLOAD_MAX_CHUNK,
+    }, status=201)
+
+
+@login_required
+def upload_chunk(request, pk):
+    """
+    Resumable upload endpoint.
+
+    GET reports how many bytes the server holds; PUT/POST appends a chunk
+    whose offset is given by ``Content-Range: bytes start-end/total``. A chunk
+    at the wrong offset is rejected with 409 and the current offset, so the
+    client can resume from there.
+    """
+    session = get_object_or_404(UploadSession, pk=pk, owner=request.user)
+    if request.method == "GET":
+        return JsonResponse({"received": session.received, "complete": session.is_complete})
+    if request.method not in ("PUT", "POST"):
+        return HttpResponseNotAllowed(["GET", "PUT", "POST"])
+
+    match = re.match(r"^bytes (\d+)-(\d+)/(\d+)$", request.headers.get("Content-Range", ""))
+    if not match:
+        return JsonResponse({"error": "Content-Range header is required"}, status=400)
+    start, end, total = (int(g) for g in match.groups())
+    length = end - start + 1
+    if total != session.size or end >= total or length <= 0:
+        return JsonResponse({"error": "Content-Range does not match this upload"}, status=400)
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+        return JsonResponse({"error": "chunk too large"}, status=413)
+    if start != session.received:
+        return JsonResponse({"received": session.received}, status=409)
+
+    written = write_chunk(session, start, request, length)
+    if written != length:
+        return JsonResponse({"error": "incomplete chunk", "received": session.received}, status=400)
+    # Only one of two racing retries of the same chunk advances the offset.
+    if not UploadSession.objects.filter(pk=session.pk, received=start).update(received=start + written):
+        session.refresh_from_db()
+        return JsonResponse({"received": session.received}, status=409)
+    session.received = start + written
+    return JsonResponse({"received": session.received, "complete": session.is_complete})
+
+
+@login_required
+def content_file(request, pk):
+    content = get_object_or_404(Content.objects.select_related("lesson__module__course_run"), pk=pk)
+    if request.method == "POST":
+        if not _teaches(request.user, content.lesson.module.course_run):
+            return HttpResponseForbidden()
+        session = _upload_session(request)
+        if session is None:
+            return JsonResponse({"error": "upload_id is required"}, status=400)
+        if not session.is_complete:
+            return JsonResponse({"received": session.received}, status=409)
+        finish_upload(session, content.file)
+        return JsonResponse({"name": content.file.name})
+    if not content.file:
+        raise Http404
+    return serve_file(request, content.file)
+
+
+@login_required
+def submission_file(request, pk):
+    submission = get_object_or_404(
+        Submission.objects.select_related("assignment__content__lesson__module__course_run"), pk=pk
+    )
+    if not submission.file:
+        raise Http404
+    if submission.student_id != request.user.pk:
+        if submission.assignment is None or not _teaches(request.user, submission.assignment.content.lesson.module.course_run):
+            return HttpResponseForbidden()
+    return serve_file(request, submission.file, as_attachment=True)
+
+
+def image_rendition(request, size, fmt, path):
+    """
+    Serve a resized avatar/logo rendition with far-future caching.
+
+    Renditions are normally rendered in the background at upload time; a
+    missing one is rendered here once and cached on disk.
+    """
+    # Storage only refuses paths outside MEDIA_ROOT, so "avatars/../submissions/"
+    # would pass the prefix check: only normalised paths are served.
+    if posixpath.normpath(path) != path or ".." in path.split("/"):
+        raise Http404
+    if size not in RENDITIONS or fmt not in FORMATS or not path.startswith(SOURCE_PREFIXES):
+        raise Http404
+    try:
+        if not default_storage.exists(path):
+            raise Http404
+        name = render_image(path, size, fmt)
+    except (SuspiciousFileOperation, UnreadableImage, OSError):
+        raise Http404
+    response = FileResponse(default_storage.open(name, "rb"), content_type=FORMATS[fmt][1])
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+# -----------------------
+# Offline packages
+# -----------------------
+@login_required
+def course_package(request, pk):
+    """
+    Download a CourseRun's offline package.
+
+    ``?since=<version>`` asks for the delta from a version the client already
+    has; the full package is sent when no such delta exists, and 204 when the
+    client is up to date. The archive is served with Range support so broken
+    downloads resume. Until the first build finishes the response is 202.
+    """
+    run = get_object_or_404(CourseRun.objects.select_related("course"), pk=pk)
+    enrolled = Enrollment.objects.filter(course_run=run, student=request.user, status="enrolled").exists()
+    if not enrolled and not _teaches(request.user, run):
+        return HttpResponseForbidden()
+
+    latest = CoursePackage.objects.filter(course_run=run, base_version__isnull=True).order_by("-version").first()
+    if latest is None:
+        schedule_build(run.pk)
+        response = JsonResponse({"status": "building"}, status=202)
+        response["Retry-After"] = "30"
+        return response
+
+    package = latest
+    since = request.GET.get("since", "")
+    if since.isdigit():
+        if int(since) >= latest.version:
+            response = HttpResponse(status=204)
+            response["X-Package-Version"] = str(latest.version)
+            return response
+        package = CoursePackage.objects.filter(
+            course_run=run, version=latest.version, base_version=int(since)
+        ).first() or latest
+
+    response = serve_file(request, package.archive, as_attachment=True)
+    response["X-Package-Version"] = str(package.version)
+    if package.base_version:
+        response["X-Package-Base-Version"] = str(package.base_version)
+    # The URL stays the same across versions: revalidate instead of caching forever.
+    response["Cache-Control"] = "private, no-cache"
+    suffix = f"-from-v{package.base_version}" if package.base_version else ""
+    response["Content-Disposition"] = f'attachment; filename="{run.course.code}-v{package.version}{suffix}.zip"'
+    return response
+
+
 # users views
 # -----------------------
 # Users
@@ -180,8 +572,8 @@ class AnnouncementListView(ListView):
     context_object_name = 'announcements'
 
     def get_queryset(self):
-        if hasattr(self.request.user, 'institution') and self.request.user.institution:
-            return Announcement.objects.filter(institution=self.request.user.institution).order_by('-created_at')
+        if getattr(self.request.user, 'institution_id', None):
+            return Announcement.objects.filter(institution_id=self.request.user.institution_id).order_by('-created_at')
         return Announcement.objects.all().order_by('-created_at')
 
 
@@ -193,6 +585,7 @@ class AnnouncementListView(ListView):
 # -----------------------
 # User Registration
 # -----------------------
+@rate_limit('register')
 def register_view(request):
     if request.method == "POST":
         full_name = request.POST.get("full_name")
@@ -228,6 +621,8 @@ def register_view(request):
 # -----------------------
 # User Login
 # -----------------------
+@rate_limit('login_ip')
+@rate_limit('login')
 def login_view(request):
     if request.method == "POST":
         email = request.POST.get("username")
@@ -242,6 +637,16 @@ def login_view(request):
     return render(request, "users/login.html")
 
 
+# -----------------------
+# Rate limits
+# -----------------------
+@login_required
+def rate_limit_stats(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse(rate_limit_counters())
+
+
 # -----------------------
 # User Logout
 # -----------------------
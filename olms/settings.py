@@ -1,4 +1,5 @@
 import os
+import warnings
 
 from pathlib import Path
 
@@ -13,7 +14,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'django-insecure-on%46(ze@ba)4%v46m)gcmh)t#bhv1xftkun0wesk*_!gdq)yc'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = ['*']
 
@@ -21,7 +22,10 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # SimpleAdminConfig skips admin autodiscovery during setup; olms/urls.py
+    # runs it when the URLconf is first loaded, so management commands and
+    # non-web processes never import the admin modules.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -41,8 +45,6 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 
 ROOT_URLCONF = 'olms.urls'
 
@@ -70,7 +72,17 @@ WSGI_APPLICATION = 'olms.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('DJANGO_DB_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Take the write lock at BEGIN so concurrent requests queue on the
+        # busy timeout instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed test database so threaded tests get real connections.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -110,6 +122,66 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# `manage.py collectstatic` copies every app's static files here. The
+# production storage renames them after their content hash and writes .gz and
+# (with Brotli installed) .br copies, which WhiteNoise serves by
+# Accept-Encoding with a one-year immutable Cache-Control. Development uses
+# the plain storage so nothing needs collecting.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+if DEBUG:
+    # Until collectstatic runs, WhiteNoise warns that STATIC_ROOT is missing;
+    # in development files come from the app directories instead.
+    warnings.filterwarnings('ignore', message='No directory at', category=UserWarning)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Chunked uploads are assembled here; keep it on the same filesystem as
+# MEDIA_ROOT so finished files are moved into place with a rename.
+CHUNKED_UPLOAD_DIR = os.path.join(MEDIA_ROOT, '.partial')
+CHUNKED_UPLOAD_MAX_CHUNK = 8 * 1024 * 1024
+
+# Set to 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (Apache) to let the
+# front-end server stream protected files instead of a Django worker.
+SENDFILE_HEADER = None
+SENDFILE_URL_PREFIX = '/protected-media/'
+
+# Avatar/logo renditions are rendered on a background thread after upload.
+IMAGE_RENDITIONS_ASYNC = True
+# Text submissions are compared for copying on a background thread after save;
+# pairs whose estimated Jaccard similarity reaches the threshold are flagged.
+SIMILARITY_ASYNC = True
+SIMILARITY_THRESHOLD = 0.6
+# Offline course packages are rebuilt on a background thread after their
+# contents change. Each version gets delta archives from this many previous
+# versions; clients further behind download the full package.
+COURSE_PACKAGES_ASYNC = True
+COURSE_PACKAGE_DELTAS = 3
+
+# Adds an X-Image-Bytes-Saved header with the bytes renditions saved per page.
+# The middleware stays installed and does nothing while this is off.
+IMAGE_SAVINGS_REPORT = DEBUG
+MIDDLEWARE.append('mainapp.middleware.ImageSavingsMiddleware')
+
+# Request profiling (mainapp.profiling): a PROFILE_SAMPLE_RATE fraction of
+# requests, and staff requests sending a PROFILE_HEADER header, run under
+# cProfile with their SQL timed. Reports go to PROFILE_DIR, newest
+# PROFILE_KEEP kept; list them with `manage.py profiles`. With PROFILING off
+# the middleware is not installed at all.
+PROFILING = os.environ.get('DJANGO_PROFILING', '0') == '1'
+PROFILE_SAMPLE_RATE = float(os.environ.get('DJANGO_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_HEADER = 'X-Profile'
+PROFILE_DIR = os.path.join(BASE_DIR, 'var', 'profiles')
+PROFILE_KEEP = 200
+if PROFILING:
+    MIDDLEWARE.append('mainapp.middleware.ProfilingMiddleware')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -117,5 +189,122 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "mainapp.User"
 
+# Sessions and request.user are only served from the cache when every worker
+# reads the same one (DJANGO_SHARED_DIR or DJANGO_REDIS_URL, see "Several app
+# nodes" below). With the default per-process LocMemCache, a logout, password
+# change or deactivation handled by one gunicorn worker would only clear that
+# worker's copy, and the others would keep honouring the old session for up
+# to AUTH_USER_CACHE_TIMEOUT seconds.
+SHARED_CACHE = bool(os.environ.get('DJANGO_SHARED_DIR') or os.environ.get('DJANGO_REDIS_URL'))
+
+# Sessions are read from the cache and written through to the database.
+# 'django.contrib.sessions.backends.signed_cookies' drops the session table
+# entirely, but sessions can then no longer be revoked server-side.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + ('cached_db' if SHARED_CACHE else 'db')
+
+# request.user comes from a cached projection of the user row; see mainapp.auth.
+AUTHENTICATION_BACKENDS = [
+    'mainapp.auth.CachedUserBackend' if SHARED_CACHE else 'django.contrib.auth.backends.ModelBackend'
+]
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# The JSON API's ETag/Last-Modified come from version stamps in the cache
+# (mainapp.api), bumped by the worker that saw the change. Other workers
+# would keep answering 304 from their own stale stamps, so conditional GETs
+# are only offered with a shared cache.
+API_CONDITIONAL_GETS = SHARED_CACHE
+
+# Token buckets for expensive POSTs (password hashing, grading). 'rate' is the
+# sustained rate, 'burst' the bucket size, 'key' whether clients are told
+# apart by IP, by logged-in user, or by IP plus a POSTed field ('ip+username').
+# Behind a proxy, make sure REMOTE_ADDR is the client address.
+# A whole campus usually shares one NAT address, so per-IP limits are sized
+# for a lab of students, not one person: login guesses are limited per
+# IP and username, with a loose per-IP ceiling on top, and registration
+# allows a class signing up at once while still stopping scripted sign-ups.
+RATE_LIMITS_ENABLED = True
+RATE_LIMITS = {
+    'login': {'rate': '10/m', 'burst': 5, 'key': 'ip+username'},
+    'login_ip': {'rate': '300/m', 'burst': 100, 'key': 'ip'},
+    'register': {'rate': '120/h', 'burst': 60, 'key': 'ip'},
+    'submit_quiz': {'rate': '10/m', 'key': 'user'},
+    'submit_assignment': {'rate': '10/m', 'key': 'user'},
+    'sync_quiz': {'rate': '6/m', 'burst': 3, 'key': 'user'},
+}
+
+# Audit trail (mainapp.audit): events are buffered per process and written
+# AUDIT_BATCH_SIZE at a time, or every AUDIT_FLUSH_INTERVAL seconds, to the
+# AuditEvent table ('db') or to hourly JSONL segments under AUDIT_LOG_DIR
+# ('jsonl'). None turns auditing off. Buffered events are lost if a worker is
+# killed outright; on a normal shutdown they are flushed.
+AUDIT_SINK = 'db'
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 5
+AUDIT_BUFFER_MAX = 50_000
+AUDIT_LOG_DIR = os.path.join(BASE_DIR, 'var', 'audit')
+AUDIT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Offline quiz sync (mainapp.grading): limits per batch, and how far client
+# clocks may drift before timestamps are rejected.
+QUIZ_SYNC_MAX_BYTES = 1024 * 1024
+QUIZ_SYNC_MAX_ATTEMPTS = 50
+QUIZ_SYNC_CLOCK_SKEW = 300
+
+# "Students also took" (mainapp.recommendations): build_recommendations stores
+# each course's RECOMMENDATIONS_TOP_K most co-enrolled courses, ignoring pairs
+# sharing fewer than RECOMMENDATIONS_MIN_SHARED students; pages show
+# RECOMMENDATIONS_SHOWN of them.
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATIONS_MIN_SHARED = 3
+RECOMMENDATIONS_SHOWN = 5
+
+# Submissions per page of an assignment's grading queue; the page fetches the
+# next one in the background while the current one is graded.
+GRADING_QUEUE_PAGE = 25
+
+# Archival of closed terms (mainapp.archive): a term ARCHIVE_AFTER_DAYS past
+# its end date may have its submissions, attendance and discussions moved to
+# compressed ArchivedChunk rows, ARCHIVE_CHUNK_SIZE rows per transaction.
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_CHUNK_SIZE = 500
+
+# Background work (mainapp.jobs): 'thread' runs it on thread pools inside the
+# process that queued it (see the *_ASYNC settings); 'db' queues it in the Job
+# table for `manage.py run_jobs` workers on any node. Failed jobs are retried
+# up to JOB_MAX_ATTEMPTS times; a job claimed JOB_CLAIM_TIMEOUT seconds ago by
+# a worker that never finished it is handed out again.
+JOB_BACKEND = 'thread'
+JOB_MAX_ATTEMPTS = 3
+JOB_CLAIM_TIMEOUT = 600
+JOB_POLL_INTERVAL = 1
+
+# Several app nodes. By default the cache is per process (LocMemCache), media
+# is on local disk and background work runs in-process, so a second node
+# misses uploads, serves sessions, users and API validators its peer has
+# already invalidated, and loses queued work on restart. DJANGO_SHARED_DIR
+# moves all of it to a directory every node mounts: a file cache (which also
+# turns on cached sessions and users), media, and the Job queue. DJANGO_REDIS_URL
+# swaps the file cache for Redis. Rate-limit buckets are then shared too,
+# though two nodes racing on one bucket may each let a request through.
+SHARED_DIR = os.environ.get('DJANGO_SHARED_DIR')
+if SHARED_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(SHARED_DIR, 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 100_000},
+        },
+    }
+    MEDIA_ROOT = os.path.join(SHARED_DIR, 'media')
+    CHUNKED_UPLOAD_DIR = os.path.join(MEDIA_ROOT, '.partial')
+    JOB_BACKEND = 'db'
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        },
+    }
+
 LOGIN_URL = 'login'  # use the name of your login URL
 
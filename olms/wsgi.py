@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'olms.settings')
 
 application = get_wsgi_application()
+
+# With gunicorn's preload_app (see gunicorn.conf.py) this runs once in the
+# master, so forked workers start with URLs, templates and heavy modules
+# already loaded. Set OLMS_WARMUP=0 to skip it.
+if os.environ.get('OLMS_WARMUP', '1') != '0':
+    from mainapp.startup import warmup
+
+    warmup()